@@ -0,0 +1,157 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+from typing import Dict, Iterable, Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+from app.core.compression import accepts_encoding
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError: # Optional; only .gz variants are built without it
+    brotli = None
+
+# Static asset pipeline.
+#
+# Build step (run at image build time, see Dockerfile):
+#     python -m app.core.assets build
+# copies every file under app/static into app/static/dist with a content hash in its name
+# (css/style.css -> css/style.3f9a0c1d2e4b.css), writes .gz/.br siblings for text assets, records
+# the mapping in dist/manifest.json and pre-compiles the Jinja templates.
+#
+# Templates link assets through asset_url("css/style.css"), which resolves to the fingerprinted
+# URL when a build exists and to the plain /static/ path otherwise (local development).
+# Fingerprinted files never change under the same URL, so they are served with a one-year
+# immutable Cache-Control and, when the client accepts it, from their precompressed variant.
+
+STATIC_DIRECTORY = "app/static"
+DIST_DIRECTORY = os.path.join(STATIC_DIRECTORY, "dist")
+MANIFEST_PATH = os.path.join(DIST_DIRECTORY, "manifest.json")
+STATIC_URL_PREFIX = "/static/"
+
+COMPRESSIBLE_EXTENSIONS = (".css", ".js", ".svg", ".html", ".json", ".txt", ".map")
+_PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+_manifest: Optional[Dict[str, str]] = None
+
+
+# --- Build ---
+
+def _fingerprint(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+def _source_files() -> Iterable[str]:
+    for root, dirs, files in os.walk(STATIC_DIRECTORY):
+        if os.path.abspath(root).startswith(os.path.abspath(DIST_DIRECTORY)):
+            continue
+        for name in sorted(files):
+            yield os.path.relpath(os.path.join(root, name), STATIC_DIRECTORY).replace(os.sep, "/")
+
+
+def _write_compressed(path: str) -> None:
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path + ".gz", "wb") as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + ".br", "wb") as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def build_assets() -> Dict[str, str]:
+    """Fingerprint and precompress app/static into app/static/dist. Returns the manifest."""
+    shutil.rmtree(DIST_DIRECTORY, ignore_errors=True)
+    manifest = {}
+    for rel_path in _source_files():
+        source = os.path.join(STATIC_DIRECTORY, rel_path)
+        stem, ext = os.path.splitext(rel_path)
+        fingerprinted = f"{stem}.{_fingerprint(source)}{ext}"
+        target = os.path.join(DIST_DIRECTORY, fingerprinted)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(source, target)
+        if ext.lower() in COMPRESSIBLE_EXTENSIONS:
+            _write_compressed(target)
+        manifest[rel_path] = f"dist/{fingerprinted}"
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+# --- Lookup ---
+
+def load_manifest() -> Dict[str, str]:
+    global _manifest
+    if _manifest is None:
+        try:
+            with open(MANIFEST_PATH) as f:
+                _manifest = json.load(f)
+        except FileNotFoundError:
+            _manifest = {}
+    return _manifest
+
+
+def asset_url(path: str) -> str:
+    """URL for a file under app/static, fingerprinted when the build manifest knows it."""
+    path = path.lstrip("/")
+    return STATIC_URL_PREFIX + load_manifest().get(path, path)
+
+
+class AssetStaticFiles(StaticFiles):
+    """
+    StaticFiles that serves fingerprinted files (under dist/) with immutable caching and from their
+    .br/.gz variant when accepted. Unfingerprinted files must be revalidated on every use.
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        full_path = str(full_path)
+        if status_code != 200 or not self._is_fingerprinted(full_path):
+            response = super().file_response(full_path, stat_result, scope, status_code)
+            response.headers.setdefault("Cache-Control", "no-cache")
+            return response
+
+        request_headers = Headers(scope=scope)
+        headers = {
+            "Cache-Control": f"public, max-age={settings.STATIC_CACHE_MAX_AGE_SECONDS}, immutable",
+            "Vary": "Accept-Encoding",
+        }
+        media_type = FileResponse(full_path, stat_result=stat_result).media_type
+        serve_path, serve_stat = full_path, stat_result
+        accept_encoding = request_headers.get("accept-encoding")
+        for coding, suffix in _PRECOMPRESSED:
+            if accepts_encoding(accept_encoding, coding) and os.path.exists(full_path + suffix):
+                serve_path, serve_stat = full_path + suffix, os.stat(full_path + suffix)
+                headers["Content-Encoding"] = coding
+                break
+        response = FileResponse(serve_path, stat_result=serve_stat, media_type=media_type, headers=headers)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    @staticmethod
+    def _is_fingerprinted(full_path: str) -> bool:
+        return os.path.abspath(full_path).startswith(os.path.abspath(DIST_DIRECTORY) + os.sep)
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build fingerprinted, precompressed static assets.")
+    parser.add_argument("command", choices=["build"])
+    parser.parse_args(argv)
+
+    manifest = build_assets()
+    print(f"Built {len(manifest)} assets into {DIST_DIRECTORY}")
+    from app.core.templating import precompile_templates
+    print(f"Precompiled {precompile_templates()} templates into {settings.TEMPLATE_BYTECODE_CACHE_DIR}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,157 @@
+import gzip
+from typing import Optional
+
+from app.core.config import settings
+from app.core.http_cache import ENCODING_SUFFIXES
+
+try:
+    import brotli
+except ImportError: # Optional; gzip only without it
+    brotli = None
+
+# Compresses JSON responses of at least COMPRESSION_MIN_SIZE_BYTES with brotli or gzip, whichever
+# the client prefers (brotli wins ties). Only complete bodies are compressed: streamed responses
+# (exports, server-sent events) and non-JSON content pass through untouched.
+
+COMPRESSIBLE_TYPES = ("application/json",)
+
+
+def _accepted_encodings(accept_encoding: str) -> dict:
+    """Parse Accept-Encoding into {coding: q}."""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            accepted[coding.strip().lower()] = q
+    return accepted
+
+
+def accepts_encoding(accept_encoding: Optional[str], coding: str) -> bool:
+    if not accept_encoding:
+        return False
+    accepted = _accepted_encodings(accept_encoding)
+    return accepted.get(coding, accepted.get("*", 0.0)) > 0
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    if not accept_encoding:
+        return None
+    accepted = _accepted_encodings(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    candidates = []
+    if brotli is not None:
+        candidates.append(("br", accepted.get("br", wildcard)))
+    candidates.append(("gzip", accepted.get("gzip", wildcard)))
+    coding, q = max(candidates, key=lambda c: c[1]) # max() keeps the first (br) on ties
+    return coding if q > 0 else None
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    if coding == "br":
+        return brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=settings.COMPRESSION_GZIP_LEVEL)
+
+
+def _header(headers: list, name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _set_header(headers: list, name: bytes, value: bytes) -> list:
+    return [(k, v) for k, v in headers if k.lower() != name] + [(name, value)]
+
+
+def _add_vary(headers: list) -> list:
+    vary = _header(headers, b"vary")
+    if vary is None:
+        return _set_header(headers, b"vary", b"Accept-Encoding")
+    if b"accept-encoding" in vary.lower():
+        return headers
+    return _set_header(headers, b"vary", vary + b", Accept-Encoding")
+
+
+def _suffix_etag(etag: bytes, coding: str) -> bytes:
+    if not etag.endswith(b'"'):
+        return etag
+    return etag[:-1] + f"-{coding}".encode("latin-1") + b'"'
+
+
+class CompressionMiddleware:
+    """ASGI middleware; see the module comment for what gets compressed."""
+
+    def __init__(self, app, minimum_size: Optional[int] = None):
+        self.app = app
+        self.minimum_size = settings.COMPRESSION_MIN_SIZE_BYTES if minimum_size is None else minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_headers = dict(scope.get("headers") or [])
+        coding = choose_encoding(request_headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+        if_none_match = request_headers.get(b"if-none-match", b"")
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                if message["status"] == 304:
+                    # Echo the encoded ETag back if that's the one the client validated with.
+                    etag = _header(headers, b"etag")
+                    if etag:
+                        for suffix in ENCODING_SUFFIXES:
+                            encoded = etag[:-1] + suffix.encode("latin-1") + b'"'
+                            if encoded in if_none_match:
+                                headers = _set_header(headers, b"etag", encoded)
+                                break
+                    await send({**message, "headers": headers})
+                    passthrough = True
+                    return
+                content_type = (_header(headers, b"content-type") or b"").decode("latin-1")
+                if _header(headers, b"content-encoding") or not content_type.startswith(COMPRESSIBLE_TYPES):
+                    passthrough = True
+                    await send(message)
+                    return
+                start_message = {**message, "headers": headers}
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            if message.get("more_body", False):
+                # Streaming body: don't buffer it, send it as is.
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            headers = start_message["headers"]
+            if len(body) >= self.minimum_size:
+                body = compress(body, coding)
+                headers = _set_header(headers, b"content-encoding", coding.encode("latin-1"))
+                headers = _set_header(headers, b"content-length", str(len(body)).encode("latin-1"))
+                etag = _header(headers, b"etag")
+                if etag:
+                    headers = _set_header(headers, b"etag", _suffix_etag(etag, coding))
+            headers = _add_vary(headers)
+            await send({**start_message, "headers": headers})
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_wrapper)
@@ -1,12 +1,13 @@
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import List, Optional, Tuple
 import os
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-# This should be called before initializing Settings
-# It will load variables into the environment, which pydantic-settings can then read.
-load_dotenv()
+# .env is read by pydantic-settings itself (see Config.env_file below); nothing is loaded into
+# os.environ or printed at import time, which keeps worker cold starts quiet and cheap.
+
+def async_database_uri(uri: str) -> str:
+    """The asyncpg/aiosqlite form of a sync database URI."""
+    return uri.replace("postgresql+psycopg2://", "postgresql+asyncpg://", 1).replace("sqlite://", "sqlite+aiosqlite://", 1)
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Budget Tracker FastAPI"
@@ -21,32 +22,141 @@ class Settings(BaseSettings):
     
     # Cloud SQL Connector setting
     INSTANCE_CONNECTION_NAME: Optional[str] = None # e.g., "project:region:instance"
+    DB_IP_TYPE: str = "PUBLIC" # PUBLIC, PRIVATE or PSC
+    # Decided in model_post_init: use the connector when an instance is configured and no explicit URI is given
+    USE_CLOUD_SQL_CONNECTOR: Optional[bool] = None
 
+    # Set explicitly to bypass the DB_* settings (e.g. "sqlite:///./dev.db" for local development)
     SQLALCHEMY_DATABASE_URI: Optional[str] = None
 
+    # Connection pool sizing. Each worker process gets an equal share of the instance's
+    # connection budget: (DB_MAX_CONNECTIONS - DB_RESERVED_CONNECTIONS) / (DB_MAX_INSTANCES * WEB_CONCURRENCY).
+    # DB_POOL_SIZE / DB_MAX_OVERFLOW override the computed values.
+    DB_MAX_CONNECTIONS: int = 100 # The Cloud SQL instance's max_connections flag
+    DB_RESERVED_CONNECTIONS: int = 10 # Kept free for migrations, admin sessions, etc.
+    DB_MAX_INSTANCES: int = 4 # Cloud Run max instances (--max-instances)
+    WEB_CONCURRENCY: int = 2 # Worker processes per instance; gunicorn.conf.py sets it from the CPU and memory limits
+    DB_POOL_SIZE: Optional[int] = None
+    DB_MAX_OVERFLOW: Optional[int] = None
+    DB_POOL_TIMEOUT_SECONDS: int = 10
+    DB_POOL_RECYCLE_SECONDS: int = 1800 # Connections older than this are replaced on checkout
+
+    # Schema migrations normally run once per deploy (python -m app.db.migrate upgrade). Set True to
+    # have each worker upgrade on startup instead, for local development only.
+    MIGRATE_ON_STARTUP: bool = False
+
+    # Async database path: when True the routers get an AsyncSession (asyncpg driver) instead of
+    # running the synchronous Session in the threadpool. Lets us compare both under load.
+    DB_ASYNC_MODE: bool = False
+    SQLALCHEMY_ASYNC_DATABASE_URI: Optional[str] = None
+
+    # Read replicas (optional): comma-separated URIs. Read-only endpoints use a replica that passes
+    # its health check with replay lag within DB_REPLICA_MAX_LAG_SECONDS, else the primary. After a
+    # client's own write its reads stay on the primary for DB_REPLICA_STICKY_SECONDS, so it never
+    # reads its way back to before the write. See app/db/replicas.py.
+    DB_REPLICA_URIS: str = ""
+    DB_REPLICA_ASYNC_URIS: str = "" # Derived from DB_REPLICA_URIS when empty, like the primary's
+    DB_REPLICA_MAX_LAG_SECONDS: float = 5.0
+    DB_REPLICA_HEALTH_INTERVAL_SECONDS: float = 5.0
+    DB_REPLICA_STICKY_SECONDS: float = 10.0
+
     # JWT settings - will read from loaded env vars or use defaults
     SECRET_KEY: str = "a_very_secret_key_that_should_be_in_env_var_and_be_very_strong"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Single-purpose tokens for opening GET /expenses/stream (POST /expenses/stream-token)
+    STREAM_TOKEN_EXPIRE_SECONDS: int = 60
+
+    # Per-worker auth caches. Verified tokens are never cached past their own "exp"; principals are
+    # invalidated on user updates in this worker and otherwise go stale for at most the TTL.
+    TOKEN_CACHE_SIZE: int = 10000
+    TOKEN_CACHE_TTL_SECONDS: int = 300
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 30
+
+    # Bulk import: rows validated and inserted per transaction, and how many row errors to report
+    IMPORT_BATCH_SIZE: int = 1000
+    IMPORT_MAX_REPORTED_ERRORS: int = 1000
+
+    # POST /expenses/batch: most operations accepted in one request
+    EXPENSE_BATCH_MAX_OPERATIONS: int = 1000
+
+    # Streaming export: rows fetched per server-side cursor round trip
+    EXPORT_BATCH_SIZE: int = 1000
+
+    # Live dashboard events (GET /expenses/stream). "local" delivers within one worker process;
+    # "postgres" uses LISTEN/NOTIFY so every worker and instance sees every write. "auto" picks
+    # "postgres" when the database is PostgreSQL and "local" otherwise (SQLite development).
+    EVENTS_BACKEND: str = "auto"
+    EVENTS_QUEUE_SIZE: int = 100 # Per open stream; a client further behind is told to resync
+    EVENTS_HEARTBEAT_SECONDS: int = 15 # Comment line sent on idle streams so proxies keep them open
+
+    # Delta sync (GET /expenses/changes): deleted expenses stay as tombstones this long before
+    # `python -m app.services.sync_service purge` removes them; clients that haven't synced since
+    # then start over with a full sync.
+    TOMBSTONE_RETENTION_DAYS: int = 30
+
+    # Expense partitions and archival (PostgreSQL expenses is range-partitioned by expense_date month;
+    # `python -m app.services.archive_service maintain` runs both jobs). Partitions are created this
+    # many months ahead; whole months older than EXPENSE_ARCHIVE_AFTER_MONTHS are moved to Parquet
+    # files under EXPENSE_ARCHIVE_URL (file:///path for a local directory, gs://bucket/prefix for GCS)
+    # and read from there when a query reaches back into them.
+    EXPENSE_PARTITION_MONTHS_AHEAD: int = 3
+    EXPENSE_ARCHIVE_AFTER_MONTHS: int = 24
+    EXPENSE_ARCHIVE_URL: str = "file://./expense_archive"
+
+    # Response compression for JSON bodies at least this large (brotli when the client accepts it
+    # and the brotli package is installed, else gzip). Dynamic responses favour fast settings.
+    COMPRESSION_MIN_SIZE_BYTES: int = 1024
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+
+    # Static assets and templates. Fingerprinted assets (python -m app.core.assets build) are cached
+    # by browsers for STATIC_CACHE_MAX_AGE_SECONDS. Compiled templates persist in the bytecode cache
+    # dir; TEMPLATE_AUTO_RELOAD=False skips the per-render source mtime check in production.
+    STATIC_CACHE_MAX_AGE_SECONDS: int = 31536000
+    TEMPLATE_BYTECODE_CACHE_DIR: str = "app/.jinja_cache"
+    TEMPLATE_AUTO_RELOAD: bool = True
+
+    # Password hashing. bcrypt is ~200-300 ms of CPU per call at cost 12, so it runs on a dedicated,
+    # bounded pool instead of the event loop. Changing BCRYPT_ROUNDS rehashes passwords on next login.
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_EXECUTOR: str = "thread" # "thread" or "process"
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 16 # Requests allowed to wait for a worker before we answer 503
+
+    def replica_uris(self) -> List[Tuple[str, str]]:
+        """(sync URI, async URI) for each configured read replica."""
+        uris = [uri.strip() for uri in self.DB_REPLICA_URIS.split(",") if uri.strip()]
+        async_uris = [uri.strip() for uri in self.DB_REPLICA_ASYNC_URIS.split(",") if uri.strip()]
+        return [
+            (uri, async_uris[i] if i < len(async_uris) else async_database_uri(uri))
+            for i, uri in enumerate(uris)
+        ]
 
     def model_post_init(self, __context) -> None:
+        if self.USE_CLOUD_SQL_CONNECTOR is None:
+            self.USE_CLOUD_SQL_CONNECTOR = bool(self.INSTANCE_CONNECTION_NAME) and not self.SQLALCHEMY_DATABASE_URI
+        if self.SQLALCHEMY_DATABASE_URI:
+            # An explicit URI wins; derive the async URI from it when possible.
+            if not self.SQLALCHEMY_ASYNC_DATABASE_URI:
+                self.SQLALCHEMY_ASYNC_DATABASE_URI = async_database_uri(self.SQLALCHEMY_DATABASE_URI)
+            return
         # Construct the database URI after the settings are loaded
         if self.INSTANCE_CONNECTION_NAME: 
             self.SQLALCHEMY_DATABASE_URI = f"postgresql+psycopg2://{self.DB_USER}:{self.DB_PASSWORD}@/{self.DB_NAME}?host=/cloudsql/{self.INSTANCE_CONNECTION_NAME}"
         else:
             self.SQLALCHEMY_DATABASE_URI = f"postgresql+psycopg2://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+        if not self.SQLALCHEMY_ASYNC_DATABASE_URI:
+            self.SQLALCHEMY_ASYNC_DATABASE_URI = f"postgresql+asyncpg://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
     class Config:
         # Configure Pydantic BaseSettings behavior
         case_sensitive = True
-        # Specifies the .env file to load settings from if python-dotenv is installed
-        # Even though we call load_dotenv() explicitly, this tells pydantic where to look.
+        # Specifies the .env file to load settings from (pydantic-settings parses it with python-dotenv)
         env_file = ".env"
         env_file_encoding = 'utf-8'
 
 settings = Settings()
 
-# Now `settings` instance will have values loaded from .env or defaults
-print(f"Loaded settings: DB_HOST={settings.DB_HOST}, DB_NAME={settings.DB_NAME}") # Example print
-
 # You might need to install pydantic-settings: pip install pydantic-settings 
\ No newline at end of file
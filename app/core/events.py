@@ -0,0 +1,268 @@
+import asyncio
+import json
+import signal
+import threading
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import event as sa_event, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+# Live change events for the dashboard (GET /expenses/stream, server-sent events).
+#
+# budget_service queues one small event per expense write on the session (queue_event()). Events
+# only leave the process if the transaction commits: the session hooks below hand them to the
+# configured backend, which gets them to the EventBroker of every worker, which fans them out to
+# that worker's open streams for the user.
+#
+# Backends (EVENTS_BACKEND, default "auto": postgres on PostgreSQL, local otherwise):
+# - "local": in-process only. Enough for one worker; with several, a stream only sees writes that
+#   were handled by its own worker.
+# - "postgres": NOTIFY on the expense_events channel inside the write's own transaction (so it is
+#   delivered exactly when the write commits), and one LISTEN connection per worker. Payloads over
+#   NOTIFY's 8000-byte limit are replaced by a resync event.
+#
+# Every event carries the user's new ledger_version, which is also its SSE id: a client that sees
+# a gap (or an explicit "resync") refetches instead of patching.
+
+CHANNEL = "expense_events"
+NOTIFY_MAX_BYTES = 7900
+_PENDING_KEY = "pending_events"
+_SHUTDOWN = object()
+
+
+class Subscription:
+    def __init__(self, user_id: int, maxsize: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def put(self, event) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A client this far behind can't patch its way back; drop the backlog and resync.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync"})
+
+    def close(self) -> None:
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(_SHUTDOWN)
+
+
+class EventBroker:
+    """Per-worker fan-out from committed events to the open streams of each user."""
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.backend = None
+
+    async def start(self, backend) -> None:
+        self._loop = asyncio.get_running_loop()
+        self.backend = backend
+        await backend.start(self)
+        if threading.current_thread() is threading.main_thread():
+            self.install_signal_hooks()
+
+    async def stop(self) -> None:
+        if self.backend is not None:
+            await self.backend.stop()
+        self._close_streams()
+        self._loop = None
+
+    def _close_streams(self) -> None:
+        for subscriptions in list(self._subscribers.values()):
+            for subscription in subscriptions:
+                subscription.close()
+        self._subscribers.clear()
+
+    def install_signal_hooks(self) -> None:
+        """
+        End open streams as soon as the server is told to stop. Uvicorn waits for open connections
+        before running shutdown handlers, so without this every deploy would hang until the
+        graceful timeout. Chains to the server's own SIGINT/SIGTERM handlers.
+        """
+        loop = self._loop
+
+        def chain(previous):
+            def handler(signum, frame):
+                loop.call_soon_threadsafe(self._close_streams)
+                previous(signum, frame)
+            return handler
+
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            previous = signal.getsignal(signum)
+            if callable(previous):
+                signal.signal(signum, chain(previous))
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id, settings.EVENTS_QUEUE_SIZE)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscribers.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscribers[subscription.user_id]
+
+    def subscriber_count(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._subscribers.values())
+
+    def dispatch(self, user_id: int, event: dict) -> None:
+        """Deliver to this worker's streams for user_id. Safe to call from any thread."""
+        loop = self._loop
+        if loop is None or user_id not in self._subscribers:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._deliver(user_id, event)
+        else:
+            loop.call_soon_threadsafe(self._deliver, user_id, event)
+
+    def dispatch_all(self, event: dict) -> None:
+        for user_id in list(self._subscribers):
+            self.dispatch(user_id, event)
+
+    def _deliver(self, user_id: int, event: dict) -> None:
+        for subscription in list(self._subscribers.get(user_id, ())):
+            subscription.put(event)
+
+
+broker = EventBroker()
+
+
+def is_shutdown(event) -> bool:
+    return event is _SHUTDOWN
+
+
+# --- Backends ---
+
+class LocalBackend:
+    name = "local"
+
+    async def start(self, broker: EventBroker) -> None:
+        self.broker = broker
+
+    async def stop(self) -> None:
+        pass
+
+    def before_commit(self, session: Session, events: List[tuple]) -> None:
+        pass
+
+    def after_commit(self, events: List[tuple]) -> None:
+        for user_id, event in events:
+            self.broker.dispatch(user_id, event)
+
+
+class PostgresNotifyBackend:
+    name = "postgres"
+    RECONNECT_DELAY_SECONDS = 2.0
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._connection = None
+
+    async def start(self, broker: EventBroker) -> None:
+        self.broker = broker
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def before_commit(self, session: Session, events: List[tuple]) -> None:
+        # NOTIFY is transactional: queued now, delivered to every listener (this worker included)
+        # when the transaction commits, discarded if it rolls back.
+        for user_id, event in events:
+            payload = json.dumps({"user_id": user_id, "event": event}, separators=(",", ":"))
+            if len(payload.encode()) > NOTIFY_MAX_BYTES:
+                payload = json.dumps({"user_id": user_id, "event": {"type": "resync", "version": event.get("version")}})
+            session.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+
+    def after_commit(self, events: List[tuple]) -> None:
+        pass
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        try:
+            message = json.loads(payload)
+            self.broker.dispatch(int(message["user_id"]), message["event"])
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Ignoring malformed {CHANNEL} notification: {e}")
+
+    async def _listen(self) -> None:
+        from app.db import connection as db_connection
+
+        while True:
+            try:
+                self._connection = await db_connection.connect_asyncpg()
+                await self._connection.add_listener(CHANNEL, self._on_notification)
+                print(f"Listening for {CHANNEL} notifications.")
+                # Anything committed while we weren't listening is lost; have open streams refetch.
+                self.broker.dispatch_all({"type": "resync"})
+                while not self._connection.is_closed():
+                    await asyncio.sleep(self.RECONNECT_DELAY_SECONDS)
+                print(f"{CHANNEL} listener connection closed; reconnecting.")
+            except asyncio.CancelledError:
+                if self._connection is not None and not self._connection.is_closed():
+                    await self._connection.close()
+                raise
+            except Exception as e:
+                print(f"{CHANNEL} listener failed: {e}; retrying in {self.RECONNECT_DELAY_SECONDS}s")
+            await asyncio.sleep(self.RECONNECT_DELAY_SECONDS)
+
+
+def build_backend():
+    postgresql = (settings.SQLALCHEMY_DATABASE_URI or "").startswith("postgresql") or settings.USE_CLOUD_SQL_CONNECTOR
+    if settings.EVENTS_BACKEND in ("auto", "postgres") and postgresql:
+        return PostgresNotifyBackend()
+    if settings.EVENTS_BACKEND == "postgres":
+        print("EVENTS_BACKEND=postgres needs a PostgreSQL database; using the in-process backend.")
+    return LocalBackend()
+
+
+# --- Session integration ---
+
+def queue_event(db: Session, user_id: int, event: dict) -> None:
+    """Publish event to user_id's streams if (and when) db's current transaction commits."""
+    db.info.setdefault(_PENDING_KEY, []).append((user_id, event))
+
+
+@sa_event.listens_for(Session, "before_commit")
+def _before_commit(session: Session) -> None:
+    events = session.info.get(_PENDING_KEY)
+    if events and broker.backend is not None:
+        broker.backend.before_commit(session, events)
+
+
+@sa_event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    events = session.info.pop(_PENDING_KEY, None)
+    if events and broker.backend is not None:
+        broker.backend.after_commit(events)
+
+
+@sa_event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def format_sse(event: dict, event_id: Optional[int] = None, name: str = "expense") -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {name}")
+    lines.append("data: " + json.dumps(event, separators=(",", ":")))
+    return "\n".join(lines) + "\n\n"
@@ -0,0 +1,52 @@
+import hashlib
+from typing import Optional
+
+from fastapi import Response, status
+
+# Conditional GET helpers. ETags are strong validators derived from the user's ledger version
+# (see budget_service.get_ledger_version) plus whatever selects the representation (route, query
+# parameters), so they change exactly when the response body would.
+#
+# CompressionMiddleware appends "-gzip"/"-br" to the ETag of a compressed body, keeping each
+# encoding's ETag distinct as strong validators require; etag_matches() accepts either form.
+
+ENCODING_SUFFIXES = ("-br", "-gzip")
+
+# Per-user data: shared caches must not store it, and clients must revalidate before reuse.
+CACHE_HEADERS = {"Cache-Control": "private, no-cache", "Vary": "Authorization"}
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha256(":".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def strip_encoding_suffix(etag: str) -> str:
+    for suffix in ENCODING_SUFFIXES:
+        if etag.endswith(f'{suffix}"'):
+            return etag[: -len(suffix) - 1] + '"'
+    return etag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match evaluation (weak comparison, as RFC 9110 specifies for this header)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if strip_encoding_suffix(candidate) == etag:
+            return True
+    return False
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, **CACHE_HEADERS})
+
+
+def set_validators(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers.update(CACHE_HEADERS)
@@ -0,0 +1,190 @@
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Prometheus metrics for GET /metrics: HTTP latency/in-flight/status per route, SQL query timing
+# and per-request query counts, and connection pool checkout metrics.
+#
+# Under gunicorn each worker is a separate process, so metrics are written to per-process files in
+# PROMETHEUS_MULTIPROC_DIR (set by gunicorn.conf.py) and the scrape, which lands on any one worker,
+# merges all of them. Without that variable (e.g. `uvicorn --reload`) the default in-process
+# registry is used.
+
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR") or os.environ.get("prometheus_multiproc_dir"))
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+_QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+# --- HTTP ---
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route"], buckets=_LATENCY_BUCKETS,
+)
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP responses by route template and status code",
+    ["method", "route", "status"],
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requests currently being served",
+    ["method"], multiprocess_mode="livesum",
+)
+
+# --- SQL ---
+
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "Time spent in cursor.execute per statement",
+    ["engine"], buckets=_QUERY_BUCKETS,
+)
+DB_QUERY_ERRORS = Counter("db_query_errors_total", "Statements that raised", ["engine"])
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "SQL statements issued while serving one request",
+    ["route"], buckets=_QUERY_COUNT_BUCKETS,
+)
+DB_QUERY_TIME_PER_REQUEST = Histogram(
+    "db_query_time_per_request_seconds", "Total SQL time spent while serving one request",
+    ["route"], buckets=_LATENCY_BUCKETS,
+)
+
+# --- Connection pool ---
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection",
+    ["engine"], buckets=_QUERY_BUCKETS,
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections", "Connections currently checked out of the pool",
+    ["engine"], multiprocess_mode="livesum",
+)
+DB_POOL_CONNECTS = Counter("db_pool_connections_opened_total", "New DBAPI connections opened", ["engine"])
+
+
+class _QueryTally:
+    # Mutable, so statements run in threadpool copies of the request context still count.
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+_request_queries: ContextVar[Optional[_QueryTally]] = ContextVar("request_queries", default=None)
+
+
+# --- SQLAlchemy instrumentation ---
+
+def instrument_engine(name: str, sync_engine: Engine) -> None:
+    """Attach query timing and pool metrics to an engine (for AsyncEngine pass .sync_engine)."""
+    query_duration = DB_QUERY_DURATION.labels(name)
+    query_errors = DB_QUERY_ERRORS.labels(name)
+    checked_out = DB_POOL_CHECKED_OUT.labels(name)
+    connects = DB_POOL_CONNECTS.labels(name)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        query_duration.observe(elapsed)
+        tally = _request_queries.get()
+        if tally is not None:
+            tally.count += 1
+            tally.seconds += elapsed
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start_time"):
+            conn.info["query_start_time"].pop()
+        query_errors.inc()
+
+    @event.listens_for(sync_engine.pool, "connect")
+    def _connect(dbapi_connection, connection_record):
+        connects.inc()
+
+    @event.listens_for(sync_engine.pool, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_out.inc()
+
+    @event.listens_for(sync_engine.pool, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        checked_out.dec()
+
+
+def observe_pool_wait(name: str, seconds: float) -> None:
+    """PoolTelemetry wait observer (see app/db/connection.py)."""
+    DB_POOL_CHECKOUT_WAIT.labels(name).observe(seconds)
+
+
+# --- HTTP middleware ---
+
+def _route_template(scope) -> str:
+    # The router records the matched route in the scope; label by its template (/expenses/{expense_id}),
+    # never the raw path, to keep label cardinality bounded.
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class PrometheusMiddleware:
+    """ASGI middleware timing every HTTP request until its response body is fully sent."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        tally = _QueryTally()
+        token = _request_queries.set(tally)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_flight = HTTP_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_flight.dec()
+            _request_queries.reset(token)
+            route = _route_template(scope)
+            HTTP_REQUEST_DURATION.labels(method, route).observe(elapsed)
+            HTTP_REQUESTS.labels(method, route, str(status_code)).inc()
+            DB_QUERIES_PER_REQUEST.labels(route).observe(tally.count)
+            DB_QUERY_TIME_PER_REQUEST.labels(route).observe(tally.seconds)
+
+
+def render_latest() -> tuple:
+    """(body, content type) for the /metrics response, merged across workers when multiprocess."""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,79 @@
+import functools
+import os
+import shutil
+from typing import BinaryIO, Tuple
+from urllib.parse import urlparse
+
+# Minimal object storage for archive files, addressed by URL:
+#
+# - gs://bucket/path: Google Cloud Storage (needs the google-cloud-storage package and the usual
+#   application default credentials, e.g. the Cloud Run service account).
+# - file:///abs/path, file://./relative/path or a plain path: the local filesystem, for development
+#   and as a stand-in for the bucket.
+#
+# open_url returns a seekable binary file, so Parquet readers fetch only the footer and the row
+# groups they need (ranged reads on GCS) rather than the whole object.
+
+
+def join_url(base: str, key: str) -> str:
+    return f"{base.rstrip('/')}/{key.lstrip('/')}"
+
+
+def _split(url: str) -> Tuple[str, str]:
+    """(scheme, location): bucket/path for gs, a filesystem path for file."""
+    if url.startswith("gs://"):
+        return "gs", url[len("gs://"):]
+    if url.startswith("file://"):
+        return "file", url[len("file://"):]
+    if urlparse(url).scheme:
+        raise ValueError(f"Unsupported storage URL: {url!r} (use gs:// or file://)")
+    return "file", url
+
+
+@functools.lru_cache(maxsize=1)
+def _gcs_client():
+    from google.cloud import storage # Optional dependency; only needed for gs:// URLs
+
+    return storage.Client()
+
+
+def _gcs_blob(location: str):
+    bucket, _, name = location.partition("/")
+    return _gcs_client().bucket(bucket).blob(name)
+
+
+def upload_file(path: str, url: str) -> None:
+    """Copy a local file to url."""
+    scheme, location = _split(url)
+    if scheme == "gs":
+        _gcs_blob(location).upload_from_filename(path)
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(location)), exist_ok=True)
+    partial = f"{location}.partial"
+    shutil.copyfile(path, partial)
+    os.replace(partial, location) # Readers never see a half-written file
+
+
+def open_url(url: str) -> BinaryIO:
+    """Open the object at url for reading."""
+    scheme, location = _split(url)
+    if scheme == "gs":
+        return _gcs_blob(location).open("rb")
+    return open(location, "rb")
+
+
+def delete_url(url: str) -> None:
+    """Delete the object at url if it exists."""
+    scheme, location = _split(url)
+    if scheme == "gs":
+        from google.api_core.exceptions import NotFound
+
+        try:
+            _gcs_blob(location).delete()
+        except NotFound:
+            pass
+        return
+    try:
+        os.remove(location)
+    except FileNotFoundError:
+        pass
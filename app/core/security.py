@@ -1,19 +1,108 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
-
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from typing import TYPE_CHECKING, Optional, Tuple
 
+from app.core.cache import TTLCache
 from app.core.config import settings # To get SECRET_KEY, ALGORITHM, EXPIRE_MINUTES
 
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+# passlib and jose are imported on first use rather than at module import: together they are a
+# noticeable share of worker cold-start time, and /health, static files and templates need neither.
+
 # Password Hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+_pwd_context: Optional["CryptContext"] = None
+_pwd_context_lock = threading.Lock()
+
+def get_pwd_context() -> "CryptContext":
+    # min_rounds == max_rounds == BCRYPT_ROUNDS makes passlib flag any hash made with a different
+    # cost as needing an update, so verify_and_update() hands back a fresh hash after a cost change.
+    global _pwd_context
+    if _pwd_context is None:
+        with _pwd_context_lock:
+            if _pwd_context is None:
+                from passlib.context import CryptContext
+                _pwd_context = CryptContext(
+                    schemes=["bcrypt"],
+                    deprecated="auto",
+                    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+                    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+                    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+                )
+    return _pwd_context
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Returns (verified, new_hash); new_hash is set when the stored hash uses an outdated cost."""
+    return get_pwd_context().verify_and_update(plain_password, hashed_password)
+
+
+# Off-event-loop hashing
+# All request-path hashing goes through a small dedicated pool. Admission is bounded: once
+# PASSWORD_HASH_WORKERS are busy and PASSWORD_HASH_MAX_PENDING calls are queued, further calls
+# fail fast with PasswordHasherBusy (the routes turn it into a 503) instead of piling up.
+
+class PasswordHasherBusy(Exception):
+    """Raised when the password hashing pool is saturated."""
+
+_hash_executor: Optional[Executor] = None
+_hash_in_flight = 0
+_hash_lock = threading.Lock()
+
+def _get_hash_executor() -> Executor:
+    global _hash_executor
+    if _hash_executor is None:
+        if settings.PASSWORD_HASH_EXECUTOR == "process":
+            _hash_executor = ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS)
+        else:
+            # bcrypt releases the GIL while hashing, so threads give real parallelism here.
+            _hash_executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+            )
+    return _hash_executor
+
+async def _run_hasher(fn, *args):
+    global _hash_in_flight
+    with _hash_lock:
+        if _hash_in_flight >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_MAX_PENDING:
+            raise PasswordHasherBusy("Password hashing pool is saturated")
+        _hash_in_flight += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_hash_executor(), fn, *args)
+    finally:
+        with _hash_lock:
+            _hash_in_flight -= 1
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_hasher(get_password_hash, password)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await _run_hasher(verify_and_update_password, plain_password, hashed_password)
+
+def password_hasher_stats() -> dict:
+    return {
+        "executor": settings.PASSWORD_HASH_EXECUTOR,
+        "workers": settings.PASSWORD_HASH_WORKERS,
+        "max_pending": settings.PASSWORD_HASH_MAX_PENDING,
+        "in_flight": _hash_in_flight,
+        "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+    }
+
+def shutdown_password_hasher() -> None:
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+        _hash_executor = None
 
 
 # JWT Token Handling
@@ -27,6 +116,8 @@ if not SECRET_KEY:
     # raise ValueError("JWT SECRET_KEY must be set for token generation.") # Or handle as appropriate
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    from jose import jwt
+
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
@@ -39,8 +130,27 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+# EventSource can't send an Authorization header, so GET /expenses/stream takes its token in the URL,
+# where proxies and access logs record it. That token is a separate, short-lived one, marked with a
+# "typ" claim: only the stream accepts it, and the stream doesn't accept access tokens in the URL.
+STREAM_TOKEN_TYPE = "stream"
+
+def create_stream_token(data: dict) -> str:
+    return create_access_token(
+        {**data, "typ": STREAM_TOKEN_TYPE}, expires_delta=timedelta(seconds=settings.STREAM_TOKEN_EXPIRE_SECONDS)
+    )
+
+# Verified token -> claims. Entries expire at the earlier of the cache TTL and the token's own
+# "exp", so a cached token can never outlive its validity.
+token_cache = TTLCache("verified_tokens", settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL_SECONDS)
+
 def verify_access_token(token: str, credentials_exception: Exception) -> Optional[dict]:
     """Verifies a JWT token and returns the payload (claims) or raises credentials_exception."""
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+    from jose import JWTError, jwt
+
     try:
         if not SECRET_KEY:
             print("Error verifying token: JWT SECRET_KEY is not configured.")
@@ -53,6 +163,9 @@ def verify_access_token(token: str, credentials_exception: Exception) -> Optiona
             print("Token verification failed: Subject (sub) claim missing.")
             raise credentials_exception
         # You could also return a Pydantic model like TokenData here
+        exp = payload.get("exp")
+        if exp is not None:
+            token_cache.set(token, payload, ttl_seconds=exp - time.time())
         return payload
     except JWTError as e:
         print(f"JWTError during token verification: {e}")
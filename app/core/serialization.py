@@ -0,0 +1,35 @@
+from typing import Any, Iterable, Sequence
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError: # Optional; pydantic's own encoder without it
+    orjson = None
+
+# Serialization fast path for large list responses. The route selects only the columns it returns
+# (Row tuples, no ORM objects or identity map), validates them once against a TypedDict through a
+# TypeAdapter, encodes straight to JSON bytes and returns a Response, which FastAPI passes through
+# without validating against the route's response_model again. The response_model is still
+# declared, for the OpenAPI schema.
+#
+# orjson is used when installed; otherwise the adapter's own dump_json (pydantic-core) encodes.
+# Both produce the same JSON for these types: ISO dates, and "Z" for UTC datetimes.
+
+
+def rows_to_dicts(rows: Iterable[Sequence], fields: Sequence[str]) -> list:
+    """Column rows (in `fields` order) as dicts for TypeAdapter validation."""
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def dump_json(adapter: TypeAdapter, value: Any) -> bytes:
+    """Encode a value already validated by adapter."""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_UTC_Z)
+    return adapter.dump_json(value)
+
+
+def json_response(adapter: TypeAdapter, value: Any) -> Response:
+    """Validate value once with adapter and return it as an encoded JSON response."""
+    return Response(content=dump_json(adapter, adapter.validate_python(value)), media_type="application/json")
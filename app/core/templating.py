@@ -0,0 +1,37 @@
+import os
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+from app.core import assets
+from app.core.config import settings
+
+# The one Jinja environment shared by main.py and the routers. Compiled templates are persisted in
+# TEMPLATE_BYTECODE_CACHE_DIR, which the asset build step pre-populates (python -m app.core.assets
+# build), so a cold worker loads bytecode instead of parsing and compiling every template.
+
+TEMPLATE_DIRECTORY = "app/templates"
+
+
+def _bytecode_cache() -> FileSystemBytecodeCache:
+    os.makedirs(settings.TEMPLATE_BYTECODE_CACHE_DIR, exist_ok=True)
+    return FileSystemBytecodeCache(settings.TEMPLATE_BYTECODE_CACHE_DIR)
+
+
+env = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIRECTORY),
+    autoescape=True, # Same default Jinja2Templates uses
+    bytecode_cache=_bytecode_cache(),
+    auto_reload=settings.TEMPLATE_AUTO_RELOAD,
+)
+env.globals["asset_url"] = assets.asset_url
+
+templates = Jinja2Templates(env=env)
+
+
+def precompile_templates() -> int:
+    """Compile every template once so its bytecode lands in the cache. Returns the count."""
+    names = env.list_templates(filter_func=lambda name: name.endswith(".html"))
+    for name in names:
+        env.get_template(name)
+    return len(names)
@@ -0,0 +1,295 @@
+import asyncio
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core import metrics
+from app.core.config import settings
+
+# Connection management: engine construction, Cloud SQL connector lifecycle, pool sizing and
+# pool telemetry. app/db/session.py builds its engines through here.
+#
+# - Driver matches dialect: the sync connector path uses pg8000 under a postgresql+pg8000 URL,
+#   the async path asyncpg under postgresql+asyncpg.
+# - Connectors use lazy certificate refresh (no background refresh task), which suits Cloud Run
+#   where CPU is throttled between requests, and are created on first use, not at import.
+# - Pool size is an equal share of the instance's connection budget (see pool_limits()).
+
+
+# --- Pool sizing ---
+
+def pool_limits() -> Tuple[int, int]:
+    """(pool_size, max_overflow) for one worker process."""
+    budget = settings.DB_MAX_CONNECTIONS - settings.DB_RESERVED_CONNECTIONS
+    per_worker = max(1, budget // max(1, settings.DB_MAX_INSTANCES * settings.WEB_CONCURRENCY))
+    pool_size = settings.DB_POOL_SIZE if settings.DB_POOL_SIZE is not None else max(1, per_worker // 2)
+    max_overflow = (
+        settings.DB_MAX_OVERFLOW if settings.DB_MAX_OVERFLOW is not None else max(0, per_worker - pool_size)
+    )
+    return pool_size, max_overflow
+
+
+# --- Pool telemetry ---
+
+class PoolTelemetry:
+    """Checkout wait time, saturation and connection age for one engine's pool."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.connects = 0
+        self.max_connection_age_seconds = 0.0
+        self._observers = []
+
+    def add_wait_observer(self, observer) -> None:
+        """Register fn(name, seconds) to be called for every checkout (e.g. a metrics histogram)."""
+        self._observers.append(observer)
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.checkout_timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+        for observer in self._observers:
+            observer(self.name, seconds)
+
+    def on_connect(self, dbapi_connection, connection_record) -> None:
+        connection_record.info["connected_at"] = time.monotonic()
+        with self._lock:
+            self.connects += 1
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        connected_at = connection_record.info.get("connected_at")
+        if connected_at is not None:
+            age = time.monotonic() - connected_at
+            with self._lock:
+                self.max_connection_age_seconds = max(self.max_connection_age_seconds, age)
+
+    def snapshot(self, pool) -> dict:
+        size = pool.size() if hasattr(pool, "size") else 0
+        overflow_limit = getattr(pool, "_max_overflow", 0)
+        capacity = size + max(0, overflow_limit)
+        checked_out = pool.checkedout() if hasattr(pool, "checkedout") else 0
+        with self._lock:
+            return {
+                "name": self.name,
+                "pool_size": size,
+                "max_overflow": overflow_limit,
+                "checked_out": checked_out,
+                "checked_in": pool.checkedin() if hasattr(pool, "checkedin") else 0,
+                "saturation": round(checked_out / capacity, 3) if capacity else 0.0,
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.checkout_timeouts,
+                "wait_seconds_avg": self.wait_seconds_total / self.checkouts if self.checkouts else 0.0,
+                "wait_seconds_max": self.wait_seconds_max,
+                "connects": self.connects,
+                "max_connection_age_seconds": round(self.max_connection_age_seconds, 1),
+            }
+
+
+_telemetry: Dict[str, PoolTelemetry] = {}
+_engines: Dict[str, object] = {}
+
+
+def get_telemetry(name: str) -> PoolTelemetry:
+    if name not in _telemetry:
+        _telemetry[name] = PoolTelemetry(name)
+    return _telemetry[name]
+
+
+class _CheckoutTimingMixin:
+    # Times the wait for a free connection. The pool's logging_name carries the telemetry name,
+    # and survives pool.recreate() on engine.dispose().
+    def _do_get(self):
+        telemetry = _telemetry.get(getattr(self, "_orig_logging_name", None) or "")
+        start = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except Exception:
+            if telemetry is not None:
+                telemetry.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        if telemetry is not None:
+            telemetry.record_wait(time.perf_counter() - start)
+        return record
+
+
+class TimedQueuePool(_CheckoutTimingMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _pool_kwargs(name: str, async_pool: bool) -> dict:
+    pool_size, max_overflow = pool_limits()
+    return {
+        "poolclass": TimedAsyncAdaptedQueuePool if async_pool else TimedQueuePool,
+        "pool_logging_name": name,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": True, # Good practice for ensuring connections are live
+    }
+
+
+def _instrument(name: str, sync_engine: Engine) -> None:
+    telemetry = get_telemetry(name)
+    event.listen(sync_engine.pool, "connect", telemetry.on_connect)
+    event.listen(sync_engine.pool, "checkout", telemetry.on_checkout)
+    if metrics.observe_pool_wait not in telemetry._observers:
+        telemetry.add_wait_observer(metrics.observe_pool_wait)
+    metrics.instrument_engine(name, sync_engine)
+
+
+def pool_stats() -> list:
+    """Telemetry snapshots for every engine built through this module."""
+    stats = []
+    for name, eng in _engines.items():
+        pool = getattr(eng, "sync_engine", eng).pool
+        stats.append(get_telemetry(name).snapshot(pool))
+    return stats
+
+
+# --- Cloud SQL connectors ---
+
+_connector = None
+_connector_lock = threading.Lock()
+_async_connector = None
+_async_connector_lock: Optional[asyncio.Lock] = None
+
+
+def _ip_type():
+    from google.cloud.sql.connector import IPTypes
+    return IPTypes[settings.DB_IP_TYPE.upper()]
+
+
+def _get_connector():
+    global _connector
+    if _connector is None:
+        with _connector_lock:
+            if _connector is None:
+                from google.cloud.sql.connector import Connector
+                _connector = Connector(ip_type=_ip_type(), refresh_strategy="lazy")
+    return _connector
+
+
+def _cloud_sql_conn():
+    return _get_connector().connect(
+        settings.INSTANCE_CONNECTION_NAME, # "project:region:instance"
+        "pg8000",
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD,
+        db=settings.DB_NAME,
+    )
+
+
+async def _cloud_sql_async_conn():
+    # The async connector must be created inside the running event loop, so build it on first use.
+    global _async_connector, _async_connector_lock
+    if _async_connector is None:
+        if _async_connector_lock is None:
+            _async_connector_lock = asyncio.Lock()
+        async with _async_connector_lock:
+            if _async_connector is None:
+                from google.cloud.sql.connector import create_async_connector
+                _async_connector = await create_async_connector(ip_type=_ip_type(), refresh_strategy="lazy")
+    return await _async_connector.connect_async(
+        settings.INSTANCE_CONNECTION_NAME,
+        "asyncpg",
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD,
+        db=settings.DB_NAME,
+    )
+
+
+async def connect_asyncpg():
+    """A standalone asyncpg connection outside any pool (the events backend's LISTEN connection)."""
+    if settings.USE_CLOUD_SQL_CONNECTOR:
+        return await _cloud_sql_async_conn()
+    import asyncpg
+    from sqlalchemy.engine import make_url
+
+    url = make_url(settings.SQLALCHEMY_ASYNC_DATABASE_URI or settings.SQLALCHEMY_DATABASE_URI).set(drivername="postgresql")
+    return await asyncpg.connect(url.render_as_string(hide_password=False))
+
+
+async def close_connectors() -> None:
+    """Close Cloud SQL connectors (stops their refresh work and frees sockets) on shutdown."""
+    global _connector, _async_connector
+    if _async_connector is not None:
+        await _async_connector.close_async()
+        _async_connector = None
+    if _connector is not None:
+        _connector.close()
+        _connector = None
+
+
+# --- Forking ---
+
+def after_fork() -> None:
+    """
+    Call in a child process forked from one that built engines (gunicorn preload_app, post_fork).
+    The child gets fresh, empty pools; connections inherited from the parent are left open for the
+    parent to use and close, never reused here. Connectors are dropped the same way: their refresh
+    threads and event loop did not survive the fork.
+    """
+    global _connector, _connector_lock, _async_connector, _async_connector_lock
+    for eng in _engines.values():
+        getattr(eng, "sync_engine", eng).dispose(close=False)
+    _connector = None
+    _connector_lock = threading.Lock()
+    _async_connector = None
+    _async_connector_lock = None
+
+
+# --- Engine factories ---
+
+def build_engine(name: str = "primary", url: Optional[str] = None) -> Engine:
+    """Create a sync engine: through the Cloud SQL connector, or from a URI."""
+    url = url or settings.SQLALCHEMY_DATABASE_URI
+    if settings.USE_CLOUD_SQL_CONNECTOR and url == settings.SQLALCHEMY_DATABASE_URI:
+        print(f"Initializing database connection using Google Cloud SQL Connector for instance: {settings.INSTANCE_CONNECTION_NAME}")
+        sync_engine = create_engine("postgresql+pg8000://", creator=_cloud_sql_conn, **_pool_kwargs(name, async_pool=False))
+    elif url.startswith("sqlite"):
+        # SQLite picks its own pool class; sizing doesn't apply.
+        sync_engine = create_engine(url, connect_args={"check_same_thread": False})
+    else:
+        print(f"Initializing database connection using direct URI for '{name}'")
+        sync_engine = create_engine(url, **_pool_kwargs(name, async_pool=False))
+    _instrument(name, sync_engine)
+    _engines[name] = sync_engine
+    return sync_engine
+
+
+def build_async_engine(name: str = "primary-async", url: Optional[str] = None):
+    """Create an AsyncEngine (asyncpg, or aiosqlite for local SQLite)."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = url or settings.SQLALCHEMY_ASYNC_DATABASE_URI
+    if settings.USE_CLOUD_SQL_CONNECTOR and url == settings.SQLALCHEMY_ASYNC_DATABASE_URI:
+        print(f"Initializing async database connection using Google Cloud SQL Connector for instance: {settings.INSTANCE_CONNECTION_NAME}")
+        async_engine = create_async_engine(
+            "postgresql+asyncpg://", async_creator=_cloud_sql_async_conn, **_pool_kwargs(name, async_pool=True)
+        )
+    elif url.startswith("sqlite"):
+        async_engine = create_async_engine(url)
+    else:
+        print(f"Initializing async database connection using direct URI for '{name}'")
+        async_engine = create_async_engine(url, **_pool_kwargs(name, async_pool=True))
+    _instrument(name, async_engine.sync_engine)
+    _engines[name] = async_engine
+    return async_engine
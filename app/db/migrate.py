@@ -0,0 +1,125 @@
+import argparse
+import logging
+import os
+from typing import Iterable, Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+# Schema migrations (Alembic, scripts in app/db/migrations/versions). Run once per deploy, before
+# the new revision takes traffic, e.g. as a Cloud Run job:
+#
+#     python -m app.db.migrate upgrade            # to head
+#     python -m app.db.migrate current            # revision the database is at
+#     python -m app.db.migrate revision -m "add budgets" --autogenerate
+#
+# Workers never change the schema; on startup they only compare the database's revision with the
+# head revision shipped in the image (schema_status()) and report it through /ready.
+
+MIGRATIONS_DIRECTORY = os.path.join(os.path.dirname(__file__), "migrations")
+
+# The schema create_all used to produce before migrations existed. Databases that have tables but
+# no alembic_version are stamped at this revision before upgrading.
+BASELINE_REVISION = "0001"
+
+_head_revision: Optional[str] = None
+
+
+def alembic_config():
+    from alembic.config import Config
+
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_DIRECTORY)
+    return config
+
+
+def head_revision() -> str:
+    global _head_revision
+    if _head_revision is None:
+        from alembic.script import ScriptDirectory
+
+        _head_revision = ScriptDirectory.from_config(alembic_config()).get_current_head()
+    return _head_revision
+
+
+def current_revision(engine: Engine) -> Optional[str]:
+    """The database's revision: a single-row read, or None if it was never migrated."""
+    with engine.connect() as conn:
+        if not inspect(conn).has_table("alembic_version"):
+            return None
+        return conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+
+
+def schema_status(engine: Engine) -> dict:
+    """Compare the database revision with the head revision this code expects."""
+    current = current_revision(engine)
+    head = head_revision()
+    return {"current_revision": current, "head_revision": head, "up_to_date": current == head}
+
+
+def _stamp_legacy_database(engine: Engine) -> None:
+    with engine.connect() as conn:
+        inspector = inspect(conn)
+        legacy = inspector.has_table("users") and not inspector.has_table("alembic_version")
+    if legacy:
+        from alembic import command
+
+        print(f"Existing tables without migration history; stamping baseline revision {BASELINE_REVISION}")
+        command.stamp(alembic_config(), BASELINE_REVISION)
+
+
+def upgrade(revision: str = "head") -> None:
+    from alembic import command
+
+    from app.db.session import engine
+
+    if engine is None:
+        raise RuntimeError("Database is not configured; set SQLALCHEMY_DATABASE_URI or the DB_* settings.")
+    _stamp_legacy_database(engine)
+    command.upgrade(alembic_config(), revision)
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run database schema migrations.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    upgrade_parser = subparsers.add_parser("upgrade", help="Upgrade to a revision (default: head)")
+    upgrade_parser.add_argument("revision", nargs="?", default="head")
+    downgrade_parser = subparsers.add_parser("downgrade", help="Downgrade to a revision")
+    downgrade_parser.add_argument("revision")
+    stamp_parser = subparsers.add_parser("stamp", help="Record a revision without running migrations")
+    stamp_parser.add_argument("revision")
+    subparsers.add_parser("current", help="Show the database's revision")
+    subparsers.add_parser("check", help="Exit non-zero unless the database is at head")
+    subparsers.add_parser("history", help="List revisions")
+    revision_parser = subparsers.add_parser("revision", help="Create a new migration script")
+    revision_parser.add_argument("-m", "--message", required=True)
+    revision_parser.add_argument("--autogenerate", action="store_true", help="Diff app.db.models against the database")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    logging.getLogger("alembic.runtime.migration").setLevel(logging.INFO) # "Running upgrade 0001 -> 0002 ..."
+
+    from alembic import command
+
+    config = alembic_config()
+    if args.command == "upgrade":
+        upgrade(args.revision)
+    elif args.command == "downgrade":
+        command.downgrade(config, args.revision)
+    elif args.command == "stamp":
+        command.stamp(config, args.revision)
+    elif args.command == "history":
+        command.history(config)
+    elif args.command == "revision":
+        command.revision(config, message=args.message, autogenerate=args.autogenerate)
+    else:
+        from app.db.session import engine
+
+        status = schema_status(engine)
+        print(f"Database revision: {status['current_revision']} (head: {status['head_revision']})")
+        if args.command == "check" and not status["up_to_date"]:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,67 @@
+import re
+
+from alembic import context
+from sqlalchemy import event
+
+from app.db import models # noqa: F401  Registers every table on Base.metadata
+from app.db import session as db_session
+
+# Alembic environment, driven by app/db/migrate.py (python -m app.db.migrate ...).
+# Migrations run on the application's own sync engine, so they connect exactly like the app does
+# (direct URI or Cloud SQL connector).
+
+target_metadata = db_session.Base.metadata
+
+# Search objects created by raw DDL in migration 0003 and deliberately not mapped on the models.
+UNMAPPED_SEARCH_OBJECTS = ("expenses_fts", "description_tsv", "ix_expenses_description_tsv", "ix_expenses_description_trgm")
+# Monthly partitions of expenses on PostgreSQL (migration 0007, app/services/archive_service.py).
+EXPENSE_PARTITIONS = re.compile(r"^expenses_(y\d{4}m\d{2}|default)")
+
+
+def include_name(name, type_, parent_names) -> bool:
+    # Keep autogenerate from proposing to drop them (FTS5 also creates expenses_fts_* shadow tables,
+    # and every partition has its own copy of each expenses index).
+    return not (name and (name.startswith(UNMAPPED_SEARCH_OBJECTS) or EXPENSE_PARTITIONS.match(name)))
+
+
+def _end_isolation_level_query(connection, opts) -> None:
+    # Alembic's autocommit_block (CREATE INDEX CONCURRENTLY) reads the isolation level before
+    # switching to AUTOCOMMIT. pg8000 runs that SHOW in a transaction of its own and leaves it open,
+    # so the DDL would still run inside a transaction block; end it first.
+    if opts.get("isolation_level") == "AUTOCOMMIT" and not connection.in_transaction():
+        connection.connection.dbapi_connection.rollback()
+
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=str(db_session.engine.url),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    if db_session.engine is None:
+        raise RuntimeError("Database is not configured; set SQLALCHEMY_DATABASE_URI or the DB_* settings.")
+    with db_session.engine.connect() as connection:
+        if connection.dialect.driver == "pg8000":
+            event.listen(connection, "set_connection_execution_options", _end_isolation_level_query)
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            # SQLite can't ALTER most things in place; batch mode recreates the table instead.
+            render_as_batch=connection.dialect.name == "sqlite",
+            compare_type=True,
+            include_name=include_name,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,79 @@
+"""Listing/summary indexes, expense_rollups (backfilled) and users.ledger_version
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:01
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Databases that were built with create_all after these objects were added to the models already
+# have some of them, so every step checks first.
+
+
+def _create_index(name, table, columns, existing) -> None:
+    if name in existing:
+        return
+    if op.get_bind().dialect.name == 'postgresql':
+        # CONCURRENTLY keeps expenses writable while a large table is indexed; it can't run in a transaction.
+        with op.get_context().autocommit_block():
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+    else:
+        op.create_index(name, table, columns)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    if 'ledger_version' not in {c['name'] for c in inspector.get_columns('users')}:
+        op.add_column('users', sa.Column('ledger_version', sa.Integer(), server_default='0', nullable=False))
+
+    existing = {ix['name'] for ix in inspector.get_indexes('expenses')}
+    _create_index('ix_expenses_owner_date_category', 'expenses', ['owner_id', 'expense_date', 'category'], existing)
+    _create_index(
+        'ix_expenses_owner_date_created_id', 'expenses',
+        ['owner_id', sa.text('expense_date DESC'), sa.text('created_at DESC'), sa.text('id DESC')], existing,
+    )
+
+    if 'expense_rollups' not in tables:
+        op.create_table(
+            'expense_rollups',
+            sa.Column('owner_id', sa.Integer(), nullable=False),
+            sa.Column('month', sa.Date(), nullable=False),
+            sa.Column('category', sa.String(), nullable=False),
+            sa.Column('total', sa.Float(), nullable=False),
+            sa.Column('count', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['owner_id'], ['users.id']),
+            sa.PrimaryKeyConstraint('owner_id', 'month', 'category'),
+        )
+        # Backfill from existing expenses (same result as `python -m app.services.rollup_service rebuild`)
+        if op.get_bind().dialect.name == 'postgresql':
+            month = "date_trunc('month', expense_date)::date"
+        else:
+            month = "date(expense_date, 'start of month')"
+        op.execute(
+            "INSERT INTO expense_rollups (owner_id, month, category, total, count) "
+            f"SELECT owner_id, {month}, category, SUM(amount), COUNT(id) FROM expenses "
+            f"GROUP BY owner_id, {month}, category"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('expense_rollups')
+    op.drop_index('ix_expenses_owner_date_created_id', table_name='expenses')
+    op.drop_index('ix_expenses_owner_date_category', table_name='expenses')
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('ledger_version')
@@ -0,0 +1,72 @@
+"""Full-text and trigram search over expense descriptions
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:02
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# PostgreSQL: a generated tsvector column with a GIN index for ranked full-text matches, plus a
+# pg_trgm GIN index on description for typo-tolerant and substring matches.
+# SQLite (local development): an external-content FTS5 table kept in sync by triggers.
+# Neither object is mapped on the model; search_service queries them directly and migrations/env.py
+# keeps autogenerate from dropping them.
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(
+            "ALTER TABLE expenses ADD COLUMN description_tsv tsvector "
+            "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(description, ''))) STORED"
+        )
+        with op.get_context().autocommit_block():
+            op.execute("CREATE INDEX CONCURRENTLY ix_expenses_description_tsv ON expenses USING gin (description_tsv)")
+            op.execute(
+                "CREATE INDEX CONCURRENTLY ix_expenses_description_trgm ON expenses USING gin (description gin_trgm_ops)"
+            )
+    elif dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE expenses_fts USING fts5("
+            "description, content='expenses', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+        )
+        op.execute(
+            "CREATE TRIGGER expenses_fts_insert AFTER INSERT ON expenses BEGIN "
+            "INSERT INTO expenses_fts(rowid, description) VALUES (new.id, new.description); END"
+        )
+        op.execute(
+            "CREATE TRIGGER expenses_fts_delete AFTER DELETE ON expenses BEGIN "
+            "INSERT INTO expenses_fts(expenses_fts, rowid, description) VALUES ('delete', old.id, old.description); END"
+        )
+        op.execute(
+            "CREATE TRIGGER expenses_fts_update AFTER UPDATE OF description ON expenses BEGIN "
+            "INSERT INTO expenses_fts(expenses_fts, rowid, description) VALUES ('delete', old.id, old.description); "
+            "INSERT INTO expenses_fts(rowid, description) VALUES (new.id, new.description); END"
+        )
+        op.execute("INSERT INTO expenses_fts(expenses_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_expenses_description_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_expenses_description_tsv")
+        op.execute("ALTER TABLE expenses DROP COLUMN IF EXISTS description_tsv")
+    elif dialect == 'sqlite':
+        for trigger in ('expenses_fts_insert', 'expenses_fts_delete', 'expenses_fts_update'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS expenses_fts")
@@ -0,0 +1,57 @@
+"""Expense change sequence and soft-delete tombstones for delta sync
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 00:00:05
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('purged_change_seq', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('expenses', sa.Column('change_seq', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('expenses', sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+
+    # Existing rows become one change at a new ledger version, so a first sync from since=0
+    # returns them (and cached ETags are invalidated along the way).
+    op.execute(
+        "UPDATE users SET ledger_version = ledger_version + 1 "
+        "WHERE EXISTS (SELECT 1 FROM expenses WHERE expenses.owner_id = users.id)"
+    )
+    op.execute(
+        "UPDATE expenses SET change_seq = "
+        "(SELECT users.ledger_version FROM users WHERE users.id = expenses.owner_id)"
+    )
+
+    if op.get_bind().dialect.name == 'postgresql':
+        # CONCURRENTLY keeps expenses writable while a large table is indexed; it can't run in a transaction.
+        with op.get_context().autocommit_block():
+            op.create_index(
+                'ix_expenses_owner_change_seq_id', 'expenses', ['owner_id', 'change_seq', 'id'], postgresql_concurrently=True
+            )
+    else:
+        op.create_index('ix_expenses_owner_change_seq_id', 'expenses', ['owner_id', 'change_seq', 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Tombstones are not expenses; drop them with the columns that mark them.
+    op.execute("DELETE FROM expenses WHERE deleted_at IS NOT NULL")
+    op.drop_index('ix_expenses_owner_change_seq_id', table_name='expenses')
+    # Plain ALTER TABLE rather than batch mode: on SQLite a batch rebuild of expenses would drop
+    # the search triggers from 0003. SQLite has DROP COLUMN since 3.35.
+    op.execute("ALTER TABLE expenses DROP COLUMN deleted_at")
+    op.execute("ALTER TABLE expenses DROP COLUMN change_seq")
+    op.execute("ALTER TABLE users DROP COLUMN purged_change_seq")
@@ -0,0 +1,119 @@
+"""Partition expenses by expense_date month (PostgreSQL) and add expense_archives
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 00:00:06
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# PostgreSQL only: expenses becomes a table range-partitioned by expense_date, one partition per
+# month (expenses_yYYYYmMM) plus expenses_default for dates no partition covers. The table is
+# rebuilt and every row copied, under an exclusive lock: run this in a maintenance window.
+#
+# A partitioned table's primary key must include the partition key, so it becomes
+# (id, expense_date); ids still come from expenses_id_seq and stay unique, and the ORM keeps
+# mapping id alone. Indexes are recreated from their current definitions, as partitioned indexes
+# (CONCURRENTLY is not supported on a partitioned table). Partitions for months after the ones
+# created here come from `python -m app.services.archive_service partitions`.
+#
+# SQLite keeps the plain table; archive_service archives it by date range instead.
+
+_MONTHS_AHEAD = 3
+
+
+def _add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _index_definitions(bind, table: str) -> list:
+    return [
+        row.indexdef.replace(' ON ONLY ', ' ON ')
+        for row in bind.execute(sa.text(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = :table "
+            "AND indexname <> :pkey ORDER BY indexname"
+        ), {"table": table, "pkey": f"{table}_pkey"})
+    ]
+
+
+def _rebuild_expenses(bind, partitioned: bool, primary_key: str) -> None:
+    """Replace expenses with a copy of itself, partitioned by month or not."""
+    indexes = _index_definitions(bind, 'expenses')
+    columns = ", ".join(
+        row.column_name for row in bind.execute(sa.text(
+            "SELECT column_name FROM information_schema.columns WHERE table_schema = current_schema() "
+            "AND table_name = 'expenses' AND is_generated = 'NEVER' ORDER BY ordinal_position"
+        ))
+    )
+    op.execute("LOCK TABLE expenses IN ACCESS EXCLUSIVE MODE")
+    op.execute("ALTER TABLE expenses RENAME TO expenses_old")
+    op.execute(
+        "CREATE TABLE expenses (LIKE expenses_old INCLUDING DEFAULTS INCLUDING GENERATED)"
+        + (" PARTITION BY RANGE (expense_date)" if partitioned else "")
+    )
+    if partitioned:
+        op.execute("CREATE TABLE expenses_default PARTITION OF expenses DEFAULT")
+        current = date.today().replace(day=1)
+        months = {
+            row.month for row in bind.execute(sa.text(
+                "SELECT DISTINCT date_trunc('month', expense_date)::date AS month FROM expenses_old"
+            ))
+        }
+        months.update(_add_months(current, n) for n in range(_MONTHS_AHEAD + 1))
+        for month in sorted(months):
+            op.execute(
+                f"CREATE TABLE expenses_y{month.year:04d}m{month.month:02d} PARTITION OF expenses "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+            )
+    op.execute(f"INSERT INTO expenses ({columns}) SELECT {columns} FROM expenses_old")
+    # The sequence is owned by expenses_old.id and would be dropped with it.
+    op.execute("ALTER SEQUENCE expenses_id_seq OWNED BY expenses.id")
+    op.execute("DROP TABLE expenses_old")
+    op.execute(f"ALTER TABLE expenses ADD CONSTRAINT expenses_pkey PRIMARY KEY ({primary_key})")
+    op.execute(
+        "ALTER TABLE expenses ADD CONSTRAINT expenses_owner_id_fkey FOREIGN KEY (owner_id) REFERENCES users (id)"
+    )
+    for definition in indexes:
+        op.execute(definition)
+    op.execute("ANALYZE expenses")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'expense_archives',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('month', sa.Date(), nullable=False),
+        sa.Column('uri', sa.String(), nullable=False),
+        sa.Column('row_count', sa.Integer(), nullable=False),
+        sa.Column('size_bytes', sa.BigInteger(), nullable=False),
+        sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_expense_archives_month'), 'expense_archives', ['month'], unique=False)
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        _rebuild_expenses(bind, partitioned=True, primary_key='id, expense_date')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Archived months stay in their Parquet files; they are not copied back into expenses.
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        _rebuild_expenses(bind, partitioned=False, primary_key='id')
+    op.drop_index(op.f('ix_expense_archives_month'), table_name='expense_archives')
+    op.drop_table('expense_archives')
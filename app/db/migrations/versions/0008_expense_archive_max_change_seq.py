@@ -0,0 +1,31 @@
+"""Record the highest change_seq in each expense archive file
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 00:00:07
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, Sequence[str], None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Delta sync reads an archive file only when it holds rows changed after the client's position.
+# Files archived before this column existed have NULL, meaning unknown: they are always read.
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('expense_archives', sa.Column('max_change_seq', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('expense_archives', 'max_change_seq')
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, func, Boolean
+from sqlalchemy import BigInteger, Column, Integer, String, Float, Date, DateTime, ForeignKey, func, Boolean, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from app.db.session import Base # Import Base from our session.py
@@ -11,6 +11,11 @@ class User(Base):
     full_name = Column(String, index=True, nullable=True)
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
+    # Bumped by budget_service on every expense create/update/delete; drives the expense API ETags.
+    ledger_version = Column(Integer, nullable=False, default=0, server_default="0")
+    # Highest change_seq whose tombstones have been purged; GET /expenses/changes can't serve
+    # a `since` below it (see sync_service).
+    purged_change_seq = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -20,6 +25,9 @@ class User(Base):
         return f"<User(id={self.id}, email='{self.email}')>"
 
 class Expense(Base):
+    # On PostgreSQL the table is range-partitioned by expense_date month (migration 0007), so its
+    # primary key there is (id, expense_date). ids are unique on their own (one sequence), and the
+    # ORM identity stays id. Months past EXPENSE_ARCHIVE_AFTER_MONTHS move to ExpenseArchive files.
     __tablename__ = "expenses"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -33,11 +41,88 @@ class Expense(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    # Delta sync: the owner's ledger_version as of this row's last insert/update/delete, and the
+    # deletion time for tombstones. Deleted rows stay until sync_service purges them, so every
+    # read of live expenses must filter on deleted_at IS NULL.
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0")
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+
     owner = relationship("User", back_populates="expenses")
 
+    # Fetch server-generated values (id, created_at) with RETURNING on insert, so a flushed expense
+    # can be serialized (e.g. for change events) without another SELECT.
+    __mapper_args__ = {"eager_defaults": True}
+
+    __table_args__ = (
+        # Serves the per-user summary aggregations (GROUP BY month / category over a date range)
+        # without touching other users' rows.
+        Index("ix_expenses_owner_date_category", "owner_id", "expense_date", "category"),
+        # Matches the listing order exactly so keyset (cursor) pagination is a single index range scan.
+        Index("ix_expenses_owner_date_created_id", owner_id, expense_date.desc(), created_at.desc(), id.desc()),
+        # Listing filtered to one category, in date order.
+        Index("ix_expenses_owner_category_date_created_id", owner_id, category, expense_date.desc(), created_at.desc(), id.desc()),
+        # Listing sorted by amount (either direction) and amount-range filters.
+        Index("ix_expenses_owner_amount_id", owner_id, amount, id),
+        # GET /expenses/changes: everything after a sequence number, in order.
+        Index("ix_expenses_owner_change_seq_id", owner_id, change_seq, id),
+    )
+
     def __repr__(self):
         return f"<Expense(id={self.id}, description='{self.description}', amount={self.amount})>"
 
+class ExpenseRollup(Base):
+    # Per-user spending totals per (month, category), maintained as deltas by budget_service in the
+    # same transaction as the expense write. Summaries read this instead of scanning expenses.
+    # Rebuild/verify with: python -m app.services.rollup_service {rebuild,verify}
+    __tablename__ = "expense_rollups"
+
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    month = Column(Date, primary_key=True) # First day of the month
+    category = Column(String, primary_key=True)
+    total = Column(Float, nullable=False, default=0)
+    count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ExpenseRollup(owner_id={self.owner_id}, month={self.month}, category='{self.category}', total={self.total})>"
+
+class ExpenseArchive(Base):
+    # One Parquet file of archived expenses: every user's live rows for one expense_date month, which
+    # archive_service then removed from expenses (dropping the month's partition on PostgreSQL).
+    # A month can have several files if rows dated in it were added after it was archived.
+    __tablename__ = "expense_archives"
+
+    id = Column(Integer, primary_key=True)
+    month = Column(Date, nullable=False, index=True) # First day of the month
+    uri = Column(String, nullable=False) # file:// or gs:// (app/core/object_storage.py)
+    row_count = Column(Integer, nullable=False)
+    size_bytes = Column(BigInteger, nullable=False)
+    max_change_seq = Column(Integer, nullable=True) # Highest change_seq in the file (NULL: unknown); see sync_service
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<ExpenseArchive(month={self.month}, uri='{self.uri}', row_count={self.row_count})>"
+
+class Budget(Base):
+    # A monthly spending limit for one of the user's categories. Spent amounts come from
+    # expense_rollups (same owner, category and month), so status reads never scan expenses.
+    __tablename__ = "budgets"
+
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    category = Column(String, nullable=False)
+    monthly_limit = Column(Float, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    __table_args__ = (
+        # One budget per category; also the lookup index for the over-budget check in create_expense.
+        UniqueConstraint("owner_id", "category", name="uq_budgets_owner_category"),
+    )
+
+    def __repr__(self):
+        return f"<Budget(id={self.id}, category='{self.category}', monthly_limit={self.monthly_limit})>"
+
 # Note: We added created_at and updated_at timestamps to both models.
 # For User model, email is used for authentication.
 # For Expense model, owner_id links to the User table's primary key (Integer id).
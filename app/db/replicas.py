@@ -0,0 +1,230 @@
+import asyncio
+import itertools
+import threading
+import time
+from http.cookies import SimpleCookie
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.db import connection
+
+# Read-replica routing (DB_REPLICA_URIS). Read-only endpoints take their session from
+# session.get_read_db, which asks the ReplicaRouter below for a replica and falls back to the
+# primary when:
+#
+# - no replica is healthy: a background monitor checks each replica every
+#   DB_REPLICA_HEALTH_INTERVAL_SECONDS (SELECT plus, on PostgreSQL, replay lag) and takes it out of
+#   rotation when the check fails, when its lag exceeds DB_REPLICA_MAX_LAG_SECONDS, or as soon as
+#   one of its connections fails mid-request. Until the first check passes nothing is routed to it.
+# - the client wrote recently (read-your-writes): a committed expense write marks its user sticky
+#   to the primary in this worker, and StickyPrimaryMiddleware sets a short-lived cookie on every
+#   successful unsafe request so the browser's next reads stick to the primary on any worker.
+#   Both last DB_REPLICA_STICKY_SECONDS, which should exceed the lag allowed.
+
+STICKY_COOKIE = "db_primary_until"
+_WRITTEN_USERS_KEY = "written_user_ids"
+_UNSAFE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+# Replay lag in seconds; 0 on a primary, or on a replica that has replayed everything it received
+# (an idle replica's last replay timestamp keeps ageing even though it is caught up).
+_POSTGRESQL_LAG_SQL = text(
+    "SELECT CASE"
+    " WHEN NOT pg_is_in_recovery() THEN 0"
+    " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+    " END"
+)
+
+
+class Replica:
+    def __init__(self, name: str, url: str, async_url: Optional[str]):
+        self.name = name
+        self.engine = connection.build_engine(name, url)
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.async_engine = None
+        self.async_session_factory = None
+        if async_url:
+            from sqlalchemy.ext.asyncio import async_sessionmaker
+
+            self.async_engine = connection.build_async_engine(f"{name}-async", async_url)
+            self.async_session_factory = async_sessionmaker(self.async_engine, autoflush=False, expire_on_commit=False)
+        self.healthy = False
+        self.lag_seconds: Optional[float] = None
+        self.checked_at: Optional[float] = None
+        self.error: Optional[str] = None
+        for engine in filter(None, (self.engine, self.async_engine and self.async_engine.sync_engine)):
+            event.listen(engine, "handle_error", self._on_error)
+
+    def _on_error(self, context) -> None:
+        # A lost connection takes the replica out of rotation now, not at the next health check.
+        if context.is_disconnect or context.connection is None:
+            self.healthy = False
+            self.error = str(context.original_exception)
+
+    def check(self) -> None:
+        try:
+            with self.engine.connect() as conn:
+                if conn.dialect.name == "postgresql":
+                    lag = float(conn.execute(_POSTGRESQL_LAG_SQL).scalar() or 0)
+                else:
+                    conn.execute(text("SELECT 1"))
+                    lag = 0.0
+            self.lag_seconds = lag
+            self.healthy = lag <= settings.DB_REPLICA_MAX_LAG_SECONDS
+            self.error = None if self.healthy else f"replay lag {lag:.1f}s exceeds {settings.DB_REPLICA_MAX_LAG_SECONDS}s"
+        except Exception as e:
+            self.healthy = False
+            self.error = str(e)
+        self.checked_at = time.time()
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "lag_seconds": self.lag_seconds,
+            "checked_at": self.checked_at,
+            "error": self.error,
+        }
+
+    async def dispose(self) -> None:
+        if self.async_engine is not None:
+            await self.async_engine.dispose()
+        self.engine.dispose()
+
+
+class ReplicaRouter:
+    def __init__(self, replicas: List[Replica]):
+        self.replicas = replicas
+        self._next = itertools.count()
+        self._sticky_until: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_settings(cls) -> Optional["ReplicaRouter"]:
+        uris = settings.replica_uris()
+        if not uris:
+            return None
+        return cls([
+            Replica(f"replica-{i}", url, async_url if settings.DB_ASYNC_MODE else None)
+            for i, (url, async_url) in enumerate(uris)
+        ])
+
+    # --- Health monitoring ---
+
+    def check_all(self) -> None:
+        for replica in self.replicas:
+            replica.check()
+
+    async def start(self) -> None:
+        from starlette.concurrency import run_in_threadpool
+
+        await run_in_threadpool(self.check_all)
+        self._task = asyncio.create_task(self._monitor())
+
+    async def _monitor(self) -> None:
+        from starlette.concurrency import run_in_threadpool
+
+        while True:
+            await asyncio.sleep(settings.DB_REPLICA_HEALTH_INTERVAL_SECONDS)
+            try:
+                await run_in_threadpool(self.check_all)
+            except Exception as e:
+                print(f"Replica health check failed: {e}")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for replica in self.replicas:
+            await replica.dispose()
+
+    def status(self) -> List[dict]:
+        return [replica.status() for replica in self.replicas]
+
+    # --- Routing ---
+
+    def note_write(self, user_id: int) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._sticky_until[user_id] = now + settings.DB_REPLICA_STICKY_SECONDS
+            if len(self._sticky_until) > 10000: # Drop expired entries now and then
+                self._sticky_until = {uid: until for uid, until in self._sticky_until.items() if until > now}
+
+    def is_sticky(self, user_id: Optional[int]) -> bool:
+        if user_id is None:
+            return False
+        until = self._sticky_until.get(user_id)
+        return until is not None and until > time.monotonic()
+
+    def choose(self, user_id: Optional[int] = None, sticky_cookie: Optional[str] = None) -> Optional[Replica]:
+        """A healthy replica (round robin), or None to use the primary."""
+        if self.is_sticky(user_id) or _cookie_sticky(sticky_cookie):
+            return None
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._next) % len(healthy)]
+
+
+def _cookie_sticky(value: Optional[str]) -> bool:
+    try:
+        return value is not None and float(value) > time.time()
+    except ValueError:
+        return False
+
+
+# --- Read-your-writes ---
+
+def mark_written(db: Session, user_id: int) -> None:
+    """Record that db's transaction writes user_id's data; the user sticks to the primary once it commits."""
+    db.info.setdefault(_WRITTEN_USERS_KEY, set()).add(user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    written = session.info.pop(_WRITTEN_USERS_KEY, None)
+    if written:
+        from app.db.session import replicas
+
+        if replicas is not None:
+            for user_id in written:
+                replicas.note_write(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_WRITTEN_USERS_KEY, None)
+
+
+class StickyPrimaryMiddleware:
+    """ASGI middleware: after a successful unsafe request, pin the client's reads to the primary for a while."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in _UNSAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = SimpleCookie()
+                cookie[STICKY_COOKIE] = f"{time.time() + settings.DB_REPLICA_STICKY_SECONDS:.3f}"
+                cookie[STICKY_COOKIE]["max-age"] = int(settings.DB_REPLICA_STICKY_SECONDS) + 1
+                cookie[STICKY_COOKIE]["path"] = "/"
+                cookie[STICKY_COOKIE]["httponly"] = True
+                cookie[STICKY_COOKIE]["samesite"] = "Lax"
+                header = cookie.output(header="").strip().encode("latin-1")
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"set-cookie", header)]}
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
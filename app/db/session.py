@@ -1,52 +1,25 @@
-from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base, sessionmaker, Session as SQLAlchemySession # Renamed to avoid conflict from sqlalchemy.ext.declarative import declarative_base
-from typing import Generator
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from typing import Any, AsyncGenerator, Callable, Generator, Optional, TypeVar, Union
 
 from app.core.config import settings
-from google.cloud.sql.connector import Connector, IPTypes
+from app.db import connection, replicas as replica_routing
 
 engine = None
 SessionLocal = None
+async_engine = None
+AsyncSessionLocal = None
 
-if settings.INSTANCE_CONNECTION_NAME and "cloudsql" in settings.SQLALCHEMY_DATABASE_URI:
-    # Using Google Cloud SQL Connector
-    print(f"Initializing database connection using Google Cloud SQL Connector for instance: {settings.INSTANCE_CONNECTION_NAME}")
-    connector = Connector()
-
-    def get_conn(): # type: ignore
-        conn = connector.connect(
-            settings.INSTANCE_CONNECTION_NAME, # "project:region:instance"
-            "pg8000", # We are using psycopg2, but connector needs a driver name. pg8000 is a common one it expects for PG.
-                      # Actual driver used by SQLAlchemy is psycopg2 as per SQLALCHEMY_DATABASE_URI
-            user=settings.DB_USER,
-            password=settings.DB_PASSWORD,
-            db=settings.DB_NAME,
-            ip_type=IPTypes.PUBLIC # or IPTypes.PRIVATE, based on your setup
-        )
-        return conn
-
-    engine = create_engine(
-        # The URL format for Cloud SQL connector might just be "postgresql+psycopg2://",
-        # as user/pass/db are handled by the connector. Or specify dummy host.
-        # The connector.connect method handles the actual connection details.
-        # So, the SQLALCHEMY_DATABASE_URI from settings might need adjustment if using connector explicitly this way.
-        # A common pattern for connector + SQLAlchemy is to pass creator=get_conn to create_engine.
-        f"postgresql+psycopg2://{settings.DB_USER}:{settings.DB_PASSWORD}@/{settings.DB_NAME}", # Host is managed by connector
-        creator=get_conn,
-        pool_size=5, # Adjust as needed
-        max_overflow=10 # Adjust as needed
-    )
-    print("SQLAlchemy engine created with Cloud SQL Connector.")
-
-elif settings.SQLALCHEMY_DATABASE_URI:
-    print(f"Initializing database connection using direct URI: {settings.SQLALCHEMY_DATABASE_URI}")
-    engine = create_engine(
-        settings.SQLALCHEMY_DATABASE_URI, 
-        pool_pre_ping=True, # Good practice for ensuring connections are live
-        pool_size=5, # Adjust as needed
-        max_overflow=10 # Adjust as needed
-    )
-    print("SQLAlchemy engine created with direct URI.")
+# Engine construction (Cloud SQL connector vs. direct URI, pool sizing, telemetry) lives in
+# app/db/connection.py.
+if settings.SQLALCHEMY_DATABASE_URI:
+    engine = connection.build_engine("primary")
+    print("SQLAlchemy engine created.")
+    if settings.DB_ASYNC_MODE:
+        async_engine = connection.build_async_engine("primary-async")
+        print("SQLAlchemy async engine created.")
 else:
     print("Error: SQLALCHEMY_DATABASE_URI is not set. Database engine not created.")
     # Application might not be able to start or will fail on DB operations
@@ -56,10 +29,21 @@ if engine:
 else:
     print("SessionLocal not created because engine initialization failed.")
 
+if async_engine:
+    # expire_on_commit=False: attributes can't be lazily reloaded outside the greenlet, so keep
+    # committed objects readable by the route after the service call returns.
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Read replicas for read-only endpoints (DB_REPLICA_URIS); None when there are none.
+replicas = replica_routing.ReplicaRouter.from_settings() if engine else None
+
 Base = declarative_base()
 
-# Dependency to get a DB session
-def get_db() -> Generator[SQLAlchemySession, None, None]:
+# Either kind of session the request dependency can hand out (see DB_ASYNC_MODE).
+DBSession = Union[SQLAlchemySession, AsyncSession]
+
+# Dependency to get a synchronous DB session (also usable from scripts)
+def get_sync_db() -> Generator[SQLAlchemySession, None, None]:
     if not SessionLocal:
         print("Error: SessionLocal is not initialized. Cannot create DB session.")
         # This would ideally raise an exception or be handled to prevent app from running improperly
@@ -71,6 +55,86 @@ def get_db() -> Generator[SQLAlchemySession, None, None]:
     finally:
         db.close()
 
+# Dependency to get an AsyncSession bound to the asyncpg engine
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    if not AsyncSessionLocal:
+        print("Error: AsyncSessionLocal is not initialized. Cannot create async DB session.")
+        raise RuntimeError("Async database session is not configured.")
+
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# The request dependency used by the routers; DB_ASYNC_MODE picks the implementation.
+get_db = get_async_db if settings.DB_ASYNC_MODE else get_sync_db
+
+def _choose_replica(request: Request) -> Optional[replica_routing.Replica]:
+    if replicas is None:
+        return None
+    user_id = None
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        # Only tokens this worker has already verified (e.g. on the user's last write) are looked
+        # up; the route's own user dependency still verifies the token.
+        from app.core.security import token_cache
+
+        claims = token_cache.get(authorization[7:])
+        user_id = claims.get("uid") if claims else None
+    return replicas.choose(user_id=user_id, sticky_cookie=request.cookies.get(replica_routing.STICKY_COOKIE))
+
+def get_sync_read_db(request: Request) -> Generator[SQLAlchemySession, None, None]:
+    replica = _choose_replica(request)
+    if replica is None:
+        yield from get_sync_db()
+        return
+    db = replica.session_factory()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db(request: Request) -> AsyncGenerator[AsyncSession, None]:
+    replica = _choose_replica(request)
+    if replica is None or replica.async_session_factory is None:
+        async for db in get_async_db():
+            yield db
+        return
+    async with replica.async_session_factory() as db:
+        yield db
+
+# For read-only routes: a healthy replica's session, or the primary's when there is none or the
+# client wrote recently (app/db/replicas.py). Never use it for a route that writes.
+get_read_db = get_async_read_db if settings.DB_ASYNC_MODE else get_sync_read_db
+
+T = TypeVar("T")
+
+async def run_db(db: DBSession, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a service function (written against a sync Session) without blocking the event loop.
+    With an AsyncSession it runs via run_sync, so every query goes through asyncpg; with a sync
+    Session it is pushed to the threadpool. Either way the service function receives a Session
+    as its first argument, so budget_service/user_service have a single implementation.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+async def close_db(db: DBSession) -> None:
+    """Give the session's connection back to the pool early, e.g. before a long-lived stream."""
+    if isinstance(db, AsyncSession):
+        await db.close()
+    else:
+        await run_in_threadpool(db.close)
+
+async def dispose_engines() -> None:
+    """Close pooled connections and the Cloud SQL connectors on application shutdown."""
+    if async_engine is not None:
+        await async_engine.dispose()
+    if engine is not None:
+        engine.dispose()
+    if replicas is not None:
+        await replicas.stop()
+    await connection.close_connectors()
+
 # Function to create database tables (call this from main.py or a script)
 # def create_tables():
 #     if engine:
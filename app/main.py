@@ -1,31 +1,49 @@
 from fastapi import FastAPI, Request, status
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, RedirectResponse, Response
-import uvicorn
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response
+from starlette.concurrency import run_in_threadpool
 
 # Import routers
-from .routers import auth, expenses
+from .routers import auth, budgets, expenses
+from app.core import events, metrics, security
+from app.core.assets import AssetStaticFiles
+from app.core.compression import CompressionMiddleware
+from app.core.templating import templates
+from app.services import user_service
 
-# Import for table creation
-from app.db.session import engine, Base #, SessionLocal (not needed for create_all directly)
+from app.core.config import settings
+from app.db.session import engine, dispose_engines, replicas
 from app.db import models # Ensure models are imported so Base knows about them
+from app.db import connection, migrate
+from app.db.replicas import StickyPrimaryMiddleware
 
-# Function to create DB tables
-def create_db_tables():
-    print("Attempting to create database tables...")
+# The schema is owned by migrations (python -m app.db.migrate upgrade, run once per deploy).
+# Workers only check that the database is at the revision this code expects; /ready reports it.
+def check_schema_version() -> dict:
+    if settings.MIGRATE_ON_STARTUP:
+        migrate.upgrade()
     try:
-        Base.metadata.create_all(bind=engine)
-        print("Database tables created successfully (if they didn't already exist).")
+        schema = migrate.schema_status(engine)
     except Exception as e:
-        print(f"Error creating database tables: {e}")
+        schema = {"up_to_date": False, "error": str(e)}
+    if schema["up_to_date"]:
+        print(f"Database schema is at revision {schema['current_revision']}.")
+    else:
+        print(f"Database schema is not at the expected revision: {schema}. Run: python -m app.db.migrate upgrade")
+    return schema
 
 app = FastAPI(title="Budget Tracker API")
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(metrics.PrometheusMiddleware)
+if replicas is not None:
+    app.add_middleware(StickyPrimaryMiddleware)
 
 @app.on_event("startup")
 async def on_startup():
     print("Application startup...")
-    create_db_tables()
+    app.state.schema = await run_in_threadpool(check_schema_version)
+    await events.broker.start(events.build_backend())
+    if replicas is not None:
+        await replicas.start()
     # Initialize Firebase Admin SDK (already done in firebase_auth.py when it's imported)
     # if not firebase_admin._apps:
     #     try:
@@ -34,21 +52,27 @@ async def on_startup():
     #     except Exception as e:
     #         print(f"Error initializing Firebase Admin SDK on startup: {e}")
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    print("Application shutdown...")
+    await events.broker.stop()
+    await dispose_engines()
+    security.shutdown_password_hasher()
+
 # Mount static files (CSS, JS)
 # Ensure the directory path is correct relative to where main.py is run from.
 # If main.py is in 'app/', and static is 'app/static/', then 'static' is correct.
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+# Fingerprinted files from the asset build (app/static/dist) get immutable caching; see app/core/assets.py.
+app.mount("/static", AssetStaticFiles(directory="app/static"), name="static")
 
-# Setup Jinja2 templates
-# If main.py is in 'app/', and templates is 'app/templates/', then 'templates' is correct.
-templates = Jinja2Templates(directory="app/templates")
+# Jinja2 templates come from the shared environment in app/core/templating.py (bytecode-cached).
 
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     """
     Serves the main landing page.
     """
-    return templates.TemplateResponse("index.html", {"request": request, "title": "Budget Tracker"})
+    return templates.TemplateResponse(request, "index.html", {"title": "Budget Tracker"})
 
 # Add route to handle favicon requests gracefully
 @app.get("/favicon.ico", include_in_schema=False)
@@ -69,13 +93,54 @@ async def redirect_dashboard():
 # Include routers
 app.include_router(auth.router)
 app.include_router(expenses.router)
+app.include_router(budgets.router)
 
 # Basic health check endpoint
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
 
+# Readiness: the database is reachable and its schema matches this build. Answers 503 until then,
+# so the instance takes no traffic before `migrate upgrade` has run.
+@app.get("/ready", include_in_schema=False)
+async def readiness_check():
+    schema = app.state.schema if getattr(app.state, "schema", {}).get("up_to_date") else None
+    if schema is None:
+        try:
+            schema = await run_in_threadpool(migrate.schema_status, engine)
+        except Exception as e:
+            schema = {"up_to_date": False, "error": str(e)}
+        app.state.schema = schema
+    if not schema["up_to_date"]:
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={"status": "not ready", "schema": schema})
+    return {"status": "ready", "schema": schema}
+
+# Connection pool telemetry for this worker: checkout wait, saturation, connection age
+@app.get("/health/pool", include_in_schema=False)
+async def pool_health():
+    return {"pools": connection.pool_stats()}
+
+# Read replica health as this worker last checked it (healthy, replay lag); empty without replicas
+@app.get("/health/replicas", include_in_schema=False)
+async def replica_health():
+    return {"replicas": replicas.status() if replicas is not None else []}
+
+# Prometheus scrape endpoint; aggregates every gunicorn worker (see app/core/metrics.py)
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    body, content_type = metrics.render_latest()
+    return Response(content=body, media_type=content_type)
+
+# Per-worker auth cache counters (hit/miss); confirms the auth DB lookups are being skipped
+@app.get("/health/caches", include_in_schema=False)
+async def cache_stats():
+    return {
+        "tokens": security.token_cache.stats(),
+        "principals": user_service.principal_cache.stats(),
+    }
+
 if __name__ == "__main__":
     # This is for local development.
     # For production, use a Gunicorn or Uvicorn process manager as specified in Dockerfile.
+    import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
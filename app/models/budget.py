@@ -0,0 +1,38 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Optional
+
+class BudgetBase(BaseModel):
+    category: str
+    monthly_limit: float = Field(gt=0)
+
+class BudgetCreate(BudgetBase):
+    pass
+
+class BudgetUpdate(BaseModel):
+    # All fields optional for update
+    category: Optional[str] = None
+    monthly_limit: Optional[float] = Field(default=None, gt=0)
+
+class BudgetInDB(BudgetBase):
+    id: int
+    owner_id: int
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+# Budget status (GET /budgets/status), read from the maintained monthly rollups
+class BudgetStatus(BaseModel):
+    budget_id: int
+    category: str
+    monthly_limit: float
+    spent: float
+    remaining: float # Negative once over budget
+    over_budget: bool
+
+class BudgetStatusReport(BaseModel):
+    month: str # "YYYY-MM"
+    total_limit: float
+    total_spent: float
+    items: List[BudgetStatus]
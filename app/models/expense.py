@@ -1,6 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from datetime import date, datetime # Changed from datetime to date for expense_date
-from typing import Optional
+from typing import List, Literal, Optional
+from typing_extensions import TypedDict # pydantic needs typing_extensions' TypedDict before Python 3.12
 
 class ExpenseBase(BaseModel):
     description: str
@@ -24,4 +25,140 @@ class ExpenseInDB(ExpenseBase):
     created_at: datetime # To track when the record was created
 
     class Config:
-        from_attributes = True # Changed from orm_mode for Pydantic v2 
\ No newline at end of file
+        from_attributes = True # Changed from orm_mode for Pydantic v2
+
+# Sort orders accepted by GET /expenses/ (?sort=). Each one is total: ties are broken by id.
+ExpenseSort = Literal["date_desc", "date_asc", "amount_desc", "amount_asc"]
+
+class ExpenseFilters(BaseModel):
+    # Listing filters, all optional and combined with AND. Date and amount bounds are inclusive.
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    categories: Optional[List[str]] = None
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    sort: ExpenseSort = "date_desc"
+
+class ExpensePage(BaseModel):
+    # Returned by GET /expenses/ in cursor mode. next_cursor is None on the last page.
+    items: List[ExpenseInDB]
+    next_cursor: Optional[str] = None 
+
+# Fast path for GET /expenses/: the same fields as ExpenseInDB (in the same order, so the JSON is
+# identical), validated as plain dicts built from column rows in one TypeAdapter pass instead of
+# one model per row followed by FastAPI's response_model pass. See app/core/serialization.py.
+class ExpenseRow(TypedDict):
+    description: str
+    amount: float
+    category: str
+    expense_date: date
+    id: int
+    owner_id: int
+    created_at: datetime
+
+class ExpenseRowPage(TypedDict):
+    items: List[ExpenseRow]
+    next_cursor: Optional[str]
+
+EXPENSE_ROW_FIELDS = tuple(ExpenseRow.__annotations__)
+expense_rows_adapter = TypeAdapter(List[ExpenseRow])
+expense_row_page_adapter = TypeAdapter(ExpenseRowPage)
+
+class ExpenseSearchHit(ExpenseInDB):
+    score: float # Relevance; higher is better. Only comparable within one result set.
+
+class ExpenseSearchPage(BaseModel):
+    # Returned by GET /expenses/search, best match first. next_offset is None on the last page.
+    items: List[ExpenseSearchHit]
+    next_offset: Optional[int] = None
+
+# Batch mutations (POST /expenses/batch)
+class ExpenseBatchOperation(BaseModel):
+    op: Literal["update", "delete"]
+    id: int
+    changes: Optional[ExpenseUpdate] = None # Required for "update": the fields to set
+
+class ExpenseBatchRequest(BaseModel):
+    # atomic: apply every operation or none. best_effort: apply the valid ones, report the rest.
+    mode: Literal["atomic", "best_effort"] = "atomic"
+    operations: List[ExpenseBatchOperation]
+
+# Per-operation outcome: "updated"/"deleted"; "not_found" (not the user's, or already deleted),
+# "invalid" (bad changes, or the id appears more than once); "skipped" when an atomic batch failed.
+ExpenseBatchStatus = Literal["updated", "deleted", "not_found", "invalid", "skipped"]
+
+class ExpenseBatchItemResult(BaseModel):
+    index: int # Position in the request's operations
+    id: int
+    op: str
+    status: ExpenseBatchStatus
+    error: Optional[str] = None
+
+class ExpenseBatchResult(BaseModel):
+    mode: str
+    applied: bool # False if nothing was written (an atomic batch with a failed operation)
+    updated: int
+    deleted: int
+    failed: int
+    version: int # Ledger version after the batch
+    results: List[ExpenseBatchItemResult]
+
+# Delta sync (GET /expenses/changes)
+class ExpenseChange(ExpenseInDB):
+    change_seq: int
+
+class ExpenseTombstone(BaseModel):
+    id: int
+    change_seq: int
+    deleted_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class ExpenseChanges(BaseModel):
+    # Changes after the requested position, in order. Pass next_since as `since` on the next call;
+    # has_more means another page is ready now. version is the ledger version synced up to.
+    upserts: List[ExpenseChange]
+    deletes: List[ExpenseTombstone]
+    next_since: str
+    has_more: bool
+    version: int
+
+# Spending summary schemas (server-side aggregations for the dashboard charts)
+class CategoryTotal(BaseModel):
+    category: str
+    total: float
+    count: int
+
+class MonthlyTotal(BaseModel):
+    month: str # "YYYY-MM"
+    total: float
+    count: int
+
+class CategoryMonthTotal(BaseModel):
+    month: str # "YYYY-MM"
+    category: str
+    total: float
+    count: int
+
+class SpendingSummary(BaseModel):
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    total: float
+    count: int
+    by_category: List[CategoryTotal]
+    by_month: List[MonthlyTotal]
+
+
+# Bulk import report (POST /expenses/import)
+class ImportRowError(BaseModel):
+    row: int # 1-based data row / line / transaction number in the uploaded file
+    error: str
+
+class ImportReport(BaseModel):
+    format: str
+    imported: int
+    failed: int
+    skipped: int = 0 # e.g. OFX credits, which are not expenses
+    errors: List[ImportRowError]
+    errors_truncated: bool = False
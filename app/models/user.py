@@ -18,6 +18,12 @@ class UserBase(BaseModel):
     full_name: Optional[str] = None
     is_active: Optional[bool] = True # Default to True if not specified by DB
 
+# Schema for profile updates (input); all fields optional
+class UserUpdate(BaseModel):
+    email: Optional[EmailStr] = None
+    full_name: Optional[str] = None
+    is_active: Optional[bool] = None
+
 # Schema for user data stored in DB (used for reading, includes id)
 class UserInDB(UserBase):
     id: int
@@ -37,6 +43,10 @@ class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
 
+class StreamToken(BaseModel):
+    stream_token: str
+    expires_in: int # Seconds
+
 class TokenData(BaseModel):
     email: Optional[EmailStr] = None # Subject of the token (e.g., user's email or ID)
     # You could add other claims like user_id here if needed 
\ No newline at end of file
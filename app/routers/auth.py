@@ -1,14 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.responses import HTMLResponse, RedirectResponse # Removed JSONResponse for now, token endpoint returns Token model
-from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
 from typing import Any, Optional
 
 from app.core import security # For create_access_token and verify_access_token
 from app.core.config import settings
+from app.core.templating import templates
 from app.services import user_service
-from app.db.session import get_db
+from app.db.session import DBSession, get_db, get_read_db, run_db
 from app.db import models as db_models # SQLAlchemy models
 from app.models import user as user_schema # Pydantic schemas
 
@@ -18,33 +17,45 @@ router = APIRouter(
     responses={404: {"description": "Not found"}}
 )
 
-templates = Jinja2Templates(directory="app/templates")
-
 # OAuth2PasswordBearer will look for the token in the Authorization header
 # tokenUrl is the URL that the client will use to get the token (our /auth/token endpoint)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
+# Same, without the automatic 401, for endpoints that also accept the token elsewhere
+oauth2_scheme_optional = OAuth2PasswordBearer(tokenUrl="/auth/token", auto_error=False)
+
+def _hasher_busy_exception() -> HTTPException:
+    # Shed load quickly when the bcrypt pool is saturated rather than queueing logins indefinitely.
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server is busy, please retry shortly.",
+        headers={"Retry-After": "1"},
+    )
 
 @router.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request):
-    return templates.TemplateResponse("login.html", {"request": request, "title": "Login"})
+    return templates.TemplateResponse(request, "login.html", {"title": "Login"})
 
 @router.get("/register", response_class=HTMLResponse)
 async def register_page(request: Request):
-    return templates.TemplateResponse("register.html", {"request": request, "title": "Register"})
+    return templates.TemplateResponse(request, "register.html", {"title": "Register"})
 
 @router.post("/register", response_model=user_schema.User)
 async def process_registration(
     request: Request, # Added request for potential future use with templates
     user_in: user_schema.UserCreate, # Using Pydantic model for request body
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_db)
 ):
-    db_user = user_service.get_user_by_email(db, email=user_in.email)
+    db_user = await run_db(db, user_service.get_user_by_email, email=user_in.email)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered."
         )
-    created_user = user_service.create_user(db=db, user=user_in)
+    try:
+        hashed_password = await security.get_password_hash_async(user_in.password)
+    except security.PasswordHasherBusy:
+        raise _hasher_busy_exception()
+    created_user = await run_db(db, user_service.create_user, user=user_in, hashed_password=hashed_password)
     # Consider automatically logging in the user here by creating a token,
     # or redirecting to login with a success message.
     # For now, returning the created user data (excluding password).
@@ -54,11 +65,14 @@ async def process_registration(
 @router.post("/token", response_model=user_schema.Token)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(), 
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_db)
 ):
-    user = user_service.authenticate_user(
-        db, email=form_data.username, password=form_data.password
-    )
+    try:
+        user = await user_service.authenticate_user(
+            db, email=form_data.username, password=form_data.password
+        )
+    except security.PasswordHasherBusy:
+        raise _hasher_busy_exception()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -66,12 +80,18 @@ async def login_for_access_token(
             headers={"WWW-Authenticate": "Bearer"},
         )
     access_token = security.create_access_token(
-        data={"sub": user.email} # "sub" is a standard claim for the subject (user identifier)
+        # "sub" is a standard claim for the subject (user identifier); "uid" lets protected requests
+        # resolve the principal by primary key (and from the principal cache) instead of by email.
+        data={"sub": user.email, "uid": user.id}
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 
-async def get_current_user_from_token(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Optional[db_models.User]:
+async def get_current_user_from_token(token: str = Depends(oauth2_scheme), db: DBSession = Depends(get_db)) -> Optional[user_schema.UserInDB]:
+    return await _user_from_token(token, db)
+
+async def _user_from_token(token: str, db: DBSession, token_type: Optional[str] = None) -> user_schema.UserInDB:
+    """The user a token was issued to. token_type is the "typ" claim it must carry (None: an access token)."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -80,25 +100,65 @@ async def get_current_user_from_token(token: str = Depends(oauth2_scheme), db: S
     payload = security.verify_access_token(token, credentials_exception)
     if payload is None: # Should not happen if verify_access_token raises on failure
         raise credentials_exception
+    if payload.get("typ") != token_type:
+        raise credentials_exception # e.g. a stream token used as an access token
         
     email: Optional[str] = payload.get("sub")
     if email is None:
         raise credentials_exception # Subject claim (email) missing from token
     
-    user = user_service.get_user_by_email(db, email=email)
+    user_id: Optional[int] = payload.get("uid")
+    if user_id is not None:
+        # Fast path: verified-token cache + principal cache, usually no DB round trip at all.
+        user = await user_service.get_principal(db, user_id=user_id)
+        if user is not None and user.email != email:
+            user = None # Token subject no longer matches the account
+    else:
+        # Tokens issued before the "uid" claim existed
+        db_user = await run_db(db, user_service.get_user_by_email, email=email)
+        user = user_schema.UserInDB.model_validate(db_user) if db_user else None
     if user is None:
         raise credentials_exception # User not found in DB for the given email in token
     return user
 
-async def get_current_active_user(current_user: db_models.User = Depends(get_current_user_from_token)) -> db_models.User:
+async def get_current_active_user(current_user: user_schema.UserInDB = Depends(get_current_user_from_token)) -> user_schema.UserInDB:
     if not current_user.is_active:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
     return current_user
 
 
+async def get_current_stream_user(
+    token: Optional[str] = Depends(oauth2_scheme_optional),
+    stream_token: Optional[str] = None,
+    db: DBSession = Depends(get_db)
+) -> user_schema.UserInDB:
+    """
+    get_current_active_user for server-sent event streams. EventSource can't set headers, so
+    browsers pass ?stream_token= from POST /expenses/stream-token; an access token is only accepted
+    in the Authorization header, never in the URL.
+    """
+    if token:
+        user = await get_current_user_from_token(token=token, db=db)
+    else:
+        user = await _user_from_token(stream_token or "", db, token_type=security.STREAM_TOKEN_TYPE)
+    return await get_current_active_user(current_user=user)
+
+
+async def get_current_active_read_user(
+    token: str = Depends(oauth2_scheme),
+    db: DBSession = Depends(get_read_db)
+) -> user_schema.UserInDB:
+    """
+    get_current_active_user for read-only routes: looks the user up through the same read session
+    (possibly a replica) the route uses, rather than opening a second one on the primary.
+    """
+    user = await get_current_user_from_token(token=token, db=db)
+    return await get_current_active_user(current_user=user)
+
+
 @router.get("/users/me", response_model=user_schema.User)
 async def read_current_user_profile(
-    current_user: db_models.User = Depends(get_current_active_user)
+    current_user: user_schema.UserInDB = Depends(get_current_active_read_user)
 ):
     """
     Protected endpoint. Fetches the profile of the currently authenticated user.
@@ -0,0 +1,93 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Optional
+from datetime import date
+
+from app.db.session import DBSession, get_db, run_db
+from app.services import budget_service
+from app.models import budget as budget_schema
+from app.models import user as user_schema
+from app.routers.auth import get_current_active_user
+
+router = APIRouter(
+    prefix="/budgets",
+    tags=["budgets"],
+    responses={404: {"description": "Not found"}}
+)
+
+def _parse_month(month: Optional[str]):
+    if month is None:
+        return None
+    try:
+        return date.fromisoformat(f"{month}-01")
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="month must be YYYY-MM")
+
+@router.get("/", response_model=List[budget_schema.BudgetInDB])
+async def api_read_budgets(
+    db: DBSession = Depends(get_db),
+    current_user: user_schema.UserInDB = Depends(get_current_active_user)
+):
+    return await run_db(db, budget_service.get_budgets, user_id=current_user.id)
+
+@router.post("/", response_model=budget_schema.BudgetInDB, status_code=status.HTTP_201_CREATED)
+async def api_create_budget(
+    budget: budget_schema.BudgetCreate,
+    db: DBSession = Depends(get_db),
+    current_user: user_schema.UserInDB = Depends(get_current_active_user)
+):
+    try:
+        return await run_db(db, budget_service.create_budget, budget=budget, user_id=current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+# Declared before "/{budget_id}" so "status" isn't parsed as a budget id.
+@router.get("/status", response_model=budget_schema.BudgetStatusReport)
+async def api_budget_status(
+    month: Optional[str] = None,
+    db: DBSession = Depends(get_db),
+    current_user: user_schema.UserInDB = Depends(get_current_active_user)
+):
+    """
+    Spent and remaining amounts per budget for `month` (YYYY-MM, default: the current month).
+    Read from the maintained monthly rollups, so the cost depends on the number of budgets only.
+    """
+    return await run_db(db, budget_service.get_budget_status, user_id=current_user.id, month=_parse_month(month))
+
+@router.get("/{budget_id}", response_model=budget_schema.BudgetInDB)
+async def api_read_budget(
+    budget_id: int,
+    db: DBSession = Depends(get_db),
+    current_user: user_schema.UserInDB = Depends(get_current_active_user)
+):
+    db_budget = await run_db(db, budget_service.get_budget_by_id, budget_id=budget_id, user_id=current_user.id)
+    if db_budget is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Budget not found")
+    return db_budget
+
+@router.put("/{budget_id}", response_model=budget_schema.BudgetInDB)
+async def api_update_budget(
+    budget_id: int,
+    budget_update: budget_schema.BudgetUpdate,
+    db: DBSession = Depends(get_db),
+    current_user: user_schema.UserInDB = Depends(get_current_active_user)
+):
+    try:
+        db_budget = await run_db(
+            db, budget_service.update_budget, budget_id=budget_id, budget_update=budget_update, user_id=current_user.id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    if db_budget is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Budget not found")
+    return db_budget
+
+@router.delete("/{budget_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def api_delete_budget(
+    budget_id: int,
+    db: DBSession = Depends(get_db),
+    current_user: user_schema.UserInDB = Depends(get_current_active_user)
+):
+    success = await run_db(db, budget_service.delete_budget, budget_id=budget_id, user_id=current_user.id)
+    if not success:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Budget not found")
+    return
@@ -1,16 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Form, status
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
-from fastapi.templating import Jinja2Templates
-from typing import List, Optional
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, Form, status
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse
+from typing import List, Optional, Union
 from datetime import date
-from sqlalchemy.orm import Session
 
-from app.db.session import get_db
+from app.core import events, http_cache, security, serialization
+from app.core.config import settings
+from app.core.templating import templates
+from app.db.session import DBSession, close_db, get_db, get_read_db, run_db
 from app.services import budget_service as expense_service
+from app.services import export_service, import_service, search_service, sync_service
 # from app.services import user_service # Not directly needed here if using get_current_active_user
 from app.models import expense as expense_schema
+from app.models import user as user_schema
 from app.db import models as db_models
-from app.routers.auth import get_current_active_user # Import the dependency
+from app.routers.auth import get_current_active_read_user, get_current_active_user, get_current_stream_user # Import the dependency
 
 router = APIRouter(
     prefix="/expenses",
@@ -19,14 +24,12 @@ router = APIRouter(
     responses={404: {"description": "Not found"}}
 )
 
-templates = Jinja2Templates(directory="app/templates")
-
 @router.get("/dashboard", response_class=HTMLResponse)
 async def view_dashboard(request: Request):
     """Serves the dashboard HTML page. Authentication is checked client-side."""
     # Removed Depends(get_current_active_user) and db session dependency
     # The template will be rendered, and JS will handle fetching data if logged in.
-    return templates.TemplateResponse("dashboard.html", {"request": request})
+    return templates.TemplateResponse(request, "dashboard.html", {})
 
 @router.post("/add", response_class=RedirectResponse)
 async def add_expense(
@@ -35,8 +38,8 @@ async def add_expense(
     amount: float = Form(...),
     category: str = Form(...),
     expense_date_str: Optional[str] = Form(None),
-    db: Session = Depends(get_db),
-    current_user: db_models.User = Depends(get_current_active_user) # Added dependency here
+    db: DBSession = Depends(get_db),
+    current_user: user_schema.UserInDB = Depends(get_current_active_user) # Added dependency here
 ):
     try:
         parsed_date = date.fromisoformat(expense_date_str) if expense_date_str else date.today()
@@ -49,40 +52,340 @@ async def add_expense(
         category=category, 
         expense_date=parsed_date
     )
-    created_expense = expense_service.create_expense(db=db, expense=expense_data, user_id=current_user.id)
-    return RedirectResponse(url="/expenses/dashboard", status_code=status.HTTP_303_SEE_OTHER)
+    created_expense = await run_db(db, expense_service.create_expense, expense=expense_data, user_id=current_user.id)
+    response = RedirectResponse(url="/expenses/dashboard", status_code=status.HTTP_303_SEE_OTHER)
+    if created_expense.budget_check is not None:
+        # The category's budget for the expense's month, after this expense (negative when over).
+        response.headers["X-Budget-Remaining"] = str(created_expense.budget_check["remaining"])
+    return response
+
+@router.post("/import", response_model=expense_schema.ImportReport)
+async def import_expenses(
+    request: Request,
+    format: Optional[str] = None,
+    default_category: str = "Uncategorized",
+    db: DBSession = Depends(get_db),
+    current_user: user_schema.UserInDB = Depends(get_current_active_user)
+):
+    """
+    Bulk-imports expenses from a CSV, NDJSON or OFX request body (raw body, not multipart).
+    The format comes from `?format=` or the Content-Type. The body is parsed as it streams in and
+    inserted in batches, one transaction per batch; the report lists every rejected row.
+    """
+    import_format = (format or import_service.detect_format(request.headers.get("content-type")) or "").lower()
+    if import_format not in import_service.SUPPORTED_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Specify ?format= as one of: {', '.join(import_service.SUPPORTED_FORMATS)}",
+        )
+    return await import_service.import_expenses(
+        db,
+        request.stream(),
+        import_format=import_format,
+        user_id=current_user.id,
+        default_category=default_category,
+    )
 
 
-@router.get("/", response_model=List[expense_schema.ExpenseInDB])
+@router.post("/batch", response_model=expense_schema.ExpenseBatchResult)
+async def batch_expenses(
+    batch: expense_schema.ExpenseBatchRequest,
+    db: DBSession = Depends(get_db),
+    current_user: user_schema.UserInDB = Depends(get_current_active_user)
+):
+    """
+    Updates and deletes many expenses in one transaction:
+    {"mode": "atomic"|"best_effort", "operations": [{"op": "update", "id": 1, "changes": {...}},
+    {"op": "delete", "id": 2}, ...]}. `results` has one entry per operation, in request order.
+    In atomic mode (the default) a failed operation means nothing is applied and the response is 409.
+    """
+    if not batch.operations:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="operations must not be empty")
+    if len(batch.operations) > settings.EXPENSE_BATCH_MAX_OPERATIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.EXPENSE_BATCH_MAX_OPERATIONS} operations per batch",
+        )
+    result = await run_db(
+        db, expense_service.batch_mutate_expenses,
+        user_id=current_user.id, operations=batch.operations, atomic=batch.mode == "atomic",
+    )
+    report = expense_schema.ExpenseBatchResult(**result)
+    if batch.mode == "atomic" and not report.applied:
+        return JSONResponse(status_code=status.HTTP_409_CONFLICT, content=report.model_dump(mode="json"))
+    return report
+
+@router.get("/", response_model=Union[List[expense_schema.ExpenseInDB], expense_schema.ExpensePage])
 async def api_read_expenses(
+    request: Request,
     skip: int = 0, 
     limit: int = 100, 
-    db: Session = Depends(get_db),
-    current_user: db_models.User = Depends(get_current_active_user) # Added dependency here
+    cursor: Optional[str] = None,
+    start_date: Optional[date] = Query(None, alias="from"),
+    end_date: Optional[date] = Query(None, alias="to"),
+    category: Optional[List[str]] = Query(None),
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    sort: expense_schema.ExpenseSort = expense_service.DEFAULT_SORT,
+    db: DBSession = Depends(get_read_db),
+    current_user: user_schema.UserInDB = Depends(get_current_active_read_user) # Added dependency here
+):
+    """
+    Lists the user's expenses, newest first by default.
+    Offset mode (skip/limit) returns a plain list, as before. Passing `cursor` switches to keyset
+    mode and returns {"items": [...], "next_cursor": ...}; use an empty cursor for the first page.
+    Filter with `from`/`to` (inclusive dates), repeated `category`, `min_amount`/`max_amount`, and
+    order with `sort` (date_desc, date_asc, amount_desc, amount_asc). A cursor is only valid with
+    the filters and sort it was issued for.
+    Responses carry an ETag; a matching If-None-Match gets 304 without querying expenses.
+    """
+    # Rows are selected as plain columns and validated and encoded once (app/core/serialization.py);
+    # the Response returned skips the response_model pass, which only documents the shape.
+    _check_date_range(start_date, end_date)
+    if min_amount is not None and max_amount is not None and min_amount > max_amount:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="min_amount must not exceed max_amount")
+    filters = expense_schema.ExpenseFilters(
+        start_date=start_date,
+        end_date=end_date,
+        categories=category,
+        min_amount=min_amount,
+        max_amount=max_amount,
+        sort=sort,
+    )
+    # Read the version before the data: a write landing in between then only costs the client a
+    # refetch, never a stale 304.
+    version = await run_db(db, expense_service.get_ledger_version, user_id=current_user.id)
+    etag = http_cache.make_etag("expenses", current_user.id, version, skip, limit, cursor, filters.model_dump_json())
+    if http_cache.etag_matches(request.headers.get("if-none-match"), etag):
+        return http_cache.not_modified(etag)
+    fields = expense_schema.EXPENSE_ROW_FIELDS
+    if cursor is not None:
+        try:
+            rows, next_cursor = await run_db(
+                db, expense_service.get_expense_page,
+                user_id=current_user.id, cursor=cursor, limit=limit, filters=filters, columns=fields,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        page = {"items": serialization.rows_to_dicts(rows, fields), "next_cursor": next_cursor}
+        json_response = serialization.json_response(expense_schema.expense_row_page_adapter, page)
+    else:
+        rows = await run_db(
+            db, expense_service.get_expenses_for_user,
+            user_id=current_user.id, skip=skip, limit=limit, filters=filters, columns=fields,
+        )
+        json_response = serialization.json_response(
+            expense_schema.expense_rows_adapter, serialization.rows_to_dicts(rows, fields)
+        )
+    http_cache.set_validators(json_response, etag)
+    return json_response
+
+@router.post("/stream-token", response_model=user_schema.StreamToken)
+async def create_stream_token(current_user: user_schema.UserInDB = Depends(get_current_active_user)):
+    """A token that opens GET /expenses/stream within the next minute, and is accepted nowhere else."""
+    token = security.create_stream_token({"sub": current_user.email, "uid": current_user.id})
+    return {"stream_token": token, "expires_in": settings.STREAM_TOKEN_EXPIRE_SECONDS}
+
+@router.get("/stream")
+async def stream_expense_events(
+    request: Request,
+    db: DBSession = Depends(get_db),
+    current_user: user_schema.UserInDB = Depends(get_current_stream_user)
+):
+    """
+    Server-sent events for the user's ledger. Each `expense` event is one committed write:
+    {"type": "created"|"updated"|"deleted"|"imported"|"batch", "version": n, "expense": {...},
+    "deltas": [{"month", "category", "total", "count"}]}, with the ledger version as its id.
+    A `ready` event opens the stream. `resync` (or a gap in versions) means events were missed and
+    the client should refetch. Authenticate with the Authorization header or, from a browser's
+    EventSource, ?stream_token= from POST /expenses/stream-token.
+    """
+    # Subscribe before reading the version, so no write can fall between the two.
+    subscription = events.broker.subscribe(current_user.id)
+    try:
+        version = await run_db(db, expense_service.get_ledger_version, user_id=current_user.id)
+    except Exception:
+        events.broker.unsubscribe(subscription)
+        raise
+    await close_db(db) # Don't hold a pooled connection for the life of the stream
+    last_event_id = request.headers.get("last-event-id")
+
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            if last_event_id is not None and last_event_id != str(version):
+                yield events.format_sse({"type": "resync", "version": version}, version)
+            yield events.format_sse({"version": version}, version, name="ready")
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=settings.EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if events.is_shutdown(event):
+                    return
+                event_version = event.get("version")
+                if event_version is not None and event_version <= version:
+                    continue # Already reflected in what the client loaded after "ready"
+                yield events.format_sse(event, event_version)
+        finally:
+            events.broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/search", response_model=expense_schema.ExpenseSearchPage)
+async def api_search_expenses(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: DBSession = Depends(get_db),
+    current_user: user_schema.UserInDB = Depends(get_current_active_user)
 ):
-    db_expenses = expense_service.get_expenses_for_user(db, user_id=current_user.id, skip=skip, limit=limit)
-    return [expense_schema.ExpenseInDB.model_validate(exp) for exp in db_expenses]
+    """
+    Full-text and fuzzy search over the user's expense descriptions, best match first.
+    Page with `offset`; `next_offset` is null on the last page.
+    """
+    hits, next_offset = await run_db(
+        db, search_service.search_expenses, user_id=current_user.id, q=q, limit=limit, offset=offset
+    )
+    return expense_schema.ExpenseSearchPage(
+        items=[
+            expense_schema.ExpenseSearchHit(**expense_schema.ExpenseInDB.model_validate(exp).model_dump(), score=score)
+            for exp, score in hits
+        ],
+        next_offset=next_offset,
+    )
+
+@router.get("/changes", response_model=expense_schema.ExpenseChanges)
+async def api_expense_changes(
+    since: str = Query("0", max_length=40),
+    limit: int = Query(500, ge=1, le=1000),
+    db: DBSession = Depends(get_db),
+    current_user: user_schema.UserInDB = Depends(get_current_active_user)
+):
+    """
+    Expenses inserted, updated (`upserts`) or deleted (`deletes`) after the sync position `since`,
+    for clients that keep a local copy. Start with since=0, then pass back `next_since`; repeat
+    while `has_more` is true. 410 means the position is too old (its deletes were purged): clear
+    the local copy and sync from 0.
+    """
+    try:
+        changes = await run_db(db, sync_service.get_changes, user_id=current_user.id, since=since, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except sync_service.ChangesExpired as e:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail=str(e))
+    return expense_schema.ExpenseChanges(
+        upserts=[expense_schema.ExpenseChange.model_validate(exp) for exp in changes["upserts"]],
+        deletes=[expense_schema.ExpenseTombstone.model_validate(exp) for exp in changes["deletes"]],
+        next_since=changes["next_since"],
+        has_more=changes["has_more"],
+        version=changes["version"],
+    )
+
+@router.get("/export")
+async def export_expenses(
+    format: str = "csv",
+    current_user: user_schema.UserInDB = Depends(get_current_active_user)
+):
+    """
+    Streams the user's full ledger as CSV, NDJSON or Parquet (Parquet needs pyarrow installed).
+    Rows are read through a server-side cursor and written as they arrive.
+    """
+    export_format = format.lower()
+    if export_format not in export_service.SUPPORTED_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"format must be one of: {', '.join(export_service.SUPPORTED_FORMATS)}",
+        )
+    try:
+        encoder = export_service.make_encoder(export_format)
+    except ImportError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Parquet export is not available on this server")
+    return StreamingResponse(
+        export_service.stream_export(current_user.id, encoder),
+        media_type=export_service.MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="expenses.{export_format}"'},
+    )
+
+# --- Spending summaries (aggregated in SQL; used by the dashboard charts) ---
+# These must be declared before "/{expense_id}" so "summary" isn't parsed as an expense id.
+
+def _check_date_range(start_date: Optional[date], end_date: Optional[date]) -> None:
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="start_date must be on or before end_date")
+
+@router.get("/summary", response_model=expense_schema.SpendingSummary)
+async def api_spending_summary(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: DBSession = Depends(get_read_db),
+    current_user: user_schema.UserInDB = Depends(get_current_active_read_user)
+):
+    _check_date_range(start_date, end_date)
+    return await run_db(db, expense_service.get_spending_summary, user_id=current_user.id, start_date=start_date, end_date=end_date)
+
+@router.get("/summary/by-category", response_model=List[expense_schema.CategoryTotal])
+async def api_spending_by_category(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: DBSession = Depends(get_read_db),
+    current_user: user_schema.UserInDB = Depends(get_current_active_read_user)
+):
+    _check_date_range(start_date, end_date)
+    return await run_db(db, expense_service.get_spending_by_category, user_id=current_user.id, start_date=start_date, end_date=end_date)
+
+@router.get("/summary/by-month", response_model=List[expense_schema.MonthlyTotal])
+async def api_spending_by_month(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: DBSession = Depends(get_read_db),
+    current_user: user_schema.UserInDB = Depends(get_current_active_read_user)
+):
+    _check_date_range(start_date, end_date)
+    return await run_db(db, expense_service.get_spending_by_month, user_id=current_user.id, start_date=start_date, end_date=end_date)
+
+@router.get("/summary/by-category-month", response_model=List[expense_schema.CategoryMonthTotal])
+async def api_spending_by_category_month(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: DBSession = Depends(get_read_db),
+    current_user: user_schema.UserInDB = Depends(get_current_active_read_user)
+):
+    _check_date_range(start_date, end_date)
+    return await run_db(db, expense_service.get_spending_by_category_month, user_id=current_user.id, start_date=start_date, end_date=end_date)
 
 @router.get("/{expense_id}", response_model=expense_schema.ExpenseInDB)
 async def api_read_expense(
     expense_id: int, 
-    db: Session = Depends(get_db),
-    current_user: db_models.User = Depends(get_current_active_user) # Added dependency here
+    request: Request,
+    response: Response,
+    db: DBSession = Depends(get_read_db),
+    current_user: user_schema.UserInDB = Depends(get_current_active_read_user) # Added dependency here
 ):
-    db_expense = expense_service.get_expense_by_id(db, expense_id=expense_id, user_id=current_user.id)
+    version = await run_db(db, expense_service.get_ledger_version, user_id=current_user.id)
+    etag = http_cache.make_etag("expense", current_user.id, version, expense_id)
+    if http_cache.etag_matches(request.headers.get("if-none-match"), etag):
+        return http_cache.not_modified(etag)
+    db_expense = await run_db(db, expense_service.get_expense_by_id, expense_id=expense_id, user_id=current_user.id)
     if db_expense is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Expense not found")
+    http_cache.set_validators(response, etag)
     return expense_schema.ExpenseInDB.model_validate(db_expense)
 
 @router.put("/{expense_id}", response_model=expense_schema.ExpenseInDB)
 async def api_update_expense(
     expense_id: int, 
     expense_update: expense_schema.ExpenseUpdate, 
-    db: Session = Depends(get_db),
-    current_user: db_models.User = Depends(get_current_active_user) # Added dependency here
+    db: DBSession = Depends(get_db),
+    current_user: user_schema.UserInDB = Depends(get_current_active_user) # Added dependency here
 ):
-    updated_expense = expense_service.update_expense(
-        db, expense_id=expense_id, expense_update_data=expense_update, user_id=current_user.id
+    updated_expense = await run_db(
+        db, expense_service.update_expense, expense_id=expense_id, expense_update_data=expense_update, user_id=current_user.id
     )
     if updated_expense is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Expense not found or not authorized to update")
@@ -91,10 +394,10 @@ async def api_update_expense(
 @router.delete("/{expense_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def api_delete_expense(
     expense_id: int, 
-    db: Session = Depends(get_db),
-    current_user: db_models.User = Depends(get_current_active_user) # Added dependency here
+    db: DBSession = Depends(get_db),
+    current_user: user_schema.UserInDB = Depends(get_current_active_user) # Added dependency here
 ):
-    success = expense_service.delete_expense(db, expense_id=expense_id, user_id=current_user.id)
+    success = await run_db(db, expense_service.delete_expense, expense_id=expense_id, user_id=current_user.id)
     if not success:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Expense not found or not authorized to delete")
     return 
\ No newline at end of file
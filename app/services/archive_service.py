@@ -0,0 +1,469 @@
+import argparse
+import os
+import re
+import tempfile
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, delete, extract, func, insert, select, text, update
+from sqlalchemy.orm import Session
+
+from app.core import object_storage
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db import models as db_models
+
+# Monthly partitions of expenses and archival of old months.
+#
+# On PostgreSQL expenses is range-partitioned by expense_date month (migration 0007):
+# expenses_yYYYYmMM per month, plus expenses_default for any date without one. ensure_partitions()
+# creates the coming months' partitions ahead of time, so the default partition stays near empty.
+#
+# archive_old_months() moves every month older than EXPENSE_ARCHIVE_AFTER_MONTHS out of the
+# database: the month's live rows (all users) go to one zstd Parquet file under
+# EXPENSE_ARCHIVE_URL, recorded in expense_archives, and the month's partition is then detached
+# and dropped (on SQLite the rows are deleted). The month's rollups stay, so summaries and budgets
+# are unchanged. Archived expenses are read-only: they no longer have a row to update or delete.
+#
+# Queries whose date range reaches into an archived month read its files back (read_expenses,
+# aggregate_expenses): the expense listing, the partial edge months of the summaries, exports and
+# rollup rebuilds. Files are sorted by owner, so a user's read only fetches the row groups whose
+# owner_id statistics include them.
+#
+# Both jobs run from a scheduler (e.g. a daily Cloud Run job), not the web workers:
+#   python -m app.services.archive_service maintain
+
+PARTITION_PREFIX = "expenses_y"
+DEFAULT_PARTITION = "expenses_default"
+_PARTITION_NAME = re.compile(r"^expenses_y(\d{4})m(\d{2})$")
+
+ARCHIVE_COLUMNS = (
+    "id", "owner_id", "description", "amount", "category", "expense_date", "created_at", "updated_at", "change_seq",
+)
+_ROW_GROUP_ROWS = 50000
+_LOCK_TIMEOUT = "10s" # DDL waits at most this long for the table lock, instead of queueing writes behind it
+_INDEX_TTL_SECONDS = 60 # How long a worker may miss a newly archived month
+
+_archive_index = TTLCache("expense_archives", 1, _INDEX_TTL_SECONDS)
+
+
+def add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARTITION_PREFIX}{month.year:04d}m{month.month:02d}"
+
+
+def _month_clause(month: date):
+    return and_(
+        db_models.Expense.expense_date >= month, db_models.Expense.expense_date < add_months(month, 1)
+    )
+
+
+# --- Partitions (PostgreSQL) ---
+
+def is_partitioned(db: Session) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    return bool(db.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'expenses'::regclass)"
+    )).scalar())
+
+
+def list_partitions(db: Session) -> List[date]:
+    """Months that have a partition, oldest first."""
+    names = db.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'expenses'::regclass"
+    )).scalars()
+    months = []
+    for name in names:
+        match = _PARTITION_NAME.match(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def create_partition(db: Session, month: date) -> None:
+    """Create the month's partition. Does not commit."""
+    name = partition_name(month)
+    bounds = f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    params = {"lo": month, "hi": add_months(month, 1)}
+    db.execute(text(f"SET LOCAL lock_timeout = '{_LOCK_TIMEOUT}'"))
+    stray = db.execute(text(
+        f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE expense_date >= :lo AND expense_date < :hi)"
+    ), params).scalar()
+    if not stray:
+        db.execute(text(f"CREATE TABLE {name} PARTITION OF expenses {bounds}"))
+        return
+    # The default partition holds rows for this month (dated ahead of the partitions, or added after
+    # the month was archived). A partition can't be created over them: move them into a plain table
+    # and attach that instead.
+    columns = ", ".join(column.name for column in db_models.Expense.__table__.columns)
+    db.execute(text(f"CREATE TABLE {name} (LIKE expenses INCLUDING DEFAULTS INCLUDING GENERATED)"))
+    db.execute(text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE expense_date >= :lo AND expense_date < :hi "
+        f"RETURNING {columns}) INSERT INTO {name} ({columns}) SELECT {columns} FROM moved"
+    ), params)
+    db.execute(text(f"ALTER TABLE expenses ATTACH PARTITION {name} {bounds}"))
+
+
+def ensure_partitions(db: Session, months_ahead: Optional[int] = None, today: Optional[date] = None) -> List[str]:
+    """Create any missing partitions from this month to months_ahead months ahead. Returns the names created."""
+    if not is_partitioned(db):
+        return []
+    months_ahead = settings.EXPENSE_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    current = (today or date.today()).replace(day=1)
+    existing = set(list_partitions(db))
+    created = []
+    for month in (add_months(current, n) for n in range(months_ahead + 1)):
+        if month in existing:
+            continue
+        try:
+            create_partition(db, month)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        created.append(partition_name(month))
+    return created
+
+
+# --- Archival ---
+
+def _arrow_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("id", pa.int64()),
+        ("owner_id", pa.int64()),
+        ("description", pa.string()),
+        ("amount", pa.float64()),
+        ("category", pa.string()),
+        ("expense_date", pa.date32()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+        ("updated_at", pa.timestamp("us", tz="UTC")),
+        ("change_seq", pa.int64()),
+    ])
+
+
+def _utc(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite hands back naive datetimes, which are UTC (CURRENT_TIMESTAMP)
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _write_parquet(db: Session, month: date, path: str) -> Tuple[int, set, int]:
+    """Write the month's live rows to path, sorted by owner. Returns (rows written, owner ids, highest change_seq)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    Expense = db_models.Expense
+    stmt = (
+        select(*[getattr(Expense, name) for name in ARCHIVE_COLUMNS])
+        .where(_month_clause(month), Expense.deleted_at.is_(None))
+        .order_by(Expense.owner_id, Expense.expense_date, Expense.id)
+        .execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+    )
+    schema = _arrow_schema()
+    timestamps = {ARCHIVE_COLUMNS.index("created_at"), ARCHIVE_COLUMNS.index("updated_at")}
+    owners = set()
+    written = 0
+    max_change_seq = 0
+    pending: List[Sequence] = []
+
+    def flush(writer) -> None:
+        columns = list(zip(*pending))
+        arrays = [
+            pa.array([_utc(v) for v in column] if i in timestamps else list(column), type=field.type)
+            for i, (column, field) in enumerate(zip(columns, schema))
+        ]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        pending.clear()
+
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for batch in db.execute(stmt).partitions():
+            for row in batch:
+                pending.append(row)
+                owners.add(row.owner_id)
+                max_change_seq = max(max_change_seq, row.change_seq)
+            written += len(batch)
+            if len(pending) >= _ROW_GROUP_ROWS:
+                flush(writer)
+        if pending:
+            flush(writer)
+    return written, owners, max_change_seq
+
+
+def archive_month(db: Session, month: date, archive_url: Optional[str] = None) -> Optional[dict]:
+    """
+    Move one month of expenses to an archive file and out of the database, in one transaction.
+    Returns the expense_archives entry written, or None if the month had no live rows.
+    """
+    Expense = db_models.Expense
+    archive_url = archive_url or settings.EXPENSE_ARCHIVE_URL
+    partition = None
+    uploaded = None
+    fd, path = tempfile.mkstemp(suffix=".parquet")
+    os.close(fd)
+    try:
+        if is_partitioned(db):
+            if month in list_partitions(db):
+                partition = partition_name(month)
+            # Writes to the month wait until the archive commits (or fail after the lock timeout);
+            # reads carry on.
+            db.execute(text(f"SET LOCAL lock_timeout = '{_LOCK_TIMEOUT}'"))
+            db.execute(text(f"LOCK TABLE {', '.join(filter(None, [partition, DEFAULT_PARTITION]))} IN EXCLUSIVE MODE"))
+
+        written, owners, max_change_seq = _write_parquet(db, month, path)
+        entry = None
+        if written:
+            key = f"expenses/month={month:%Y-%m}/expenses-{month:%Y-%m}-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}.parquet"
+            uploaded = object_storage.join_url(archive_url, key)
+            object_storage.upload_file(path, uploaded)
+            entry = {
+                "month": month, "uri": uploaded, "row_count": written, "size_bytes": os.path.getsize(path),
+                "max_change_seq": max_change_seq,
+            }
+            db.execute(insert(db_models.ExpenseArchive).values(**entry))
+
+        # Tombstones of the month go too: clients behind them must resync, as after a purge.
+        tombstones = db.execute(
+            select(Expense.owner_id, func.max(Expense.change_seq))
+            .where(_month_clause(month), Expense.deleted_at.is_not(None))
+            .group_by(Expense.owner_id)
+        ).all()
+        for owner_id, max_seq in tombstones:
+            db.execute(
+                update(db_models.User)
+                .where(db_models.User.id == owner_id, db_models.User.purged_change_seq < max_seq)
+                .values(purged_change_seq=max_seq)
+            )
+        if owners:
+            # New ETags: the single-expense route no longer finds these rows.
+            db.execute(
+                update(db_models.User)
+                .where(db_models.User.id.in_(sorted(owners)))
+                .values(ledger_version=db_models.User.ledger_version + 1)
+            )
+
+        if partition:
+            db.execute(text(f"ALTER TABLE expenses DETACH PARTITION {partition}"))
+            db.execute(text(f"DROP TABLE {partition}"))
+        db.execute(delete(Expense).where(_month_clause(month))) # Default-partition rows; all rows on SQLite
+        db.commit()
+    except Exception:
+        db.rollback()
+        if uploaded:
+            object_storage.delete_url(uploaded)
+        raise
+    finally:
+        os.remove(path)
+    _archive_index.clear()
+    return entry
+
+
+def months_to_archive(db: Session, older_than_months: int, today: Optional[date] = None) -> List[date]:
+    """Months before the cutoff that still have rows (or a partition) in the database."""
+    cutoff = add_months((today or date.today()).replace(day=1), -older_than_months)
+    Expense = db_models.Expense
+    year, month = extract("year", Expense.expense_date), extract("month", Expense.expense_date)
+    months = {
+        date(int(y), int(m), 1)
+        for y, m in db.execute(select(year, month).where(Expense.expense_date < cutoff).distinct())
+    }
+    if is_partitioned(db):
+        months.update(month for month in list_partitions(db) if month < cutoff)
+    return sorted(months)
+
+
+def archive_old_months(
+    db: Session, older_than_months: Optional[int] = None, archive_url: Optional[str] = None, today: Optional[date] = None
+) -> List[dict]:
+    """Archive every month older than the cutoff, one transaction each. Returns the archive entries written."""
+    older_than_months = settings.EXPENSE_ARCHIVE_AFTER_MONTHS if older_than_months is None else older_than_months
+    entries = []
+    for month in months_to_archive(db, older_than_months, today=today):
+        entry = archive_month(db, month, archive_url=archive_url)
+        if entry:
+            entries.append(entry)
+    return entries
+
+
+# --- Reading archived months ---
+
+def archived_files(db: Session) -> List[Tuple[date, str]]:
+    """(month, uri) of every archive file, oldest month first. Cached per worker for a minute."""
+    files = _archive_index.get("files")
+    if files is None:
+        ExpenseArchive = db_models.ExpenseArchive
+        files = [
+            (month, uri)
+            for month, uri in db.execute(
+                select(ExpenseArchive.month, ExpenseArchive.uri).order_by(ExpenseArchive.month, ExpenseArchive.id)
+            )
+        ]
+        _archive_index.set("files", files)
+    return files
+
+
+def archived_files_in_range(db: Session, start_date: Optional[date], end_date: Optional[date]) -> List[Tuple[date, str]]:
+    """The archive files whose month overlaps the inclusive date range (None: unbounded)."""
+    return [
+        (month, uri)
+        for month, uri in archived_files(db)
+        if (start_date is None or add_months(month, 1) > start_date) and (end_date is None or month <= end_date)
+    ]
+
+
+def archived_files_changed_after(db: Session, change_seq: int) -> List[Tuple[date, str]]:
+    """
+    The archive files that may hold rows with a change_seq above change_seq. Not cached: delta
+    sync must see a month as soon as archive_month has taken its rows out of expenses.
+    """
+    ExpenseArchive = db_models.ExpenseArchive
+    return [
+        (month, uri)
+        for month, uri in db.execute(
+            select(ExpenseArchive.month, ExpenseArchive.uri)
+            .where((ExpenseArchive.max_change_seq > change_seq) | ExpenseArchive.max_change_seq.is_(None))
+            .order_by(ExpenseArchive.month, ExpenseArchive.id)
+        )
+    ]
+
+
+def _read_table(uri: str, columns: Sequence[str], filters: list):
+    import pyarrow.parquet as pq
+
+    with object_storage.open_url(uri) as source:
+        return pq.read_table(source, columns=list(columns), filters=filters or None)
+
+
+def _naive(value):
+    # Archived timestamps are UTC-aware; SQLite's own are naive UTC.
+    return value.replace(tzinfo=None) if isinstance(value, datetime) else value
+
+
+def read_expenses(
+    files: Iterable[Tuple[date, str]],
+    user_id: int,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    categories: Optional[List[str]] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    columns: Sequence[str] = ARCHIVE_COLUMNS,
+    naive_datetimes: bool = False,
+    changed_after: Optional[int] = None,
+) -> List[dict]:
+    """
+    A user's archived expenses from the given files, filtered like the listing (date bounds
+    inclusive), or to those with a change_seq above changed_after. naive_datetimes returns
+    timestamps the way SQLite does, for merging with its rows.
+    """
+    filters = [("owner_id", "=", user_id)]
+    if changed_after is not None:
+        filters.append(("change_seq", ">", changed_after))
+    if start_date is not None:
+        filters.append(("expense_date", ">=", start_date))
+    if end_date is not None:
+        filters.append(("expense_date", "<=", end_date))
+    if categories:
+        filters.append(("category", "in", list(categories)))
+    if min_amount is not None:
+        filters.append(("amount", ">=", min_amount))
+    if max_amount is not None:
+        filters.append(("amount", "<=", max_amount))
+    rows = []
+    for _, uri in files:
+        rows.extend(_read_table(uri, columns, filters).to_pylist())
+    if naive_datetimes:
+        rows = [{key: _naive(value) for key, value in row.items()} for row in rows]
+    return rows
+
+
+def iter_expense_batches(
+    files: Iterable[Tuple[date, str]], user_id: int, columns: Sequence[str], naive_datetimes: bool = False
+) -> Iterator[List[tuple]]:
+    """A user's archived expenses as tuples of `columns`, one batch per file, ordered by (expense_date, id)."""
+    for _, uri in files:
+        table = _read_table(uri, columns, [("owner_id", "=", user_id)])
+        if table.num_rows:
+            table = table.sort_by([("expense_date", "ascending"), ("id", "ascending")])
+            rows = zip(*[table.column(name).to_pylist() for name in columns])
+            yield [tuple(map(_naive, row)) for row in rows] if naive_datetimes else list(rows)
+
+
+def aggregate_expenses(
+    files: Iterable[Tuple[date, str]],
+    user_id: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+) -> Dict[Tuple[int, date, str], List[float]]:
+    """{(owner_id, month, category): [total, count]} over archived expenses (one user, or all)."""
+    filters = []
+    if user_id is not None:
+        filters.append(("owner_id", "=", user_id))
+    if start_date is not None:
+        filters.append(("expense_date", ">=", start_date))
+    if end_date is not None:
+        filters.append(("expense_date", "<=", end_date))
+    totals = defaultdict(lambda: [0.0, 0])
+    for month, uri in files:
+        table = _read_table(uri, ("owner_id", "category", "amount"), filters)
+        grouped = table.group_by(["owner_id", "category"]).aggregate([("amount", "sum"), ("amount", "count")])
+        for row in grouped.to_pylist():
+            bucket = totals[(row["owner_id"], month, row["category"])]
+            bucket[0] += float(row["amount_sum"] or 0)
+            bucket[1] += row["amount_count"]
+    return totals
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Create expense partitions ahead of time and archive old months.")
+    parser.add_argument("command", choices=["partitions", "archive", "maintain", "status"])
+    parser.add_argument(
+        "--months-ahead", type=int, default=settings.EXPENSE_PARTITION_MONTHS_AHEAD,
+        help="Create partitions through this many months after the current one",
+    )
+    parser.add_argument(
+        "--older-than-months", type=int, default=settings.EXPENSE_ARCHIVE_AFTER_MONTHS,
+        help="Archive months that ended more than this many months before the current one",
+    )
+    parser.add_argument("--archive-url", default=settings.EXPENSE_ARCHIVE_URL, help="file:// or gs:// location for archive files")
+    args = parser.parse_args(argv)
+
+    from app.db.session import SessionLocal
+    if not SessionLocal:
+        print("Error: database is not configured.")
+        return 2
+    db = SessionLocal()
+    try:
+        if args.command == "status":
+            if is_partitioned(db):
+                months = list_partitions(db)
+                print(f"{len(months)} partitions: {months[0]:%Y-%m} to {months[-1]:%Y-%m}" if months else "No partitions.")
+            else:
+                print("expenses is not partitioned (SQLite, or migration 0007 not applied).")
+            for month, uri in archived_files(db):
+                print(f"ARCHIVED {month:%Y-%m} {uri}")
+            return 0
+        if args.command in ("partitions", "maintain"):
+            created = ensure_partitions(db, months_ahead=args.months_ahead)
+            print(f"Created {len(created)} partitions{': ' + ', '.join(created) if created else '.'}")
+        if args.command in ("archive", "maintain"):
+            entries = archive_old_months(db, older_than_months=args.older_than_months, archive_url=args.archive_url)
+            for entry in entries:
+                print(f"Archived {entry['row_count']} expenses of {entry['month']:%Y-%m} to {entry['uri']}")
+            print(f"Archived {len(entries)} months older than {args.older_than_months} months.")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
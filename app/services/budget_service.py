@@ -1,11 +1,24 @@
 # Placeholder for budget_service.py
 # This service will handle the business logic for expenses and users.
 
+import base64
+import binascii
+import csv
+import functools
+import io
+import json
+from collections import defaultdict, namedtuple
+
+from sqlalchemy import Integer, String, and_, any_, bindparam, extract, func, insert, literal, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from app.db import models as db_models
+from app.core import events
+from app.db import models as db_models, replicas
+from app.models import budget as budget_schema
 from app.models import expense as expense_schema # Pydantic schemas
-from datetime import date
-from typing import List, Optional
+from app.services import archive_service, rollup_service
+from datetime import date, datetime, timedelta, timezone
+from typing import List, Optional, Tuple
 
 # Example User functions (if not in a dedicated user_service.py)
 # def get_user_by_email(db: Session, email: str):
@@ -53,30 +66,386 @@ from typing import List, Optional
 #     db.commit()
 #     return True
 
-def get_expense_by_id(db: Session, expense_id: int, user_id: int) -> Optional[db_models.Expense]:
-    """Fetch a specific expense by its ID, ensuring it belongs to the user."""
-    return db.query(db_models.Expense).filter(db_models.Expense.id == expense_id, db_models.Expense.owner_id == user_id).first()
+# --- Ledger version ---
+# users.ledger_version changes whenever any of the user's expenses change, in the same transaction.
+# The routers derive ETags from it, so a conditional GET costs one primary-key lookup on users.
+
+def get_ledger_version(db: Session, user_id: int) -> int:
+    version = db.query(db_models.User.ledger_version).filter(db_models.User.id == user_id).scalar()
+    return version or 0
+
+def bump_ledger_version(db: Session, user_id: int) -> int:
+    """Increment the user's ledger version and return the new value. Does not commit; call before the write's commit."""
+    replicas.mark_written(db, user_id) # Every write comes through here; read-your-writes keys off it
+    stmt = (
+        update(db_models.User)
+        .where(db_models.User.id == user_id)
+        .values(ledger_version=db_models.User.ledger_version + 1)
+        .returning(db_models.User.ledger_version)
+    )
+    return db.execute(stmt).scalar() or 0
+
+# --- Change events ---
+# Queued on the session with the new ledger version and published only if the write commits
+# (app/core/events.py). Aggregates travel as the same (month, category) deltas applied to the
+# rollups, so the dashboard patches its charts without refetching the summary.
+
+def _delta_payload(deltas: rollup_service.RollupDeltas) -> List[dict]:
+    return [
+        {"month": _month_key(month.year, month.month), "category": category, "total": round(total, 2), "count": count}
+        for (month, category), (total, count) in sorted(deltas.items())
+        if count or total
+    ]
+
+def _queue_expense_event(db: Session, user_id: int, event_type: str, version: int, deltas, **fields) -> None:
+    events.queue_event(db, user_id, {"type": event_type, "version": version, "deltas": _delta_payload(deltas), **fields})
+
+def _expense_payload(expense: db_models.Expense) -> dict:
+    return expense_schema.ExpenseInDB.model_validate(expense).model_dump(mode="json")
+
+def get_expense_by_id(
+    db: Session, expense_id: int, user_id: int, for_update: bool = False
+) -> Optional[db_models.Expense]:
+    """
+    Fetch a specific expense by its ID, ensuring it belongs to the user. for_update locks the row
+    (PostgreSQL) until the transaction ends, so the values read are the ones a write replaces.
+    """
+    query = db.query(db_models.Expense).filter(
+        db_models.Expense.id == expense_id,
+        db_models.Expense.owner_id == user_id,
+        db_models.Expense.deleted_at.is_(None),
+    )
+    if for_update:
+        query = query.with_for_update().populate_existing()
+    return query.first()
+
+# Listing orders. id is the final tie-breaker so every order is total, which keyset pagination
+# relies on (and which keeps offset pages stable for rows created in the same second). Each order's
+# key is the tail of an (owner_id, ...) index, scanned forwards or backwards:
+#   date_*   -> ix_expenses_owner_date_created_id (owner_id, expense_date, created_at, id)
+#   amount_* -> ix_expenses_owner_amount_id (owner_id, amount, id)
+_SORT_KEYS = {
+    "date": (
+        (db_models.Expense.expense_date, date.fromisoformat),
+        (db_models.Expense.created_at, datetime.fromisoformat),
+        (db_models.Expense.id, int),
+    ),
+    "amount": (
+        (db_models.Expense.amount, float),
+        (db_models.Expense.id, int),
+    ),
+}
+DEFAULT_SORT = "date_desc"
+
+def _sort_key(sort: str):
+    """Split "amount_desc" into (key columns with their decoders, descending)."""
+    key, _, direction = sort.rpartition("_")
+    if key not in _SORT_KEYS or direction not in ("asc", "desc"):
+        raise ValueError(f"Unknown sort order: {sort!r}")
+    return _SORT_KEYS[key], direction == "desc"
+
+def _list_order(sort: str) -> list:
+    columns, descending = _sort_key(sort)
+    return [column.desc() if descending else column.asc() for column, _ in columns]
+
+def encode_expense_cursor(expense: db_models.Expense, sort: str = DEFAULT_SORT) -> str:
+    """Build the opaque cursor pointing just past `expense` (an Expense or a column Row) in the given listing order."""
+    columns, _ = _sort_key(sort)
+    values = [getattr(expense, column.key) for column, _ in columns]
+    raw = json.dumps([value.isoformat() if isinstance(value, (date, datetime)) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_expense_cursor(cursor: str, sort: str = DEFAULT_SORT) -> tuple:
+    """Parse a cursor produced by encode_expense_cursor for the same sort. Raises ValueError if it is malformed."""
+    columns, _ = _sort_key(sort)
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if len(values) != len(columns):
+            raise ValueError("wrong number of values")
+        return tuple(decode(value) for (_, decode), value in zip(columns, values))
+    except (ValueError, TypeError, binascii.Error) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+def _cursor_timestamp(db: Session, value: datetime):
+    # SQLite keeps server-default timestamps as "YYYY-MM-DD HH:MM:SS" text, while SQLAlchemy binds
+    # datetimes with a ".ffffff" suffix; compare against the stored text form so ties sort correctly.
+    if db.get_bind().dialect.name == "sqlite":
+        text_value = value.isoformat(sep=" ", timespec="microseconds" if value.microsecond else "seconds")
+        return literal(text_value, String)
+    return value
+
+def _list_filters(user_id: int, filters: expense_schema.ExpenseFilters) -> list:
+    """WHERE clause for the expense listing. owner_id always leads, matching every listing index."""
+    clauses = _summary_filters(user_id, filters.start_date, filters.end_date)
+    if filters.categories:
+        clauses.append(db_models.Expense.category.in_(filters.categories))
+    if filters.min_amount is not None:
+        clauses.append(db_models.Expense.amount >= filters.min_amount)
+    if filters.max_amount is not None:
+        clauses.append(db_models.Expense.amount <= filters.max_amount)
+    return clauses
+
+def build_expense_query(
+    db: Session,
+    user_id: int,
+    filters: Optional[expense_schema.ExpenseFilters] = None,
+    after: Optional[tuple] = None,
+    columns: Optional[Tuple[str, ...]] = None,
+):
+    """The listing query without OFFSET/LIMIT; benchmarks.plans EXPLAINs it.
+
+    With `columns` (Expense attribute names) it selects just those, as Row tuples, instead of ORM objects.
+    """
+    filters = filters or expense_schema.ExpenseFilters()
+    entities = [getattr(db_models.Expense, name) for name in columns] if columns else [db_models.Expense]
+    query = (
+        db.query(*entities)
+        .filter(*_list_filters(user_id, filters))
+        .order_by(*_list_order(filters.sort))
+    )
+    if after is not None:
+        # Row-value comparison against the cursor on the sort key, e.g. (date, created_at, id) < cursor,
+        # which the matching (owner_id, ...) index serves as a range scan.
+        columns, descending = _sort_key(filters.sort)
+        values = [
+            _cursor_timestamp(db, value) if isinstance(value, datetime) else value for value in after
+        ]
+        key = tuple_(*[column for column, _ in columns])
+        query = query.filter(key < tuple_(*values) if descending else key > tuple_(*values))
+    return query
+
+# --- Archived months in the listing ---
+# Months moved out of expenses by archive_service are read back from their Parquet files when the
+# listing's date range reaches into them, and merged with the live rows in listing order. Archived
+# rows come back as transient Expense objects, or tuples of `columns`, like live ones.
+#
+# Files are only read when the page can include their rows: their month must be within the date
+# filters, on the far side of a date cursor, and hold some of the user's expenses in the filtered
+# categories according to expense_rollups (archived months keep their rollups), so a user with
+# nothing archived never touches object storage whatever the sort.
+
+def _archive_files_for_page(
+    db: Session, user_id: int, filters: expense_schema.ExpenseFilters, after: Optional[tuple]
+) -> list:
+    files = archive_service.archived_files_in_range(db, filters.start_date, filters.end_date)
+    if files and after is not None and filters.sort.startswith("date"):
+        cursor_date = after[0]
+        if filters.sort == "date_desc":
+            files = [(month, uri) for month, uri in files if month <= cursor_date]
+        else:
+            files = [(month, uri) for month, uri in files if archive_service.add_months(month, 1) > cursor_date]
+    if not files:
+        return files
+    query = db.query(db_models.ExpenseRollup.month).filter(
+        db_models.ExpenseRollup.owner_id == user_id,
+        db_models.ExpenseRollup.count > 0,
+        db_models.ExpenseRollup.month.in_({month for month, _ in files}),
+    )
+    if filters.categories:
+        query = query.filter(db_models.ExpenseRollup.category.in_(filters.categories))
+    months = {month for month, in query.distinct()}
+    return [(month, uri) for month, uri in files if month in months]
+
+def _page_precedes_archive(rows: list, limit: int, sort: str, files: list) -> bool:
+    # A full page sorted by date that ends before the archived months begin (newest first: after
+    # the last one; oldest first: before the first one): every archived row sorts after this page,
+    # so the files aren't read.
+    if len(rows) < limit:
+        return False
+    if sort == "date_desc":
+        return rows[-1].expense_date >= archive_service.add_months(files[-1][0], 1)
+    if sort == "date_asc":
+        return rows[-1].expense_date < files[0][0]
+    return False
+
+def _merge_value(value):
+    # Live rows have naive datetimes on SQLite and aware ones on PostgreSQL; archived rows are
+    # aware (UTC). Compare them all as naive UTC.
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+@functools.lru_cache(maxsize=None)
+def _archived_row_type(columns: Tuple[str, ...]):
+    return namedtuple("ArchivedExpenseRow", columns)
+
+def _archived_row(values: dict, columns: Optional[Tuple[str, ...]]):
+    if columns:
+        return _archived_row_type(tuple(columns))(*[values[name] for name in columns])
+    return db_models.Expense(**values)
+
+def _merge_archived(
+    db: Session,
+    user_id: int,
+    rows: list,
+    skip: int,
+    limit: int,
+    after: Optional[tuple],
+    filters: expense_schema.ExpenseFilters,
+    columns: Optional[Tuple[str, ...]],
+    files: list,
+) -> list:
+    key_columns, descending = _sort_key(filters.sort)
+
+    def sort_key(row) -> tuple:
+        return tuple(_merge_value(getattr(row, column.key)) for column, _ in key_columns)
+
+    if after is None and skip:
+        # The page may start anywhere in the merged order: take the first skip + limit of both sides.
+        rows = build_expense_query(db, user_id, filters=filters, columns=columns).limit(skip + limit).all()
+    archived = [
+        _archived_row(values, columns)
+        for values in archive_service.read_expenses(
+            files, user_id,
+            start_date=filters.start_date, end_date=filters.end_date, categories=filters.categories,
+            min_amount=filters.min_amount, max_amount=filters.max_amount,
+            naive_datetimes=db.get_bind().dialect.name == "sqlite",
+        )
+    ]
+    if after is not None:
+        bound = tuple(_merge_value(value) for value in after)
+        archived = [row for row in archived if (sort_key(row) < bound if descending else sort_key(row) > bound)]
+    merged = sorted([*rows, *archived], key=sort_key, reverse=descending)
+    start = skip if after is None else 0
+    return merged[start:start + limit]
 
-def get_expenses_for_user(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[db_models.Expense]:
-    """Fetch all expenses for a specific user with pagination."""
-    return db.query(db_models.Expense).filter(db_models.Expense.owner_id == user_id).order_by(db_models.Expense.expense_date.desc(), db_models.Expense.created_at.desc()).offset(skip).limit(limit).all()
+def get_expenses_for_user(
+    db: Session,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[tuple] = None,
+    filters: Optional[expense_schema.ExpenseFilters] = None,
+    columns: Optional[Tuple[str, ...]] = None,
+) -> List[db_models.Expense]:
+    """Fetch expenses for a specific user, newest first unless `filters.sort` says otherwise.
+
+    Pass `after` (a decoded cursor) to seek past a known row instead of using OFFSET, and
+    `columns` to get Row tuples of just those columns (see build_expense_query); they must include
+    the sort key's columns. Archived months in the filtered range are merged in.
+    """
+    query = build_expense_query(db, user_id, filters=filters, after=after, columns=columns)
+    if after is None:
+        query = query.offset(skip)
+    rows = query.limit(limit).all()
+    filters = filters or expense_schema.ExpenseFilters()
+    files = _archive_files_for_page(db, user_id, filters, after)
+    if not files or _page_precedes_archive(rows, limit, filters.sort, files):
+        return rows
+    return _merge_archived(db, user_id, rows, skip, limit, after, filters, columns, files)
+
+def get_expense_page(
+    db: Session,
+    user_id: int,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    filters: Optional[expense_schema.ExpenseFilters] = None,
+    columns: Optional[Tuple[str, ...]] = None,
+) -> Tuple[List[db_models.Expense], Optional[str]]:
+    """Fetch one keyset page of expenses. Returns (items, next_cursor); next_cursor is None on the last page.
+
+    `columns` must include the sort key's columns, which the cursor is built from.
+    """
+    sort = filters.sort if filters else DEFAULT_SORT
+    after = decode_expense_cursor(cursor, sort) if cursor else None
+    # Fetch one extra row to learn whether another page exists without a COUNT query.
+    rows = get_expenses_for_user(db, user_id=user_id, limit=limit + 1, after=after, filters=filters, columns=columns)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_expense_cursor(rows[-1], sort)
+    return rows, None
 
 def create_expense(db: Session, expense: expense_schema.ExpenseCreate, user_id: int) -> db_models.Expense:
     """Create a new expense for a user."""
+    # Bumped first: the new version is the row's change_seq, and the users row lock it takes
+    # orders this user's concurrent writes, so change_seq commits in increasing order.
+    version = bump_ledger_version(db, user_id)
     db_expense = db_models.Expense(
         **expense.model_dump(), # Use model_dump() for Pydantic v2
         owner_id=user_id,
+        change_seq=version,
         # expense_date will use default from model or value from schema
     )
     if expense.expense_date is None: # Ensure model default is used if not provided
         db_expense.expense_date = date.today()
         
     db.add(db_expense)
+    db.flush() # Assigns id and created_at (eager_defaults: RETURNING, no extra query) for the event
+    deltas = rollup_service.new_deltas()
+    rollup_service.add_delta(deltas, db_expense.expense_date, db_expense.category, db_expense.amount, 1)
+    rollup_service.apply_deltas(db, user_id, deltas)
+    # Reads the rollup row just updated above, so the check sees this expense (two-key lookups, O(1)).
+    budget_check = check_budget(db, user_id, db_expense.expense_date, db_expense.category)
+    _queue_expense_event(db, user_id, "created", version, deltas, expense=_expense_payload(db_expense))
     db.commit()
     db.refresh(db_expense)
+    db_expense.budget_check = budget_check # Not a column; for the caller only
     print(f"Created expense '{db_expense.description}' for user_id {user_id}")
+    if budget_check and budget_check["over_budget"]:
+        print(f"user_id {user_id} is over the {db_expense.category} budget for {budget_check['month']}")
     return db_expense
 
+def bulk_create_expenses(db: Session, expenses: List[expense_schema.ExpenseCreate], user_id: int) -> int:
+    """
+    Insert a batch of already-validated expenses for a user in a single transaction.
+    Uses PostgreSQL COPY when the session runs on psycopg2, otherwise one multi-row
+    INSERT ... VALUES statement. Returns the number of rows inserted.
+    """
+    if not expenses:
+        return 0
+    today = date.today()
+    version = bump_ledger_version(db, user_id)
+    rows = [
+        {
+            "description": e.description,
+            "amount": e.amount,
+            "category": e.category,
+            "expense_date": e.expense_date or today,
+            "owner_id": user_id,
+            "change_seq": version,
+        }
+        for e in expenses
+    ]
+    deltas = rollup_service.new_deltas()
+    for row in rows:
+        rollup_service.add_delta(deltas, row["expense_date"], row["category"], row["amount"], 1)
+    try:
+        bind = db.get_bind()
+        if bind.dialect.name == "postgresql" and bind.dialect.driver in ("psycopg2", "pg8000"):
+            _copy_expense_rows(db, rows, bind.dialect.driver)
+        else:
+            db.execute(insert(db_models.Expense).values(rows))
+        rollup_service.apply_deltas(db, user_id, deltas)
+        # Rows aren't sent for bulk inserts; the count tells the dashboard to reload its list.
+        _queue_expense_event(db, user_id, "imported", version, deltas, count=len(rows))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    print(f"Bulk-inserted {len(rows)} expenses for user_id {user_id}")
+    return len(rows)
+
+_COPY_COLUMNS = ("description", "amount", "category", "expense_date", "owner_id", "change_seq")
+
+def _copy_expense_rows(db: Session, rows: List[dict], driver: str) -> None:
+    # COPY runs on the session's own connection, so it shares the batch transaction.
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row[col] for col in _COPY_COLUMNS])
+    buffer.seek(0)
+    sql = f"COPY {db_models.Expense.__tablename__} ({', '.join(_COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)"
+    dbapi_conn = db.connection().connection.dbapi_connection
+    cursor = dbapi_conn.cursor()
+    try:
+        if driver == "psycopg2":
+            cursor.copy_expert(sql, buffer)
+        else: # pg8000 (used by the Cloud SQL connector) streams COPY data via execute(stream=...)
+            cursor.execute(sql, stream=buffer)
+    finally:
+        cursor.close()
+
 def update_expense(
     db: Session, 
     expense_id: int, 
@@ -84,29 +453,451 @@ def update_expense(
     user_id: int
 ) -> Optional[db_models.Expense]:
     """Update an existing expense for a user."""
-    db_expense = get_expense_by_id(db=db, expense_id=expense_id, user_id=user_id)
+    # Locked: the old values below become the rollup's -1 delta, so a concurrent update of the same
+    # expense must wait for this one and then read its result.
+    db_expense = get_expense_by_id(db=db, expense_id=expense_id, user_id=user_id, for_update=True)
     if not db_expense:
+        db.rollback() # Release the lock
         return None
     
+    deltas = rollup_service.new_deltas()
+    rollup_service.add_delta(deltas, db_expense.expense_date, db_expense.category, db_expense.amount, -1)
     update_data = expense_update_data.model_dump(exclude_unset=True) # Pydantic v2
     for key, value in update_data.items():
         setattr(db_expense, key, value)
+    rollup_service.add_delta(deltas, db_expense.expense_date, db_expense.category, db_expense.amount, 1)
     
+    version = bump_ledger_version(db, user_id)
+    db_expense.change_seq = version
     db.add(db_expense) # or db.commit() if only this change
+    rollup_service.apply_deltas(db, user_id, deltas)
+    _queue_expense_event(db, user_id, "updated", version, deltas, expense=_expense_payload(db_expense))
     db.commit()
     db.refresh(db_expense)
     print(f"Updated expense id {expense_id} for user_id {user_id}")
     return db_expense
 
 def delete_expense(db: Session, expense_id: int, user_id: int) -> bool:
-    """Delete an expense for a user."""
-    db_expense = get_expense_by_id(db=db, expense_id=expense_id, user_id=user_id)
+    """Delete an expense for a user, leaving a tombstone for delta sync (see sync_service)."""
+    db_expense = get_expense_by_id(db=db, expense_id=expense_id, user_id=user_id, for_update=True)
     if not db_expense:
+        db.rollback() # Release the lock
         return False
     
-    db.delete(db_expense)
+    deltas = rollup_service.new_deltas()
+    rollup_service.add_delta(deltas, db_expense.expense_date, db_expense.category, db_expense.amount, -1)
+    version = bump_ledger_version(db, user_id)
+    # Only a live row: where the row lock isn't available (SQLite), a concurrent delete may already
+    # have removed it, and its rollup delta must not be applied twice.
+    result = db.execute(
+        update(db_models.Expense)
+        .where(
+            db_models.Expense.id == expense_id,
+            db_models.Expense.owner_id == user_id,
+            db_models.Expense.deleted_at.is_(None),
+        )
+        .values(deleted_at=datetime.now(timezone.utc), change_seq=version)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.rollback()
+        return False
+    rollup_service.apply_deltas(db, user_id, deltas)
+    _queue_expense_event(db, user_id, "deleted", version, deltas, expense={"id": expense_id})
     db.commit()
     print(f"Deleted expense id {expense_id} for user_id {user_id}")
     return True
 
-# print("budget_service.py loaded (placeholder)") # Removed this line 
\ No newline at end of file
+# --- Batch mutations ---
+# POST /expenses/batch. Instead of a lookup, write, commit and refresh per expense, a batch reads
+# every target row in one SELECT (which also yields the old values for the rollup deltas), then
+# writes with one set-based UPDATE for all deletes and one per distinct set of changes (typically
+# a single one, e.g. re-categorising many expenses), all in one transaction under one new ledger
+# version.
+
+_NOT_NULL_FIELDS = ("description", "amount", "category", "expense_date")
+
+def _ids_clause(dialect: str, ids: List[int]):
+    # PostgreSQL: one array parameter (id = ANY(:ids)), so the statement text doesn't vary with the
+    # batch size. Elsewhere: an expanding IN list.
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import ARRAY
+
+        return db_models.Expense.id == any_(bindparam("ids", ids, type_=ARRAY(Integer)))
+    return db_models.Expense.id.in_(ids)
+
+def _batch_item(index: int, operation: expense_schema.ExpenseBatchOperation, status: str, error: Optional[str] = None) -> dict:
+    return {"index": index, "id": operation.id, "op": operation.op, "status": status, "error": error}
+
+def batch_mutate_expenses(
+    db: Session,
+    user_id: int,
+    operations: List[expense_schema.ExpenseBatchOperation],
+    atomic: bool = True,
+) -> dict:
+    """
+    Apply update and delete operations to the user's expenses in one transaction. Returns a dict
+    shaped like ExpenseBatchResult. In atomic mode any failed operation means nothing is written;
+    otherwise the valid operations are applied and the rest reported.
+    """
+    results: List[Optional[dict]] = [None] * len(operations)
+    id_counts = defaultdict(int)
+    for operation in operations:
+        id_counts[operation.id] += 1
+    valid = []
+    for index, operation in enumerate(operations):
+        changes = None
+        if id_counts[operation.id] > 1:
+            results[index] = _batch_item(index, operation, "invalid", "Expense id appears more than once in the batch")
+            continue
+        if operation.op == "update":
+            changes = operation.changes.model_dump(exclude_unset=True) if operation.changes else {}
+            if not changes:
+                results[index] = _batch_item(index, operation, "invalid", "Update has no changes")
+                continue
+            nulls = [field for field in _NOT_NULL_FIELDS if field in changes and changes[field] is None]
+            if nulls:
+                results[index] = _batch_item(index, operation, "invalid", f"{', '.join(nulls)} cannot be null")
+                continue
+        valid.append((index, operation, changes))
+
+    current = {}
+    dialect = db.get_bind().dialect.name
+    if valid:
+        # One read for every target: ownership, liveness and the old values, locked (PostgreSQL)
+        # in id order so concurrent batches can't deadlock on each other.
+        stmt = (
+            select(
+                db_models.Expense.id, db_models.Expense.expense_date,
+                db_models.Expense.category, db_models.Expense.amount,
+            )
+            .where(
+                db_models.Expense.owner_id == user_id,
+                db_models.Expense.deleted_at.is_(None),
+                _ids_clause(dialect, [operation.id for _, operation, _ in valid]),
+            )
+            .order_by(db_models.Expense.id)
+            .with_for_update()
+        )
+        current = {row.id: row for row in db.execute(stmt)}
+    applicable = []
+    for index, operation, changes in valid:
+        if operation.id not in current:
+            results[index] = _batch_item(index, operation, "not_found", "Expense not found")
+        else:
+            applicable.append((index, operation, changes))
+
+    failed = len(operations) - len(applicable)
+    if not applicable or (atomic and failed):
+        db.rollback() # Release the row locks
+        for index, operation, _ in applicable:
+            results[index] = _batch_item(index, operation, "skipped")
+        return {
+            "mode": "atomic" if atomic else "best_effort", "applied": False, "updated": 0, "deleted": 0,
+            "failed": failed, "version": get_ledger_version(db, user_id), "results": results,
+        }
+
+    try:
+        version = bump_ledger_version(db, user_id)
+        deltas = rollup_service.new_deltas()
+        deleted_ids = []
+        updates = defaultdict(list) # change set -> ids
+        for index, operation, changes in applicable:
+            old = current[operation.id]
+            rollup_service.add_delta(deltas, old.expense_date, old.category, old.amount, -1)
+            if operation.op == "delete":
+                deleted_ids.append(operation.id)
+                results[index] = _batch_item(index, operation, "deleted")
+                continue
+            rollup_service.add_delta(
+                deltas,
+                changes.get("expense_date", old.expense_date),
+                changes.get("category", old.category),
+                changes.get("amount", old.amount),
+                1,
+            )
+            updates[tuple(sorted(changes.items()))].append(operation.id)
+            results[index] = _batch_item(index, operation, "updated")
+
+        owned = [db_models.Expense.owner_id == user_id, db_models.Expense.deleted_at.is_(None)]
+        if deleted_ids:
+            db.execute(
+                update(db_models.Expense)
+                .where(*owned, _ids_clause(dialect, deleted_ids))
+                .values(deleted_at=datetime.now(timezone.utc), change_seq=version)
+                .execution_options(synchronize_session=False)
+            )
+        for change_set, ids in updates.items():
+            db.execute(
+                update(db_models.Expense)
+                .where(*owned, _ids_clause(dialect, ids))
+                .values(**dict(change_set), change_seq=version)
+                .execution_options(synchronize_session=False)
+            )
+        rollup_service.apply_deltas(db, user_id, deltas)
+        updated_count = sum(len(ids) for ids in updates.values())
+        # Like a bulk import: one event with the aggregate deltas; the dashboard refetches its list.
+        _queue_expense_event(
+            db, user_id, "batch", version, deltas,
+            updated=updated_count, deleted=len(deleted_ids),
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    print(f"Batch for user_id {user_id}: {updated_count} updated, {len(deleted_ids)} deleted, {failed} failed")
+    return {
+        "mode": "atomic" if atomic else "best_effort", "applied": True, "updated": updated_count,
+        "deleted": len(deleted_ids), "failed": failed, "version": version, "results": results,
+    }
+
+# --- Spending aggregations ---
+# These back the /expenses/summary endpoints. Whole months are read from the incrementally
+# maintained expense_rollups table (O(months x categories)); only the partial months at the edges
+# of a date range are aggregated from raw expenses with GROUP BY, which the
+# (owner_id, expense_date, category) index on the expenses table serves.
+
+def _summary_filters(user_id: int, start_date: Optional[date], end_date: Optional[date]) -> list:
+    """Build the WHERE clause shared by the raw summary queries (date bounds are inclusive)."""
+    filters = [db_models.Expense.owner_id == user_id, db_models.Expense.deleted_at.is_(None)]
+    if start_date is not None:
+        filters.append(db_models.Expense.expense_date >= start_date)
+    if end_date is not None:
+        filters.append(db_models.Expense.expense_date <= end_date)
+    return filters
+
+def _month_columns():
+    # EXTRACT compiles on both PostgreSQL and SQLite, unlike date_trunc/strftime.
+    return (
+        extract("year", db_models.Expense.expense_date).label("year"),
+        extract("month", db_models.Expense.expense_date).label("month"),
+    )
+
+def _month_key(year, month) -> str:
+    return f"{int(year):04d}-{int(month):02d}"
+
+def _add_raw_totals(db: Session, user_id: int, start_date: date, end_date: date, totals: dict) -> None:
+    year, month = _month_columns()
+    rows = (
+        db.query(
+            year, month, db_models.Expense.category,
+            func.sum(db_models.Expense.amount).label("total"), func.count(db_models.Expense.id).label("count"),
+        )
+        .filter(*_summary_filters(user_id, start_date, end_date))
+        .group_by(year, month, db_models.Expense.category)
+        .all()
+    )
+    for r in rows:
+        bucket = totals[(_month_key(r.year, r.month), r.category)]
+        bucket[0] += float(r.total or 0)
+        bucket[1] += r.count
+    files = archive_service.archived_files_in_range(db, start_date, end_date)
+    if files:
+        archived = archive_service.aggregate_expenses(files, user_id=user_id, start_date=start_date, end_date=end_date)
+        for (_, month, category), (total, count) in archived.items():
+            bucket = totals[(_month_key(month.year, month.month), category)]
+            bucket[0] += total
+            bucket[1] += count
+
+def _split_summary_range(start_date: Optional[date], end_date: Optional[date]):
+    """
+    Split an inclusive date range into whole months (served by rollups) and partial edge months
+    (aggregated from expenses). Returns (use_rollups, rollup_from, rollup_to, raw_ranges), where
+    the rollup bounds are first-of-month dates or None for unbounded.
+    """
+    if start_date and end_date and rollup_service.month_start(start_date) == rollup_service.month_start(end_date):
+        if start_date.day == 1 and end_date == rollup_service.month_end(end_date):
+            return True, start_date, start_date, []
+        return False, None, None, [(start_date, end_date)]
+    raw_ranges = []
+    rollup_from = rollup_to = None
+    if start_date is not None:
+        if start_date.day == 1:
+            rollup_from = start_date
+        else:
+            head_end = rollup_service.month_end(start_date)
+            raw_ranges.append((start_date, head_end))
+            rollup_from = head_end + timedelta(days=1)
+    if end_date is not None:
+        if end_date == rollup_service.month_end(end_date):
+            rollup_to = rollup_service.month_start(end_date)
+        else:
+            tail_start = rollup_service.month_start(end_date)
+            raw_ranges.append((tail_start, end_date))
+            rollup_to = rollup_service.month_start(tail_start - timedelta(days=1))
+    use_rollups = rollup_from is None or rollup_to is None or rollup_from <= rollup_to
+    return use_rollups, rollup_from, rollup_to, raw_ranges
+
+def _category_month_totals(
+    db: Session, user_id: int, start_date: Optional[date], end_date: Optional[date]
+) -> dict:
+    """{("YYYY-MM", category): [total, count]} for the range, combining rollups and edge months."""
+    totals = defaultdict(lambda: [0.0, 0])
+    use_rollups, rollup_from, rollup_to, raw_ranges = _split_summary_range(start_date, end_date)
+    if use_rollups:
+        for r in rollup_service.get_rollups(db, user_id=user_id, from_month=rollup_from, to_month=rollup_to):
+            bucket = totals[(_month_key(r.month.year, r.month.month), r.category)]
+            bucket[0] += r.total
+            bucket[1] += r.count
+    for raw_start, raw_end in raw_ranges:
+        _add_raw_totals(db, user_id, raw_start, raw_end, totals)
+    return totals
+
+def _by_category(totals: dict) -> List[dict]:
+    merged = defaultdict(lambda: [0.0, 0])
+    for (_, category), (total, count) in totals.items():
+        merged[category][0] += total
+        merged[category][1] += count
+    rows = [{"category": c, "total": t, "count": n} for c, (t, n) in merged.items()]
+    return sorted(rows, key=lambda r: r["total"], reverse=True)
+
+def _by_month(totals: dict) -> List[dict]:
+    merged = defaultdict(lambda: [0.0, 0])
+    for (month, _), (total, count) in totals.items():
+        merged[month][0] += total
+        merged[month][1] += count
+    return [{"month": m, "total": t, "count": n} for m, (t, n) in sorted(merged.items())]
+
+def get_spending_by_category(
+    db: Session, user_id: int, start_date: Optional[date] = None, end_date: Optional[date] = None
+) -> List[dict]:
+    """Total spent per category for a user, largest first."""
+    return _by_category(_category_month_totals(db, user_id, start_date, end_date))
+
+def get_spending_by_month(
+    db: Session, user_id: int, start_date: Optional[date] = None, end_date: Optional[date] = None
+) -> List[dict]:
+    """Total spent per calendar month for a user, in chronological order."""
+    return _by_month(_category_month_totals(db, user_id, start_date, end_date))
+
+def get_spending_by_category_month(
+    db: Session, user_id: int, start_date: Optional[date] = None, end_date: Optional[date] = None
+) -> List[dict]:
+    """Total spent per (month, category) pair for a user, in chronological order."""
+    totals = _category_month_totals(db, user_id, start_date, end_date)
+    return [
+        {"month": month, "category": category, "total": total, "count": count}
+        for (month, category), (total, count) in sorted(totals.items())
+    ]
+
+def get_spending_summary(
+    db: Session, user_id: int, start_date: Optional[date] = None, end_date: Optional[date] = None
+) -> dict:
+    """Category and monthly totals in one payload, as used by the dashboard charts."""
+    totals = _category_month_totals(db, user_id, start_date, end_date)
+    by_category = _by_category(totals)
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "total": sum(c["total"] for c in by_category),
+        "count": sum(c["count"] for c in by_category),
+        "by_category": by_category,
+        "by_month": _by_month(totals),
+    }
+
+
+# --- Budgets ---
+# Per-category monthly limits. Spent amounts are the (owner_id, month, category) rows of
+# expense_rollups, which every expense write keeps current, so neither the status endpoint nor the
+# over-budget check in create_expense ever sums expenses.
+
+def get_budgets(db: Session, user_id: int) -> List[db_models.Budget]:
+    return db.query(db_models.Budget).filter(db_models.Budget.owner_id == user_id).order_by(db_models.Budget.category).all()
+
+def get_budget_by_id(db: Session, budget_id: int, user_id: int) -> Optional[db_models.Budget]:
+    return db.query(db_models.Budget).filter(db_models.Budget.id == budget_id, db_models.Budget.owner_id == user_id).first()
+
+def _budget_category_taken(db: Session, user_id: int, category: str, exclude_id: Optional[int] = None) -> bool:
+    query = db.query(db_models.Budget.id).filter(db_models.Budget.owner_id == user_id, db_models.Budget.category == category)
+    if exclude_id is not None:
+        query = query.filter(db_models.Budget.id != exclude_id)
+    return query.first() is not None
+
+def create_budget(db: Session, budget: budget_schema.BudgetCreate, user_id: int) -> db_models.Budget:
+    """Create a budget. Raises ValueError if the category already has one."""
+    if _budget_category_taken(db, user_id, budget.category):
+        raise ValueError(f"A budget for '{budget.category}' already exists")
+    db_budget = db_models.Budget(**budget.model_dump(), owner_id=user_id)
+    db.add(db_budget)
+    try:
+        db.commit()
+    except IntegrityError as e: # Lost a race with a concurrent create
+        db.rollback()
+        raise ValueError(f"A budget for '{budget.category}' already exists") from e
+    db.refresh(db_budget)
+    return db_budget
+
+def update_budget(
+    db: Session, budget_id: int, budget_update: budget_schema.BudgetUpdate, user_id: int
+) -> Optional[db_models.Budget]:
+    """Update a budget. Returns None if not found; raises ValueError if the new category already has one."""
+    db_budget = get_budget_by_id(db, budget_id=budget_id, user_id=user_id)
+    if not db_budget:
+        return None
+    update_data = budget_update.model_dump(exclude_unset=True, exclude_none=True)
+    if "category" in update_data and _budget_category_taken(db, user_id, update_data["category"], exclude_id=budget_id):
+        raise ValueError(f"A budget for '{update_data['category']}' already exists")
+    for key, value in update_data.items():
+        setattr(db_budget, key, value)
+    try:
+        db.commit()
+    except IntegrityError as e:
+        db.rollback()
+        raise ValueError(f"A budget for '{db_budget.category}' already exists") from e
+    db.refresh(db_budget)
+    return db_budget
+
+def delete_budget(db: Session, budget_id: int, user_id: int) -> bool:
+    db_budget = get_budget_by_id(db, budget_id=budget_id, user_id=user_id)
+    if not db_budget:
+        return False
+    db.delete(db_budget)
+    db.commit()
+    return True
+
+def _budget_status_query(db: Session, user_id: int, month: date):
+    # budgets LEFT JOIN the month's rollup rows: a budget with no spending yet reports 0 spent.
+    rollup = db_models.ExpenseRollup
+    return (
+        db.query(db_models.Budget, func.coalesce(rollup.total, 0.0).label("spent"))
+        .outerjoin(
+            rollup,
+            and_(
+                rollup.owner_id == db_models.Budget.owner_id,
+                rollup.category == db_models.Budget.category,
+                rollup.month == month,
+            ),
+        )
+        .filter(db_models.Budget.owner_id == user_id)
+    )
+
+def _budget_status(budget: db_models.Budget, spent: float) -> dict:
+    spent = round(float(spent or 0.0), 2)
+    remaining = round(budget.monthly_limit - spent, 2)
+    return {
+        "budget_id": budget.id,
+        "category": budget.category,
+        "monthly_limit": budget.monthly_limit,
+        "spent": spent,
+        "remaining": remaining,
+        "over_budget": remaining < 0,
+    }
+
+def check_budget(db: Session, user_id: int, expense_date: date, category: str) -> Optional[dict]:
+    """Status of the category's budget for the month of expense_date, or None if it has no budget."""
+    month = rollup_service.month_start(expense_date)
+    row = _budget_status_query(db, user_id, month).filter(db_models.Budget.category == category).first()
+    if row is None:
+        return None
+    return {**_budget_status(*row), "month": _month_key(month.year, month.month)}
+
+def get_budget_status(db: Session, user_id: int, month: Optional[date] = None) -> dict:
+    """Spent and remaining per budget for one month (default: the current month)."""
+    month = rollup_service.month_start(month or date.today())
+    items = [_budget_status(budget, spent) for budget, spent in _budget_status_query(db, user_id, month).order_by(db_models.Budget.category)]
+    return {
+        "month": _month_key(month.year, month.month),
+        "total_limit": round(sum(item["monthly_limit"] for item in items), 2),
+        "total_spent": round(sum(item["spent"] for item in items), 2),
+        "items": items,
+    }
@@ -0,0 +1,200 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import AsyncIterator, Iterable, Iterator, List, Sequence
+
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.db import models as db_models
+from app.db import session as db_session
+from app.services import archive_service
+
+# Streaming export for GET /expenses/export.
+# Rows are read through a server-side cursor (yield_per => stream_results) in batches of
+# EXPORT_BATCH_SIZE and encoded batch by batch, so memory stays flat regardless of ledger size
+# and the first bytes go out while the query is still running. No ORM objects are built.
+# Archived months (archive_service) come first, one batch per archive file.
+#
+# The generators open their own session instead of using the request's get_db session: the
+# response body is produced after the route returns, when the request dependency may be closed.
+
+SUPPORTED_FORMATS = ("csv", "ndjson", "parquet")
+
+EXPORT_COLUMNS = ("id", "description", "amount", "category", "expense_date", "created_at", "updated_at")
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def _export_statement(user_id: int):
+    columns = [getattr(db_models.Expense, name) for name in EXPORT_COLUMNS]
+    return (
+        select(*columns)
+        .where(db_models.Expense.owner_id == user_id, db_models.Expense.deleted_at.is_(None))
+        .order_by(db_models.Expense.expense_date, db_models.Expense.id)
+        .execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+    )
+
+
+def _iter_batches_sync(user_id: int) -> Iterator[Sequence]:
+    if not db_session.SessionLocal:
+        raise RuntimeError("Database session is not configured.")
+    db = db_session.SessionLocal()
+    try:
+        files = archive_service.archived_files(db)
+        naive = db.get_bind().dialect.name == "sqlite"
+        yield from archive_service.iter_expense_batches(files, user_id, EXPORT_COLUMNS, naive_datetimes=naive)
+        result = db.execute(_export_statement(user_id))
+        for partition in result.partitions():
+            yield partition
+    finally:
+        db.close()
+
+
+async def _iter_batches_async(user_id: int) -> AsyncIterator[Sequence]:
+    if not db_session.AsyncSessionLocal:
+        raise RuntimeError("Async database session is not configured.")
+    async with db_session.AsyncSessionLocal() as db:
+        files = await db.run_sync(archive_service.archived_files)
+        naive = db.get_bind().dialect.name == "sqlite"
+        for month_file in files:
+            batches = await run_in_threadpool(
+                list, archive_service.iter_expense_batches([month_file], user_id, EXPORT_COLUMNS, naive_datetimes=naive)
+            )
+            for batch in batches:
+                yield batch
+        result = await db.stream(_export_statement(user_id))
+        async for partition in result.partitions():
+            yield partition
+
+
+# --- Encoders: each turns one batch of rows into bytes ---
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class _CsvEncoder:
+    def __init__(self):
+        self._header_sent = False
+
+    def encode(self, rows: Iterable) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if not self._header_sent:
+            writer.writerow(EXPORT_COLUMNS)
+            self._header_sent = True
+        writer.writerows(rows)
+        return buffer.getvalue().encode("utf-8")
+
+    def finish(self) -> bytes:
+        # An empty ledger still gets a header row
+        return b"" if self._header_sent else self.encode([])
+
+
+class _NdjsonEncoder:
+    def encode(self, rows: Iterable) -> bytes:
+        lines = [json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=_json_default) for row in rows]
+        return ("\n".join(lines) + "\n").encode("utf-8") if lines else b""
+
+    def finish(self) -> bytes:
+        return b""
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands the Parquet writer's output back chunk by chunk."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class _ParquetEncoder:
+    # One row group per batch; the footer is written by finish().
+    def __init__(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._schema = pa.schema([
+            ("id", pa.int64()),
+            ("description", pa.string()),
+            ("amount", pa.float64()),
+            ("category", pa.string()),
+            ("expense_date", pa.date32()),
+            ("created_at", pa.timestamp("us", tz="UTC")),
+            ("updated_at", pa.timestamp("us", tz="UTC")),
+        ])
+        self._sink = _ChunkSink()
+        self._writer = pq.ParquetWriter(self._sink, self._schema, compression="zstd")
+
+    def encode(self, rows: Iterable) -> bytes:
+        columns = list(zip(*rows)) or [[] for _ in EXPORT_COLUMNS]
+        table = self._pa.Table.from_arrays(
+            [self._pa.array(list(col), type=field.type) for col, field in zip(columns, self._schema)],
+            schema=self._schema,
+        )
+        self._writer.write_table(table)
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        self._writer.close()
+        return self._sink.drain()
+
+
+def make_encoder(export_format: str):
+    """Build the encoder for a format. Raises ImportError if parquet is requested without pyarrow."""
+    if export_format == "csv":
+        return _CsvEncoder()
+    if export_format == "ndjson":
+        return _NdjsonEncoder()
+    if export_format == "parquet":
+        return _ParquetEncoder()
+    raise ValueError(f"Unsupported export format: {export_format}")
+
+
+def stream_export_sync(user_id: int, encoder) -> Iterator[bytes]:
+    """Sync body iterator; Starlette runs it in the threadpool, so DB fetches stay off the event loop."""
+    for batch in _iter_batches_sync(user_id):
+        chunk = encoder.encode(batch)
+        if chunk:
+            yield chunk
+    tail = encoder.finish()
+    if tail:
+        yield tail
+
+
+async def stream_export_async(user_id: int, encoder) -> AsyncIterator[bytes]:
+    async for batch in _iter_batches_async(user_id):
+        chunk = encoder.encode(batch)
+        if chunk:
+            yield chunk
+    tail = encoder.finish()
+    if tail:
+        yield tail
+
+
+def stream_export(user_id: int, encoder):
+    """Pick the body iterator matching DB_ASYNC_MODE."""
+    if settings.DB_ASYNC_MODE:
+        return stream_export_async(user_id, encoder)
+    return stream_export_sync(user_id, encoder)
@@ -0,0 +1,308 @@
+import codecs
+import csv
+import json
+import re
+from collections import deque
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.db.session import DBSession, run_db
+from app.models import expense as expense_schema
+from app.services import budget_service
+
+# Streaming bulk import for POST /expenses/import.
+# The request body is consumed chunk by chunk: parsers yield one raw row at a time, rows are
+# validated against ExpenseCreate and flushed to the database every IMPORT_BATCH_SIZE rows in a
+# single transaction (see budget_service.bulk_create_expenses). Nothing holds the whole file.
+
+SUPPORTED_FORMATS = ("csv", "ndjson", "ofx")
+
+# A parsed row: (row number, raw fields) or (row number, error message)
+ParsedRow = Tuple[int, Optional[dict], Optional[str]]
+
+
+def detect_format(content_type: Optional[str]) -> Optional[str]:
+    """Map a request Content-Type to an import format, if it is recognisable."""
+    if not content_type:
+        return None
+    content_type = content_type.split(";")[0].strip().lower()
+    if content_type in ("text/csv", "application/csv"):
+        return "csv"
+    if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-seq"):
+        return "ndjson"
+    if content_type in ("application/x-ofx", "application/ofx"):
+        return "ofx"
+    return None
+
+
+async def _iter_text(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    # Incremental decoder so multi-byte characters split across chunks decode correctly.
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    async for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+async def _iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    pending = ""
+    async for text in _iter_text(chunks):
+        pending += text
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line.rstrip("\r")
+    if pending:
+        yield pending.rstrip("\r")
+
+
+# A quoted field may span lines, but one still open after this many lines is taken to be a stray
+# quote: that record is reported and parsing resumes with the line after its first.
+_MAX_CSV_RECORD_LINES = 100
+
+
+class _CsvRecordScanner:
+    """
+    Finds where CSV records end, following RFC 4180: a quote only opens a field at the start of
+    that field (elsewhere it is a literal character), and "" inside a quoted field is a literal quote.
+    """
+
+    def __init__(self):
+        self.in_quotes = False
+
+    def ends_record(self, line: str) -> bool:
+        """Scan the next physical line of the current record; True if the record ends with it."""
+        if not self.in_quotes and '"' not in line:
+            return True
+        field_start = not self.in_quotes
+        quote_pending = False # Inside a quoted field, just after a quote: closing, or the first of ""?
+        for ch in line:
+            if self.in_quotes:
+                if quote_pending:
+                    quote_pending = False
+                    if ch == '"':
+                        continue
+                    self.in_quotes = False # The quote closed the field; ch is outside it
+                elif ch == '"':
+                    quote_pending = True
+                    continue
+                else:
+                    continue
+            if ch == ",":
+                field_start = True
+            elif ch == '"' and field_start:
+                self.in_quotes = True
+                field_start = False
+            else:
+                field_start = False
+        if quote_pending:
+            self.in_quotes = False
+        return not self.in_quotes
+
+
+class _CsvRecords:
+    """Groups physical lines into records, yielding a record's text, or None for an unterminated one."""
+
+    def __init__(self):
+        self.scanner = _CsvRecordScanner()
+        self.lines: List[str] = []
+
+    def feed(self, line: str) -> Iterator[Optional[str]]:
+        queue = deque([line])
+        while queue:
+            self.lines.append(queue.popleft())
+            if self.scanner.ends_record(self.lines[-1]):
+                record, self.lines = "\n".join(self.lines), []
+                yield record
+            elif len(self.lines) >= _MAX_CSV_RECORD_LINES:
+                yield None
+                queue.extendleft(reversed(self._restart()))
+
+    def finish(self) -> Iterator[Optional[str]]:
+        while self.lines:
+            yield None
+            for line in self._restart():
+                yield from self.feed(line)
+
+    def _restart(self) -> List[str]:
+        # Drop the unterminated record's first line; the lines after it are parsed again.
+        rest, self.lines = self.lines[1:], []
+        self.scanner = _CsvRecordScanner()
+        return rest
+
+
+async def parse_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[ParsedRow]:
+    """CSV with a header row naming description, amount, category and (optionally) expense_date."""
+    header: Optional[List[str]] = None
+    row_number = 0
+    records = _CsvRecords()
+
+    def parse(record: Optional[str]) -> Optional[ParsedRow]:
+        nonlocal header, row_number
+        if record is None:
+            row_number += 1
+            return row_number, None, "Unterminated quoted field"
+        try:
+            fields = next(csv.reader([record]), [])
+        except csv.Error as e:
+            row_number += 1
+            return row_number, None, f"Invalid CSV: {e}"
+        if not fields or not any(f.strip() for f in fields):
+            return None
+        if header is None:
+            header = [f.strip().lower() for f in fields]
+            return None
+        row_number += 1
+        if len(fields) != len(header):
+            return row_number, None, f"Expected {len(header)} fields, got {len(fields)}"
+        return row_number, {key: (value.strip() or None) for key, value in zip(header, fields)}, None
+
+    async for line in _iter_lines(chunks):
+        for record in records.feed(line):
+            parsed = parse(record)
+            if parsed is not None:
+                yield parsed
+    for record in records.finish():
+        parsed = parse(record)
+        if parsed is not None:
+            yield parsed
+
+
+async def parse_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[ParsedRow]:
+    """One JSON object per line."""
+    row_number = 0
+    async for line in _iter_lines(chunks):
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            raw = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row_number, None, f"Invalid JSON: {e.msg}"
+            continue
+        if not isinstance(raw, dict):
+            yield row_number, None, "Expected a JSON object"
+            continue
+        yield row_number, raw, None
+
+
+_OFX_TAG = re.compile(r"<(/?[A-Za-z0-9.]+)>([^<]*)")
+
+
+def _parse_ofx_date(value: str) -> date:
+    # OFX dates look like YYYYMMDD[HHMMSS[.XXX]][[TZ]]; only the date part matters here.
+    return datetime.strptime(value.strip()[:8], "%Y%m%d").date()
+
+
+async def parse_ofx(chunks: AsyncIterator[bytes], default_category: str) -> AsyncIterator[ParsedRow]:
+    """
+    OFX 1.x (SGML) or 2.x (XML) bank statements. Each <STMTTRN> becomes one row; debits
+    (negative TRNAMT) are imported as positive expense amounts, credits are skipped.
+    """
+    buffer = ""
+    row_number = 0
+    current: Optional[dict] = None
+    async for text in _iter_text(chunks):
+        buffer += text
+        # Only consume tags whose value is complete, i.e. followed by another "<".
+        last_open = buffer.rfind("<")
+        complete, buffer = buffer[:last_open], buffer[last_open:]
+        for match in _OFX_TAG.finditer(complete + "<"):
+            tag, value = match.group(1).upper(), match.group(2).strip()
+            if tag == "STMTTRN":
+                current = {}
+            elif tag == "/STMTTRN" and current is not None:
+                row_number += 1
+                yield _ofx_transaction(row_number, current, default_category)
+                current = None
+            elif current is not None and not tag.startswith("/") and value:
+                current[tag] = value
+
+
+def _ofx_transaction(row_number: int, fields: dict, default_category: str) -> ParsedRow:
+    try:
+        amount = Decimal(fields.get("TRNAMT", ""))
+        posted = _parse_ofx_date(fields.get("DTPOSTED", ""))
+    except (InvalidOperation, ValueError):
+        return row_number, None, "Missing or invalid TRNAMT/DTPOSTED"
+    if amount >= 0:
+        return row_number, {"_skip": True}, None
+    description = fields.get("NAME") or fields.get("MEMO") or fields.get("FITID") or "OFX transaction"
+    return row_number, {
+        "description": description,
+        "amount": float(-amount),
+        "category": default_category,
+        "expense_date": posted,
+    }, None
+
+
+async def import_expenses(
+    db: DBSession,
+    chunks: AsyncIterator[bytes],
+    import_format: str,
+    user_id: int,
+    default_category: str = "Uncategorized",
+) -> dict:
+    """Stream-parse, validate and insert expenses. Returns an ImportReport-shaped dict."""
+    if import_format == "csv":
+        rows = parse_csv(chunks)
+    elif import_format == "ndjson":
+        rows = parse_ndjson(chunks)
+    elif import_format == "ofx":
+        rows = parse_ofx(chunks, default_category)
+    else:
+        raise ValueError(f"Unsupported import format: {import_format}")
+
+    report = {"format": import_format, "imported": 0, "failed": 0, "skipped": 0, "errors": [], "errors_truncated": False}
+
+    def record_error(row_number: int, message: str) -> None:
+        report["failed"] += 1
+        if len(report["errors"]) < settings.IMPORT_MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": row_number, "error": message})
+        else:
+            report["errors_truncated"] = True
+
+    batch: List[expense_schema.ExpenseCreate] = []
+    batch_rows: List[int] = []
+
+    async def flush() -> None:
+        if not batch:
+            return
+        try:
+            report["imported"] += await run_db(db, budget_service.bulk_create_expenses, expenses=list(batch), user_id=user_id)
+        except Exception as e:
+            # The batch transaction was rolled back; report every row in it.
+            print(f"Bulk import batch failed for user_id {user_id}: {e}")
+            for row_number in batch_rows:
+                record_error(row_number, f"Database error: {e.__class__.__name__}")
+        batch.clear()
+        batch_rows.clear()
+
+    async for row_number, raw, error in rows:
+        if error:
+            record_error(row_number, error)
+            continue
+        if raw.get("_skip"):
+            report["skipped"] += 1
+            continue
+        if not raw.get("category"):
+            raw["category"] = default_category
+        try:
+            batch.append(expense_schema.ExpenseCreate.model_validate(raw))
+            batch_rows.append(row_number)
+        except ValidationError as e:
+            first = e.errors()[0]
+            field = ".".join(str(part) for part in first["loc"]) or "row"
+            record_error(row_number, f"{field}: {first['msg']}")
+            continue
+        if len(batch) >= settings.IMPORT_BATCH_SIZE:
+            await flush()
+    await flush()
+    return report
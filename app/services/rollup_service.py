@@ -0,0 +1,202 @@
+import argparse
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, extract, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.db import models as db_models
+from app.services import archive_service
+
+# Incrementally maintained spending rollups (expense_rollups table).
+# budget_service calls apply_deltas() inside the same transaction as every expense write, so the
+# rollups commit or roll back together with the rows they summarise. rebuild_rollups() and
+# verify_rollups() cover the initial backfill and drift detection.
+
+RollupKey = Tuple[date, str] # (first day of month, category)
+RollupDeltas = Dict[RollupKey, List[float]] # key -> [total delta, count delta]
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def month_end(day: date) -> date:
+    next_month = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+def new_deltas() -> RollupDeltas:
+    return defaultdict(lambda: [0.0, 0])
+
+
+def add_delta(deltas: RollupDeltas, expense_date: date, category: str, amount: float, sign: int) -> None:
+    """Record an expense being added (sign=1) or removed (sign=-1) from its rollup bucket."""
+    bucket = deltas[(month_start(expense_date), category)]
+    bucket[0] += sign * amount
+    bucket[1] += sign
+
+
+def apply_deltas(db: Session, user_id: int, deltas: RollupDeltas) -> None:
+    """
+    Upsert rollup deltas for one user. Does not commit; the caller's transaction does.
+    Keys are applied in sorted order so concurrent writers lock rollup rows in the same order.
+    """
+    rows = [
+        {"owner_id": user_id, "month": month, "category": category, "total": total, "count": count}
+        for (month, category), (total, count) in sorted(deltas.items())
+        if count or total
+    ]
+    if not rows:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as upsert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as upsert
+        stmt = upsert(db_models.ExpenseRollup).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["owner_id", "month", "category"],
+            set_={
+                "total": db_models.ExpenseRollup.total + stmt.excluded.total,
+                "count": db_models.ExpenseRollup.count + stmt.excluded.count,
+            },
+        )
+        db.execute(stmt)
+    else:
+        # Generic fallback: UPDATE, then INSERT when no bucket exists yet.
+        for row in rows:
+            result = db.execute(
+                update(db_models.ExpenseRollup)
+                .where(_key_filter(row["owner_id"], row["month"], row["category"]))
+                .values(
+                    total=db_models.ExpenseRollup.total + row["total"],
+                    count=db_models.ExpenseRollup.count + row["count"],
+                )
+            )
+            if result.rowcount == 0:
+                db.execute(insert(db_models.ExpenseRollup).values(**row))
+    if any(row["count"] < 0 for row in rows):
+        # Drop buckets that no longer hold any expenses
+        db.execute(
+            delete(db_models.ExpenseRollup).where(
+                db_models.ExpenseRollup.owner_id == user_id, db_models.ExpenseRollup.count <= 0
+            )
+        )
+
+
+def _key_filter(user_id: int, month: date, category: str):
+    return and_(
+        db_models.ExpenseRollup.owner_id == user_id,
+        db_models.ExpenseRollup.month == month,
+        db_models.ExpenseRollup.category == category,
+    )
+
+
+def get_rollups(
+    db: Session, user_id: int, from_month: Optional[date] = None, to_month: Optional[date] = None
+) -> List[db_models.ExpenseRollup]:
+    """Rollup rows for a user, optionally bounded by (inclusive) first-of-month dates."""
+    query = db.query(db_models.ExpenseRollup).filter(
+        db_models.ExpenseRollup.owner_id == user_id, db_models.ExpenseRollup.count > 0
+    )
+    if from_month is not None:
+        query = query.filter(db_models.ExpenseRollup.month >= from_month)
+    if to_month is not None:
+        query = query.filter(db_models.ExpenseRollup.month <= to_month)
+    return query.all()
+
+
+# --- Backfill and drift detection ---
+
+def _aggregate_from_expenses(db: Session, user_id: Optional[int]) -> Dict[Tuple[int, date, str], Tuple[float, int]]:
+    year = extract("year", db_models.Expense.expense_date)
+    month = extract("month", db_models.Expense.expense_date)
+    query = select(
+        db_models.Expense.owner_id, year, month, db_models.Expense.category,
+        func.sum(db_models.Expense.amount), func.count(db_models.Expense.id),
+    ).where(db_models.Expense.deleted_at.is_(None)).group_by(
+        db_models.Expense.owner_id, year, month, db_models.Expense.category
+    )
+    if user_id is not None:
+        query = query.where(db_models.Expense.owner_id == user_id)
+    # Archived months are no longer in expenses but keep their rollups; count them from the archive.
+    aggregates = archive_service.aggregate_expenses(archive_service.archived_files(db), user_id=user_id)
+    for owner_id, y, m, category, total, count in db.execute(query):
+        bucket = aggregates[(owner_id, date(int(y), int(m), 1), category)]
+        bucket[0] += float(total or 0)
+        bucket[1] += count
+    return {key: (total, count) for key, (total, count) in aggregates.items()}
+
+
+def rebuild_rollups(db: Session, user_id: Optional[int] = None, batch_size: int = 5000) -> int:
+    """Recompute rollups from the expenses table (all users, or one). Returns rows written."""
+    aggregates = _aggregate_from_expenses(db, user_id)
+    stmt = delete(db_models.ExpenseRollup)
+    if user_id is not None:
+        stmt = stmt.where(db_models.ExpenseRollup.owner_id == user_id)
+    db.execute(stmt)
+    rows = [
+        {"owner_id": owner_id, "month": month, "category": category, "total": total, "count": count}
+        for (owner_id, month, category), (total, count) in aggregates.items()
+    ]
+    for i in range(0, len(rows), batch_size):
+        db.execute(insert(db_models.ExpenseRollup), rows[i:i + batch_size])
+    db.commit()
+    return len(rows)
+
+
+def verify_rollups(db: Session, user_id: Optional[int] = None, tolerance: float = 0.005) -> List[dict]:
+    """Compare rollups with a fresh aggregation of expenses. Returns one entry per drifted bucket."""
+    expected = _aggregate_from_expenses(db, user_id)
+    query = select(
+        db_models.ExpenseRollup.owner_id, db_models.ExpenseRollup.month, db_models.ExpenseRollup.category,
+        db_models.ExpenseRollup.total, db_models.ExpenseRollup.count,
+    ).where(db_models.ExpenseRollup.count > 0)
+    if user_id is not None:
+        query = query.where(db_models.ExpenseRollup.owner_id == user_id)
+    actual = {(o, m, c): (float(t), n) for o, m, c, t, n in db.execute(query)}
+
+    drift = []
+    for key in sorted(set(expected) | set(actual), key=lambda k: (k[0], k[1], k[2])):
+        exp_total, exp_count = expected.get(key, (0.0, 0))
+        act_total, act_count = actual.get(key, (0.0, 0))
+        if exp_count != act_count or abs(exp_total - act_total) > tolerance:
+            owner_id, month, category = key
+            drift.append({
+                "owner_id": owner_id, "month": month.isoformat(), "category": category,
+                "expected_total": exp_total, "actual_total": act_total,
+                "expected_count": exp_count, "actual_count": act_count,
+            })
+    return drift
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Rebuild or verify the expense_rollups table.")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    parser.add_argument("--user-id", type=int, default=None, help="Limit to one user")
+    args = parser.parse_args(argv)
+
+    from app.db.session import SessionLocal
+    if not SessionLocal:
+        print("Error: database is not configured.")
+        return 2
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            written = rebuild_rollups(db, user_id=args.user_id)
+            print(f"Rebuilt {written} rollup rows.")
+            return 0
+        drift = verify_rollups(db, user_id=args.user_id)
+        for entry in drift:
+            print(f"DRIFT {entry}")
+        print(f"{len(drift)} drifted rollup buckets.")
+        return 1 if drift else 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
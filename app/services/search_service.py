@@ -0,0 +1,95 @@
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import column, func, literal, literal_column, or_, table
+from sqlalchemy.orm import Session
+
+from app.db import models as db_models
+
+# Ranked search over expense descriptions (GET /expenses/search).
+#
+# PostgreSQL: expenses.description_tsv is a generated tsvector ('simple' configuration, so merchant
+# names aren't stemmed) with a GIN index; a pg_trgm GIN index on description adds typo tolerance.
+# A row matches if the full-text query matches or the query is word-similar to the description
+# (pg_trgm.word_similarity_threshold, 0.6 by default); the score is the sum of both ranks.
+# SQLite: the expenses_fts FTS5 table, every term matched as a prefix, ranked by bm25.
+# Both objects are created by migration 0003 and are not mapped on the model.
+#
+# Results are ordered by score, so pagination is by offset; limit + 1 rows are fetched to know
+# whether a next page exists.
+
+SearchHit = Tuple[db_models.Expense, float]
+
+_expenses_fts = table("expenses_fts", column("rowid"))
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def _fts5_query(q: str) -> Optional[str]:
+    # Quote every term so FTS5 operators and column filters in user input are taken literally.
+    terms = _TERM.findall(q)
+    if not terms:
+        return None
+    return " ".join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+def _postgresql_query(db: Session, user_id: int, q: str):
+    tsv = literal_column("expenses.description_tsv")
+    tsquery = func.websearch_to_tsquery("simple", q)
+    score = (func.ts_rank_cd(tsv, tsquery) + func.word_similarity(q, db_models.Expense.description)).label("score")
+    return db.query(db_models.Expense, score).filter(
+        db_models.Expense.owner_id == user_id,
+        db_models.Expense.deleted_at.is_(None),
+        or_(tsv.op("@@")(tsquery), literal(q).op("<%")(db_models.Expense.description)),
+    )
+
+
+def _sqlite_query(db: Session, user_id: int, q: str):
+    match = _fts5_query(q)
+    if match is None:
+        return None
+    # bm25() is lower for better matches
+    score = (-func.bm25(literal_column("expenses_fts"))).label("score")
+    return (
+        db.query(db_models.Expense, score)
+        .join(_expenses_fts, _expenses_fts.c.rowid == db_models.Expense.id)
+        .filter(
+            db_models.Expense.owner_id == user_id,
+            db_models.Expense.deleted_at.is_(None),
+            literal_column("expenses_fts").op("MATCH")(match),
+        )
+    )
+
+
+def _substring_query(db: Session, user_id: int, q: str):
+    # Other databases: unranked case-insensitive substring match.
+    return db.query(db_models.Expense, literal(0.0).label("score")).filter(
+        db_models.Expense.owner_id == user_id,
+        db_models.Expense.deleted_at.is_(None),
+        db_models.Expense.description.ilike(f"%{q}%"),
+    )
+
+
+def search_expenses(
+    db: Session, user_id: int, q: str, limit: int = 20, offset: int = 0
+) -> Tuple[List[SearchHit], Optional[int]]:
+    """Search the user's expense descriptions. Returns (hits, next_offset); next_offset is None on the last page."""
+    q = q.strip()
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        query = _postgresql_query(db, user_id, q)
+    elif dialect == "sqlite":
+        query = _sqlite_query(db, user_id, q)
+    else:
+        query = _substring_query(db, user_id, q)
+    if query is None:
+        return [], None
+    rows = (
+        query.order_by(literal_column("score").desc(), db_models.Expense.id.desc())
+        .offset(offset)
+        .limit(limit + 1)
+        .all()
+    )
+    hits = [(expense, float(score or 0.0)) for expense, score in rows[:limit]]
+    next_offset = offset + limit if len(rows) > limit else None
+    return hits, next_offset
@@ -0,0 +1,172 @@
+import argparse
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import models as db_models
+from app.services import archive_service
+
+# Delta sync for offline-capable clients (GET /expenses/changes).
+#
+# Every expense write stamps the row with the owner's new ledger_version (expenses.change_seq),
+# and deletes leave a tombstone (deleted_at set) instead of removing the row. A client that has
+# synced up to sequence S asks for the rows with change_seq > S, ordered by (change_seq, id), and
+# gets live rows as upserts and tombstones as deletes: O(changes), served by
+# ix_expenses_owner_change_seq_id.
+#
+# Sync positions are "S" or, mid-way through a sequence that has more rows than fit on one page
+# (a bulk import stamps all its rows with one version), "S.id". Clients treat them as opaque.
+#
+# Tombstones older than TOMBSTONE_RETENTION_DAYS are purged by the CLI below; users.purged_change_seq
+# records the highest sequence purged, and a client behind it may have missed deletes, so it gets
+# ChangesExpired (410) and starts over from 0. since=0 is always valid, and skips tombstones.
+#
+# Months moved to the archive by archive_service keep their rows' change_seq, and are merged in
+# like live rows: a resync from 0 gets the whole ledger, and a client gets an archived row it
+# hasn't seen yet. Only files whose max_change_seq is past the position are read, so an
+# incremental sync normally reads none.
+
+Position = Tuple[int, Optional[int]] # (change_seq, id of the last row seen within it)
+
+
+class ChangesExpired(Exception):
+    """The client's sync position is no longer servable; it must resync from 0."""
+
+
+def parse_position(since: str) -> Position:
+    """Parse a sync position ("S" or "S.id"). Raises ValueError if it is malformed."""
+    seq, dot, last_id = since.partition(".")
+    try:
+        position = (int(seq), int(last_id) if dot else None)
+    except ValueError as e:
+        raise ValueError(f"Invalid sync position: {since!r}") from e
+    if position[0] < 0 or (position[1] is not None and position[1] < 0):
+        raise ValueError(f"Invalid sync position: {since!r}")
+    return position
+
+
+def format_position(position: Position) -> str:
+    seq, last_id = position
+    return str(seq) if last_id is None else f"{seq}.{last_id}"
+
+
+def get_changes(db: Session, user_id: int, since: str = "0", limit: int = 500) -> dict:
+    """
+    Expenses inserted, updated or deleted after the sync position `since`. Returns a dict shaped
+    like ExpenseChanges; keep calling with next_since while has_more is true.
+    """
+    seq, last_id = parse_position(since)
+    # Read the version first: rows are only returned up to it, so a write committing during this
+    # call is picked up by the next sync rather than half-seen (change_seq commits in order, as
+    # budget_service bumps the version under the users row lock before writing).
+    version, purged = db.execute(
+        select(db_models.User.ledger_version, db_models.User.purged_change_seq).where(db_models.User.id == user_id)
+    ).one()
+    if seq > version:
+        raise ChangesExpired(f"Sync position {since} is ahead of the ledger (version {version})")
+    if 0 < seq < purged:
+        raise ChangesExpired(f"Changes before sequence {purged} have been purged")
+
+    Expense = db_models.Expense
+    query = select(Expense).where(Expense.owner_id == user_id, Expense.change_seq <= version)
+    if last_id is None:
+        query = query.where(Expense.change_seq > seq)
+    else:
+        query = query.where(tuple_(Expense.change_seq, Expense.id) > tuple_(seq, last_id))
+    if seq == 0 and last_id is None:
+        # A first sync has nothing to delete.
+        query = query.where(Expense.deleted_at.is_(None))
+    # Fetch one extra row to learn whether another page exists without a COUNT query.
+    rows: List[db_models.Expense] = list(
+        db.scalars(query.order_by(Expense.change_seq, Expense.id).limit(limit + 1))
+    )
+    archived = _archived_changes(db, user_id, seq, last_id, version)
+    if archived:
+        rows = sorted([*rows, *archived], key=lambda row: (row.change_seq, row.id))[:limit + 1]
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if has_more:
+        next_since = format_position((rows[-1].change_seq, rows[-1].id))
+    else:
+        next_since = format_position((version, None))
+    return {
+        "upserts": [row for row in rows if row.deleted_at is None],
+        "deletes": [row for row in rows if row.deleted_at is not None],
+        "next_since": next_since,
+        "has_more": has_more,
+        "version": version,
+    }
+
+
+def _archived_changes(
+    db: Session, user_id: int, seq: int, last_id: Optional[int], version: int
+) -> List[db_models.Expense]:
+    """Archived rows after the position, up to version, as transient Expense objects."""
+    files = archive_service.archived_files_changed_after(db, seq)
+    if not files:
+        return []
+    after = (seq, last_id if last_id is not None else float("inf"))
+    return [
+        db_models.Expense(**values)
+        for values in archive_service.read_expenses(
+            files, user_id, changed_after=seq, naive_datetimes=db.get_bind().dialect.name == "sqlite"
+        )
+        if (values["change_seq"], values["id"]) > after and values["change_seq"] <= version
+    ]
+
+
+def purge_tombstones(db: Session, older_than_days: int, user_id: Optional[int] = None) -> int:
+    """Delete tombstones older than the cutoff and record the purged sequence per user. Returns rows deleted."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    Expense = db_models.Expense
+    expired = [Expense.deleted_at.is_not(None), Expense.deleted_at < cutoff]
+    if user_id is not None:
+        expired.append(Expense.owner_id == user_id)
+    purged = db.execute(
+        select(Expense.owner_id, func.max(Expense.change_seq)).where(*expired).group_by(Expense.owner_id)
+    ).all()
+    if not purged:
+        return 0
+    try:
+        for owner_id, max_seq in purged:
+            db.execute(
+                update(db_models.User)
+                .where(db_models.User.id == owner_id, db_models.User.purged_change_seq < max_seq)
+                .values(purged_change_seq=max_seq)
+            )
+        deleted = db.execute(delete(Expense).where(*expired)).rowcount
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return deleted
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Maintain the delta-sync tombstones of deleted expenses.")
+    parser.add_argument("command", choices=["purge"])
+    parser.add_argument(
+        "--older-than-days", type=int, default=settings.TOMBSTONE_RETENTION_DAYS,
+        help="Purge tombstones deleted more than this many days ago",
+    )
+    parser.add_argument("--user-id", type=int, default=None, help="Limit to one user")
+    args = parser.parse_args(argv)
+
+    from app.db.session import SessionLocal
+    if not SessionLocal:
+        print("Error: database is not configured.")
+        return 2
+    db = SessionLocal()
+    try:
+        deleted = purge_tombstones(db, older_than_days=args.older_than_days, user_id=args.user_id)
+        print(f"Purged {deleted} tombstones older than {args.older_than_days} days.")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
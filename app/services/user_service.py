@@ -2,8 +2,15 @@ from sqlalchemy.orm import Session
 from typing import Optional
 
 from app.db import models as db_models # Renamed to avoid clash with pydantic models
+from app.db.session import DBSession, run_db
 from app.models import user as user_schema # Pydantic schemas
-from app.core.security import get_password_hash, verify_password
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.security import verify_and_update_password_async
+
+# user id -> UserInDB snapshot of the authenticated principal, so protected requests don't need a
+# users-table query each time. Per worker; invalidated by update_user/deactivate_user below.
+principal_cache = TTLCache("principals", settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL_SECONDS)
 
 def get_user_by_email(db: Session, email: str) -> Optional[db_models.User]:
     """Fetch a user from the database by their email."""
@@ -12,8 +19,8 @@ def get_user_by_email(db: Session, email: str) -> Optional[db_models.User]:
 def get_user_by_id(db: Session, user_id: int) -> Optional[db_models.User]:
     return db.query(db_models.User).filter(db_models.User.id == user_id).first()
 
-def create_user(db: Session, user: user_schema.UserCreate) -> db_models.User:
-    hashed_password = get_password_hash(user.password)
+def create_user(db: Session, user: user_schema.UserCreate, hashed_password: str) -> db_models.User:
+    """Insert a new user. The password must already be hashed (see security.get_password_hash_async)."""
     db_user = db_models.User(
         email=user.email,
         full_name=user.full_name,
@@ -25,19 +32,57 @@ def create_user(db: Session, user: user_schema.UserCreate) -> db_models.User:
     db.refresh(db_user)
     return db_user
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[db_models.User]:
+def update_password_hash(db: Session, user: db_models.User, hashed_password: str) -> None:
+    db.query(db_models.User).filter(db_models.User.id == user.id).update({"hashed_password": hashed_password})
+    db.commit()
+    # The commit expires user; reload it here so callers on the event loop never lazy-load.
+    db.refresh(user)
+
+async def authenticate_user(db: DBSession, email: str, password: str) -> Optional[db_models.User]:
     """
     Authenticate a user by email and password.
     Returns the user object if authentication is successful, otherwise None.
+    The bcrypt check runs on the bounded hashing pool (may raise security.PasswordHasherBusy), and a
+    hash made with an outdated cost factor is transparently replaced with one at BCRYPT_ROUNDS.
     """
-    user = get_user_by_email(db, email=email)
+    user = await run_db(db, get_user_by_email, email=email)
     if not user:
         return None # User not found
     if not user.is_active:
         return None # User is inactive
-    if not verify_password(password, user.hashed_password):
+    verified, new_hash = await verify_and_update_password_async(password, user.hashed_password)
+    if not verified:
         return None # Incorrect password
+    if new_hash:
+        await run_db(db, update_password_hash, user=user, hashed_password=new_hash)
+        print(f"Rehashed password for user_id {user.id} with the current bcrypt cost")
     return user
 
-# We can add other user-related service functions here as needed,
-# e.g., update_user, deactivate_user, etc. 
\ No newline at end of file
+async def get_principal(db: DBSession, user_id: int) -> Optional[user_schema.UserInDB]:
+    """Load the authenticated principal for a user id, served from principal_cache when possible."""
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+    user = await run_db(db, get_user_by_id, user_id=user_id)
+    if user is None:
+        return None
+    principal = user_schema.UserInDB.model_validate(user)
+    principal_cache.set(user_id, principal)
+    return principal
+
+def update_user(db: Session, user_id: int, user_update: user_schema.UserUpdate) -> Optional[db_models.User]:
+    db_user = get_user_by_id(db, user_id=user_id)
+    if not db_user:
+        return None
+    for key, value in user_update.model_dump(exclude_unset=True).items():
+        setattr(db_user, key, value)
+    db.commit()
+    db.refresh(db_user)
+    principal_cache.invalidate(user_id)
+    return db_user
+
+def deactivate_user(db: Session, user_id: int) -> bool:
+    updated = db.query(db_models.User).filter(db_models.User.id == user_id).update({"is_active": False})
+    db.commit()
+    principal_cache.invalidate(user_id)
+    return bool(updated) 
\ No newline at end of file
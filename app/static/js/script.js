@@ -85,7 +85,9 @@ document.addEventListener('DOMContentLoaded', function() {
                     detail = errorData.detail[0].msg; // Handle FastAPI validation errors
                 }
             }
-            throw new Error(detail);
+            const error = new Error(detail);
+            error.status = response.status;
+            throw error;
         }
         // For 204 No Content, response.json() will fail. Handle it.
         if (response.status === 204) return null; 
@@ -112,15 +114,16 @@ document.addEventListener('DOMContentLoaded', function() {
                 const userData = await fetchWithAuth('/auth/users/me');
                 if (userData && userData.email) {
                     console.log("Token valid, user:", userData.email);
+                    localUserId = userData.id;
                     updateNavUI(true, userData.email);
                     // Only redirect if on login/register page
                     if (window.location.pathname === loginPath || window.location.pathname === registerPath) {
                         console.log("Redirecting to dashboard...");
                         window.location.href = dashboardPath;
                     }
-                    // If on dashboard, fetch expenses
+                    // If on dashboard, subscribe to live updates; the stream's "ready" event loads the expenses
                     if (window.location.pathname.startsWith(dashboardPath)){
-                        fetchAndDisplayExpenses();
+                        connectExpenseStream();
                     }
                 } else {
                     // This case might occur if /users/me doesn't return expected data
@@ -221,52 +224,302 @@ document.addEventListener('DOMContentLoaded', function() {
             event.preventDefault();
             console.log("Logging out...");
             removeToken();
+            deleteLocalExpenses();
             updateNavUI(false);
             window.location.href = homePath;
         });
     }
 
+    // Dashboard state, kept so live events can patch the list and charts in place
+    const LIST_LIMIT = 100; // Page size of GET /expenses/
+    let dashboardExpenses = [];
+    let dashboardSummary = null;
+    let fetchInFlight = false;
+    let refetchQueued = false;
+
     async function fetchAndDisplayExpenses() {
         if (!expenseListUl || !noExpensesMessage) return;
+        if (fetchInFlight) {
+            // Events that arrive mid-fetch may or may not be in the response; fetch again after.
+            refetchQueued = true;
+            return;
+        }
+        fetchInFlight = true;
         console.log("Fetching expenses...");
         try {
-            const expenses = await fetchWithAuth('/expenses/'); // GET request to our API
-            expenseListUl.innerHTML = ''; 
-            if (expenses && expenses.length > 0) {
-                console.log("Expenses received:", expenses);
-                noExpensesMessage.style.display = 'none';
-                expenses.forEach(exp => {
-                    const li = document.createElement('li');
-                    li.textContent = `${exp.expense_date}: ${exp.description} - $${exp.amount.toFixed(2)} (${exp.category})`;
-                    expenseListUl.appendChild(li);
-                });
-                renderCharts(expenses);
-            } else {
-                console.log("No expenses found for user.");
-                noExpensesMessage.style.display = 'block';
-                document.getElementById('categoryChart').style.display = 'none';
-                document.getElementById('monthlyChart').style.display = 'none';
-            }
+            // The list only needs the most recent page; chart totals are aggregated server-side
+            // so they cover the whole ledger no matter how many expenses the user has.
+            const [expenses, summary] = await Promise.all([
+                loadRecentExpenses(),
+                fetchWithAuth('/expenses/summary')
+            ]);
+            dashboardExpenses = expenses || [];
+            dashboardSummary = summary;
+            renderDashboard();
         } catch (error) {
             console.error("Failed to fetch expenses:", error);
             if (expenseListUl) expenseListUl.innerHTML = `<li>Error loading expenses: ${error.message}</li>`;
             noExpensesMessage.style.display = 'none';
             document.getElementById('categoryChart').style.display = 'none';
             document.getElementById('monthlyChart').style.display = 'none';
+        } finally {
+            fetchInFlight = false;
+            if (refetchQueued) {
+                refetchQueued = false;
+                fetchAndDisplayExpenses();
+            }
+        }
+    }
+
+    // --- Local copy of the ledger (IndexedDB), kept current with /expenses/changes ---
+    // Each load fetches only what changed since the last sync, then reads the newest
+    // LIST_LIMIT expenses from the local copy; if the server can't be reached the local copy
+    // is shown as is. Without IndexedDB the list comes from GET /expenses/ as before.
+    const LOCAL_DB_PREFIX = 'budget_tracker_expenses_';
+    let localUserId = null;
+
+    function idbRequest(request) {
+        return new Promise((resolve, reject) => {
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    function idbTransactionDone(tx) {
+        return new Promise((resolve, reject) => {
+            tx.oncomplete = () => resolve();
+            tx.onerror = tx.onabort = () => reject(tx.error);
+        });
+    }
+
+    async function openLocalExpenses() {
+        if (!window.indexedDB || localUserId === null) return null;
+        const request = indexedDB.open(LOCAL_DB_PREFIX + localUserId, 1);
+        request.onupgradeneeded = () => {
+            const db = request.result;
+            const expenses = db.createObjectStore('expenses', { keyPath: 'id' });
+            expenses.createIndex('by_date', ['expense_date', 'id']); // Newest first: walk it backwards
+            db.createObjectStore('meta');
+        };
+        try {
+            return await idbRequest(request);
+        } catch (error) {
+            console.warn("IndexedDB unavailable:", error);
+            return null;
+        }
+    }
+
+    function deleteLocalExpenses() {
+        if (window.indexedDB && localUserId !== null) indexedDB.deleteDatabase(LOCAL_DB_PREFIX + localUserId);
+    }
+
+    async function syncLocalExpenses(db) {
+        let since = (await idbRequest(db.transaction('meta').objectStore('meta').get('since'))) || '0';
+        let hasMore = true;
+        while (hasMore) {
+            let changes;
+            try {
+                changes = await fetchWithAuth(`/expenses/changes?since=${encodeURIComponent(since)}`);
+            } catch (error) {
+                if (error.status !== 410 || since === '0') throw error;
+                // Too far behind (deletes since then were purged): start over.
+                console.log("Local copy expired; running a full sync.");
+                const tx = db.transaction(['expenses', 'meta'], 'readwrite');
+                tx.objectStore('expenses').clear();
+                tx.objectStore('meta').clear();
+                await idbTransactionDone(tx);
+                since = '0';
+                continue;
+            }
+            const tx = db.transaction(['expenses', 'meta'], 'readwrite');
+            const store = tx.objectStore('expenses');
+            changes.upserts.forEach(exp => store.put(exp));
+            changes.deletes.forEach(tombstone => store.delete(tombstone.id));
+            tx.objectStore('meta').put(changes.next_since, 'since');
+            await idbTransactionDone(tx);
+            since = changes.next_since;
+            hasMore = changes.has_more;
+        }
+    }
+
+    async function readRecentLocalExpenses(db) {
+        const expenses = [];
+        const request = db.transaction('expenses').objectStore('expenses').index('by_date').openCursor(null, 'prev');
+        await new Promise((resolve, reject) => {
+            request.onsuccess = () => {
+                const cursor = request.result;
+                if (!cursor || expenses.length >= LIST_LIMIT) return resolve();
+                expenses.push(cursor.value);
+                cursor.continue();
+            };
+            request.onerror = () => reject(request.error);
+        });
+        return expenses;
+    }
+
+    async function loadRecentExpenses() {
+        const db = await openLocalExpenses();
+        if (!db) return fetchWithAuth('/expenses/');
+        try {
+            await syncLocalExpenses(db);
+        } catch (error) {
+            if (error.status) throw error; // The server answered; only network failures fall back to the local copy
+            console.warn("Sync failed; showing the local copy:", error);
+        }
+        try {
+            return await readRecentLocalExpenses(db);
+        } finally {
+            db.close();
+        }
+    }
+
+    function renderDashboard() {
+        expenseListUl.innerHTML = '';
+        if (dashboardExpenses.length > 0) {
+            noExpensesMessage.style.display = 'none';
+            dashboardExpenses.forEach(exp => expenseListUl.appendChild(expenseListItem(exp)));
+            if (categoryChart && monthlyChart) {
+                updateCharts(dashboardSummary);
+            } else {
+                renderCharts(dashboardSummary);
+            }
+        } else {
+            console.log("No expenses found for user.");
+            noExpensesMessage.style.display = 'block';
+            document.getElementById('categoryChart').style.display = 'none';
+            document.getElementById('monthlyChart').style.display = 'none';
         }
     }
 
+    function expenseListItem(exp) {
+        const li = document.createElement('li');
+        li.textContent = `${exp.expense_date}: ${exp.description} - $${exp.amount.toFixed(2)} (${exp.category})`;
+        return li;
+    }
+
+    // --- Live updates (server-sent events from /expenses/stream) ---
+    // Each event is one committed write with the ledger version it produced and the
+    // (month, category) deltas it applied, so the list and charts are patched without refetching.
+    // A gap in versions or an explicit "resync" falls back to a full fetch.
+    let expenseStream = null;
+    let ledgerVersion = null;
+    const STREAM_RECONNECT_MS = 3000;
+
+    async function connectExpenseStream() {
+        if (!window.EventSource || !expenseListUl) {
+            fetchAndDisplayExpenses();
+            return;
+        }
+        // EventSource can't send an Authorization header. Rather than the access token, the URL
+        // carries a stream token: it only opens this stream, and only for a minute.
+        let streamToken;
+        try {
+            ({ stream_token: streamToken } = await fetchWithAuth('/expenses/stream-token', { method: 'POST' }));
+        } catch (error) {
+            console.warn("Live updates unavailable; falling back to manual refresh.", error);
+            fetchAndDisplayExpenses();
+            return;
+        }
+        expenseStream = new EventSource(`/expenses/stream?stream_token=${encodeURIComponent(streamToken)}`);
+        expenseStream.addEventListener('ready', (message) => {
+            const { version } = JSON.parse(message.data);
+            if (version !== ledgerVersion) {
+                ledgerVersion = version;
+                fetchAndDisplayExpenses();
+            }
+        });
+        expenseStream.addEventListener('expense', (message) => {
+            const event = JSON.parse(message.data);
+            if (event.type === 'resync' || event.type === 'imported' || event.type === 'batch' || ledgerVersion === null || event.version !== ledgerVersion + 1) {
+                ledgerVersion = event.version ?? ledgerVersion;
+                fetchAndDisplayExpenses();
+                return;
+            }
+            ledgerVersion = event.version;
+            if (fetchInFlight) {
+                refetchQueued = true;
+                return;
+            }
+            applyExpenseEvent(event);
+        });
+        expenseStream.onerror = () => {
+            // The browser would reconnect with the same URL, whose token has expired by then; reconnect
+            // with a fresh one instead. The new stream's "ready" event refetches if anything was missed.
+            expenseStream.close();
+            expenseStream = null;
+            setTimeout(connectExpenseStream, STREAM_RECONNECT_MS);
+        };
+    }
+
+    function applyExpenseEvent(event) {
+        const exp = event.expense;
+        if (event.type === 'created') {
+            dashboardExpenses.unshift(exp);
+            dashboardExpenses.sort((a, b) => b.expense_date.localeCompare(a.expense_date) || b.id - a.id);
+            dashboardExpenses = dashboardExpenses.slice(0, LIST_LIMIT);
+        } else if (event.type === 'updated') {
+            dashboardExpenses = dashboardExpenses.map(e => e.id === exp.id ? exp : e);
+        } else if (event.type === 'deleted') {
+            dashboardExpenses = dashboardExpenses.filter(e => e.id !== exp.id);
+        }
+        if (dashboardSummary) applySummaryDeltas(dashboardSummary, event.deltas || []);
+        renderDashboard();
+    }
+
+    function applySummaryDeltas(summary, deltas) {
+        deltas.forEach(delta => {
+            summary.total += delta.total;
+            summary.count += delta.count;
+            patchTotal(summary.by_category, 'category', delta.category, delta);
+            patchTotal(summary.by_month, 'month', delta.month, delta);
+        });
+        summary.by_category.sort((a, b) => b.total - a.total);
+        summary.by_month.sort((a, b) => a.month.localeCompare(b.month));
+    }
+
+    function patchTotal(rows, key, value, delta) {
+        let row = rows.find(r => r[key] === value);
+        if (!row) {
+            row = { [key]: value, total: 0, count: 0 };
+            rows.push(row);
+        }
+        row.total = Math.round((row.total + delta.total) * 100) / 100;
+        row.count += delta.count;
+        if (row.count <= 0) rows.splice(rows.indexOf(row), 1);
+    }
+
     let categoryChart = null;
     let monthlyChart = null;
 
-    function renderCharts(expenses) {
-        renderCategoryChart(expenses);
-        renderMonthlyChart(expenses);
+    function renderCharts(summary) {
+        renderCategoryChart(summary.by_category);
+        renderMonthlyChart(summary.by_month);
+        document.getElementById('categoryChart').style.display = 'block';
+        document.getElementById('monthlyChart').style.display = 'block';
+    }
+
+    // Patch the existing charts' data in place (no destroy/re-create, so no re-animation from zero)
+    function updateCharts(summary) {
+        const colors = generateColors(summary.by_category.length);
+        categoryChart.data.labels = summary.by_category.map(c => c.category);
+        categoryChart.data.datasets[0].data = summary.by_category.map(c => c.total);
+        categoryChart.data.datasets[0].backgroundColor = colors.background;
+        categoryChart.data.datasets[0].borderColor = colors.border;
+        categoryChart.update();
+        monthlyChart.data.labels = summary.by_month.map(m => monthLabel(m.month));
+        monthlyChart.data.datasets[0].data = summary.by_month.map(m => m.total);
+        monthlyChart.update();
         document.getElementById('categoryChart').style.display = 'block';
         document.getElementById('monthlyChart').style.display = 'block';
     }
 
-    function renderCategoryChart(expenses) {
+    function monthLabel(month) {
+        const [year, monthNum] = month.split('-');
+        const date = new Date(year, parseInt(monthNum) - 1);
+        return date.toLocaleString('default', { month: 'short', year: 'numeric' });
+    }
+
+    function renderCategoryChart(categoryTotals) {
         const canvas = document.getElementById('pieChart');
         if (!canvas) {
             console.error("Category chart canvas element not found!");
@@ -279,14 +532,9 @@ document.addEventListener('DOMContentLoaded', function() {
             existingChart.destroy();
         }
 
-        // Aggregate expenses by category
-        const expensesByCategory = expenses.reduce((acc, expense) => {
-            acc[expense.category] = (acc[expense.category] || 0) + expense.amount;
-            return acc;
-        }, {});
-
-        const labels = Object.keys(expensesByCategory);
-        const data = Object.values(expensesByCategory);
+        // Totals per category come pre-aggregated from /expenses/summary
+        const labels = categoryTotals.map(c => c.category);
+        const data = categoryTotals.map(c => c.total);
 
         // Generate colors for each category
         const colors = generateColors(labels.length);
@@ -330,7 +578,7 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
-    function renderMonthlyChart(expenses) {
+    function renderMonthlyChart(monthlyTotals) {
         const canvas = document.getElementById('lineChart');
         if (!canvas) {
             console.error("Monthly chart canvas element not found!");
@@ -343,26 +591,14 @@ document.addEventListener('DOMContentLoaded', function() {
             existingChart.destroy();
         }
 
-        // Aggregate expenses by month
-        const expensesByMonth = expenses.reduce((acc, expense) => {
-            const date = new Date(expense.expense_date);
-            const monthKey = `${date.getFullYear()}-${String(date.getMonth() + 1).padStart(2, '0')}`;
-            acc[monthKey] = (acc[monthKey] || 0) + expense.amount;
-            return acc;
-        }, {});
-
-        // Sort months chronologically
-        const sortedMonths = Object.keys(expensesByMonth).sort();
-        const monthlyData = sortedMonths.map(month => expensesByMonth[month]);
+        // Monthly totals come pre-aggregated (and already in chronological order) from /expenses/summary
+        const sortedMonths = monthlyTotals.map(m => m.month);
+        const monthlyData = monthlyTotals.map(m => m.total);
 
         monthlyChart = new Chart(canvas, {
             type: 'line',
             data: {
-                labels: sortedMonths.map(month => {
-                    const [year, monthNum] = month.split('-');
-                    const date = new Date(year, parseInt(monthNum) - 1);
-                    return date.toLocaleString('default', { month: 'short', year: 'numeric' });
-                }),
+                labels: sortedMonths.map(monthLabel),
                 datasets: [{
                     label: 'Monthly Expenses',
                     data: monthlyData,
@@ -463,7 +699,12 @@ document.addEventListener('DOMContentLoaded', function() {
                     redirect: 'manual' // Important to handle redirect from server
                 });
 
-                if (response.type === 'opaqueredirect' || (response.status >= 300 && response.status < 400)) {
+                if ((response.type === 'opaqueredirect' || (response.status >= 300 && response.status < 400)) && expenseStream) {
+                    // The live stream delivers the new expense; nothing to reload
+                    console.log("Expense added; waiting for the live update.");
+                    showAuthMessage(expenseMessage, "Expense added!", false);
+                    expenseForm.reset();
+                } else if (response.type === 'opaqueredirect' || (response.status >= 300 && response.status < 400)) {
                     // Successful form submission leading to a redirect
                     console.log("Expense added, backend redirecting...");
                     window.location.href = dashboardPath; // Go to dashboard to see change
@@ -0,0 +1,5 @@
+# Benchmark and load-testing tools. Not imported by the application.
+#
+#   python -m benchmarks.seed --database-url sqlite:///./bench.db --users 50 --expenses-per-user 20000
+#   python -m benchmarks.load --database-url sqlite:///./bench.db --target inprocess --output baseline.json
+#   python -m benchmarks.load --target http://localhost:8000 --baseline baseline.json --output run.json
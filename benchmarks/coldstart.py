@@ -0,0 +1,184 @@
+import argparse
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from benchmarks import report
+
+# Cold-start benchmark. Each run starts a fresh interpreter, so nothing is shared between runs:
+#
+# - import profile: `python -X importtime -c "import app.main"`, reporting the median cumulative
+#   import time of every module over --runs runs (the slowest --top are printed);
+# - time to first /health: spawn a server (uvicorn, or gunicorn with gunicorn.conf.py) and poll
+#   GET /health until it answers 200, measured from process spawn.
+#
+# --fresh-bytecode points PYTHONPYCACHEPREFIX at an empty directory per run, so every module is
+# compiled from source: the difference from a normal run is what shipping .pyc files saves.
+#
+#   python -m benchmarks.coldstart --database-url sqlite:///./bench.db --runs 10 --output coldstart.json
+
+
+def _child_env(args, pycache_dir: Optional[str]) -> dict:
+    env = dict(os.environ)
+    if args.database_url:
+        env["SQLALCHEMY_DATABASE_URI"] = args.database_url
+    if pycache_dir:
+        env["PYTHONPYCACHEPREFIX"] = pycache_dir
+    if args.server == "gunicorn":
+        env["WEB_CONCURRENCY"] = str(args.workers) # Not -w: pool sizing reads it too
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def _fresh_pycache(args) -> Optional[str]:
+    return tempfile.mkdtemp(prefix="coldstart-pyc-") if args.fresh_bytecode else None
+
+
+def parse_importtime(stderr: str) -> Dict[str, float]:
+    """{module: cumulative seconds} from -X importtime output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = (part.strip() for part in line.replace("import time:", "|", 1).split("|"))
+        modules[name] = int(cumulative_us) / 1_000_000
+    return modules
+
+
+def profile_imports(args) -> Dict[str, List[float]]:
+    samples: Dict[str, List[float]] = defaultdict(list)
+    for _ in range(args.runs):
+        pycache_dir = _fresh_pycache(args)
+        try:
+            result = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", f"import {args.module}"],
+                env=_child_env(args, pycache_dir),
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+        finally:
+            if pycache_dir:
+                shutil.rmtree(pycache_dir, ignore_errors=True)
+        for name, seconds in parse_importtime(result.stderr).items():
+            samples[name].append(seconds)
+    return samples
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _server_command(args, port: int) -> List[str]:
+    if args.server == "gunicorn":
+        return [
+            sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-b", f"127.0.0.1:{port}", "app.main:app",
+        ]
+    return [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)]
+
+
+def time_to_first_health(args) -> List[float]:
+    samples = []
+    for _ in range(args.runs):
+        port = _free_port()
+        pycache_dir = _fresh_pycache(args)
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            _server_command(args, port),
+            env=_child_env(args, pycache_dir),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            deadline = start + args.timeout
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError(f"Server exited with code {process.returncode} before answering /health")
+                if time.perf_counter() > deadline:
+                    raise RuntimeError(f"No /health response within {args.timeout}s")
+                try:
+                    with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                        if response.status == 200:
+                            break
+                except OSError:
+                    time.sleep(0.01)
+            samples.append(time.perf_counter() - start)
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+            if pycache_dir:
+                shutil.rmtree(pycache_dir, ignore_errors=True)
+    return samples
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure import time per module and time to first /health.")
+    parser.add_argument("--database-url", default=None, help="Defaults to the app's configured database")
+    parser.add_argument("--module", default="app.main", help="Module to profile with -X importtime")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=25, help="Slowest modules to print")
+    parser.add_argument("--server", choices=["uvicorn", "gunicorn"], default="uvicorn")
+    parser.add_argument("--workers", type=int, default=1, help="gunicorn only")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for the first /health")
+    parser.add_argument("--fresh-bytecode", action="store_true", help="Compile every module from source on each run")
+    parser.add_argument("--skip-server", action="store_true", help="Only profile imports")
+    parser.add_argument("--label", default=None)
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    parser.add_argument("--baseline", default=None, help="Compare against a previous JSON report")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    import_samples = profile_imports(args)
+    modules = sorted(
+        ({"module": name, "median_ms": round(statistics.median(values) * 1000, 2)} for name, values in import_samples.items()),
+        key=lambda m: m["median_ms"],
+        reverse=True,
+    )
+    print(f"{'module':<60}{'cumulative ms':>14}")
+    for entry in modules[: args.top]:
+        print(f"{entry['module']:<60}{entry['median_ms']:>14.1f}")
+
+    # summarize() reports throughput per elapsed second, which means nothing here; pass 0.
+    operations = {"import": report.summarize(import_samples.get(args.module, []), 0, 0)}
+    if not args.skip_server:
+        operations["first_health"] = report.summarize(time_to_first_health(args), 0, 0)
+    result = {
+        "operations": operations,
+        "modules": modules,
+        "meta": {
+            "label": args.label,
+            "runs": args.runs,
+            "server": None if args.skip_server else args.server,
+            "workers": args.workers if args.server == "gunicorn" else 1,
+            "fresh_bytecode": args.fresh_bytecode,
+            **report.environment(),
+        },
+    }
+    print()
+    report.print_table(operations)
+    if args.output:
+        report.write_report(args.output, result)
+        print(f"Wrote {args.output}")
+    if args.baseline:
+        comparison = report.compare_reports(report.load_report(args.baseline), result, tolerance=args.tolerance)
+        report.print_comparison(comparison)
+        if any(entry["regression"] for entry in comparison):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
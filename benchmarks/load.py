@@ -0,0 +1,228 @@
+import argparse
+import asyncio
+import random
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from benchmarks import report
+from benchmarks.seed import BENCH_PASSWORD, CATEGORIES, bench_email, configure_database
+
+# Load generator: a fixed number of virtual users, each logging in as one seeded bench user and
+# then issuing a weighted random mix of requests back to back for --duration seconds.
+#
+# --target inprocess drives the ASGI app directly through httpx.ASGITransport (no sockets, no
+# server process: measures the app and database only). --target http://host:port drives a running
+# server, e.g. the gunicorn container. Seed the database first with benchmarks.seed.
+
+DEFAULT_MIX = {"token": 5, "list": 50, "add": 25, "update": 10, "delete": 10}
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    """Parse "list=60,add=30,token=10" into weights; unknown operations are rejected."""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown operation '{name}'; choose from {', '.join(DEFAULT_MIX)}")
+        mix[name] = int(weight)
+    return mix
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.recording = False
+
+    def record(self, operation: str, seconds: float, ok: bool) -> None:
+        if not self.recording:
+            return
+        if ok:
+            self.latencies[operation].append(seconds)
+        else:
+            self.errors[operation] += 1
+
+
+class VirtualUser:
+    def __init__(self, client, recorder: Recorder, user_index: int, rng: random.Random, page_size: int):
+        self.client = client
+        self.recorder = recorder
+        self.email = bench_email(user_index)
+        self.rng = rng
+        self.page_size = page_size
+        self.headers: Dict[str, str] = {}
+        self.known_ids: List[int] = [] # Expense ids seen in the last listing, targets for PUT/DELETE
+
+    async def _timed(self, operation: str, method: str, url: str, expected: int, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except Exception:
+            self.recorder.record(operation, time.perf_counter() - start, ok=False)
+            return None
+        self.recorder.record(operation, time.perf_counter() - start, ok=response.status_code == expected)
+        return response if response.status_code == expected else None
+
+    async def token(self) -> None:
+        response = await self._timed(
+            "token", "POST", "/auth/token", 200, data={"username": self.email, "password": BENCH_PASSWORD}
+        )
+        if response is not None:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def list(self) -> None:
+        response = await self._timed(
+            "list", "GET", "/expenses/", 200, params={"limit": self.page_size}, headers=self.headers
+        )
+        if response is not None:
+            self.known_ids = [item["id"] for item in response.json()]
+
+    async def add(self) -> None:
+        await self._timed(
+            "add", "POST", "/expenses/add", 303,
+            data={
+                "description": f"Load test #{self.rng.randrange(100000)}",
+                "amount": round(self.rng.uniform(1, 200), 2),
+                "category": self.rng.choice(CATEGORIES),
+                "expense_date_str": (date.today() - timedelta(days=self.rng.randrange(60))).isoformat(),
+            },
+            headers=self.headers,
+            follow_redirects=False,
+        )
+
+    async def update(self) -> None:
+        if not self.known_ids:
+            return await self.list()
+        expense_id = self.rng.choice(self.known_ids)
+        await self._timed(
+            "update", "PUT", f"/expenses/{expense_id}", 200,
+            json={"amount": round(self.rng.uniform(1, 200), 2)}, headers=self.headers,
+        )
+
+    async def delete(self) -> None:
+        if not self.known_ids:
+            return await self.list()
+        expense_id = self.known_ids.pop(self.rng.randrange(len(self.known_ids)))
+        await self._timed("delete", "DELETE", f"/expenses/{expense_id}", 204, headers=self.headers)
+
+    async def run(self, mix: Dict[str, int], deadline: float) -> None:
+        await self.token()
+        if not self.headers:
+            return
+        await self.list()
+        operations, weights = zip(*mix.items())
+        while time.perf_counter() < deadline:
+            operation = self.rng.choices(operations, weights=weights)[0]
+            await getattr(self, operation)()
+
+
+async def run_load(
+    client, users: int, concurrency: int, mix: Dict[str, int], duration: float, warmup: float, page_size: int, seed: int
+) -> dict:
+    recorder = Recorder()
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    deadline = start + warmup + duration
+    virtual_users = [
+        VirtualUser(client, recorder, i % users, random.Random(rng.random()), page_size) for i in range(concurrency)
+    ]
+    tasks = [asyncio.create_task(vu.run(mix, deadline)) for vu in virtual_users]
+    await asyncio.sleep(warmup)
+    recorder.recording = True
+    measured_start = time.perf_counter()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - measured_start
+
+    operations = {
+        name: report.summarize(recorder.latencies.get(name, []), recorder.errors.get(name, 0), elapsed)
+        for name in mix
+    }
+    all_latencies = [value for values in recorder.latencies.values() for value in values]
+    return {
+        "operations": operations,
+        "total": report.summarize(all_latencies, sum(recorder.errors.values()), elapsed),
+        "measured_seconds": round(elapsed, 2),
+    }
+
+
+async def _run(args) -> dict:
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    if args.target == "inprocess":
+        configure_database(args.database_url)
+        from app.core import security
+        from app.db.session import dispose_engines
+        from app.main import app
+
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+                return await _run_with(client, args)
+        finally:
+            await dispose_engines()
+            security.shutdown_password_hasher()
+    async with httpx.AsyncClient(base_url=args.target, timeout=args.timeout, limits=limits) as client:
+        return await _run_with(client, args)
+
+
+async def _run_with(client, args) -> dict:
+    return await run_load(
+        client,
+        users=args.users,
+        concurrency=args.concurrency,
+        mix=args.mix,
+        duration=args.duration,
+        warmup=args.warmup,
+        page_size=args.page_size,
+        seed=args.seed,
+    )
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Drive a request mix against the app and record latency percentiles.")
+    parser.add_argument("--target", default="inprocess", help="'inprocess' or a base URL such as http://localhost:8000")
+    parser.add_argument("--database-url", default=None, help="In-process only; defaults to the app's configured database")
+    parser.add_argument("--users", type=int, default=10, help="Number of seeded bench users to log in as")
+    parser.add_argument("--concurrency", type=int, default=20, help="Virtual users issuing requests concurrently")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds before measuring")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="e.g. list=50,add=25,update=10,delete=10,token=5")
+    parser.add_argument("--page-size", type=int, default=50, help="limit= for GET /expenses/")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--label", default=None, help="Free-form label stored in the report (e.g. a git sha)")
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    parser.add_argument("--baseline", default=None, help="Compare against a previous JSON report")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Relative p95/throughput change counted as a regression")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(_run(args))
+    result["meta"] = {
+        "label": args.label,
+        "target": args.target,
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "duration_seconds": args.duration,
+        "warmup_seconds": args.warmup,
+        "mix": args.mix,
+        "page_size": args.page_size,
+        **report.environment(),
+    }
+    report.print_table({**result["operations"], "total": result["total"]})
+    if args.output:
+        report.write_report(args.output, result)
+        print(f"Wrote {args.output}")
+    if args.baseline:
+        comparison = report.compare_reports(report.load_report(args.baseline), result, tolerance=args.tolerance)
+        report.print_comparison(comparison)
+        if any(entry["regression"] for entry in comparison):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
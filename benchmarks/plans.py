@@ -0,0 +1,188 @@
+import argparse
+import json
+import re
+import time
+from datetime import date, timedelta
+from typing import Iterable, List, Optional
+
+from benchmarks import report
+from benchmarks.seed import CATEGORIES, bench_email, configure_database
+
+# Query-plan check for the expense listing (GET /expenses/ filters and sort orders).
+#
+# For each scenario the query budget_service.build_expense_query() builds is EXPLAINed against a
+# seeded database and run a few times. A scenario fails if the plan reads expenses (or, on
+# PostgreSQL, any of its monthly partitions that holds rows) with a sequential scan (PostgreSQL
+# "Seq Scan", SQLite "SCAN expenses"), or with a full index scan that isn't bounded by owner_id (an
+# index scan without owner_id in its Index Cond, SQLite "SCAN expenses USING INDEX"); plans that
+# sort instead of reading an index in order are reported.
+# Seed at realistic volume first, e.g. 1M rows:
+#
+#   python -m benchmarks.seed --database-url sqlite:///./bench.db --users 50 --expenses-per-user 20000
+#   python -m benchmarks.plans --database-url sqlite:///./bench.db
+#
+# Exits 1 if any scenario fails, so it can gate CI against a seeded database.
+
+
+def scenarios() -> List[dict]:
+    today = date.today()
+    return [
+        {"name": "default", "filters": {}},
+        {"name": "date_range", "filters": {"start_date": today - timedelta(days=90), "end_date": today}},
+        {"name": "date_range_asc", "filters": {"start_date": today - timedelta(days=90), "sort": "date_asc"}},
+        {"name": "one_category", "filters": {"categories": [CATEGORIES[0]]}},
+        {"name": "three_categories", "filters": {"categories": list(CATEGORIES[:3])}},
+        {"name": "category_date_range", "filters": {"categories": [CATEGORIES[1]], "start_date": today - timedelta(days=180)}},
+        {"name": "amount_range", "filters": {"min_amount": 50, "max_amount": 200}},
+        {"name": "amount_sort", "filters": {"sort": "amount_desc"}},
+        {"name": "amount_range_sort", "filters": {"min_amount": 50, "max_amount": 200, "sort": "amount_asc"}},
+        {
+            "name": "combined",
+            "filters": {
+                "start_date": today - timedelta(days=365),
+                "categories": list(CATEGORIES[:2]),
+                "min_amount": 10,
+                "max_amount": 500,
+            },
+        },
+    ]
+
+
+def _compile(db, query) -> str:
+    return str(query.statement.compile(dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True}))
+
+
+def _sqlite_plan(db, sql: str) -> dict:
+    from sqlalchemy import text
+
+    details = [row[3] for row in db.execute(text("EXPLAIN QUERY PLAN " + sql))]
+    problems = []
+    for detail in details:
+        if re.match(r"SCAN expenses\b", detail):
+            problems.append("sequential scan" if "USING" not in detail else "full index scan")
+    return {
+        "plan": details,
+        "indexes": sorted({m.group(1) for d in details for m in [re.search(r"USING (?:COVERING )?INDEX (\w+)", d)] if m}),
+        "sorts": any("TEMP B-TREE" in detail for detail in details),
+        "problems": problems,
+    }
+
+
+# expenses itself, or one of its partitions (migration 0007)
+_POSTGRESQL_EXPENSES = re.compile(r"^expenses(_y\d{4}m\d{2}|_default)?$")
+_POSTGRESQL_OWNER_COND = re.compile(r"\bowner_id = ")
+
+
+def _postgresql_nodes(node: dict) -> Iterable[dict]:
+    yield node
+    for child in node.get("Plans", []):
+        yield from _postgresql_nodes(child)
+
+
+def _bounded_by_owner(node: dict) -> bool:
+    """Whether an index scan (or bitmap scan tree) only reads one owner's entries."""
+    node_type = node["Node Type"]
+    if node_type in ("Index Scan", "Index Only Scan", "Bitmap Index Scan"):
+        return bool(_POSTGRESQL_OWNER_COND.search(node.get("Index Cond", "")))
+    children = node.get("Plans", [])
+    if node_type == "BitmapOr":
+        return all(_bounded_by_owner(child) for child in children)
+    # Bitmap Heap Scan (one child) or BitmapAnd (any bounded child bounds the result)
+    return any(_bounded_by_owner(child) for child in children)
+
+
+def _postgresql_plan(db, sql: str) -> dict:
+    from sqlalchemy import text
+
+    plan = db.execute(text("EXPLAIN (FORMAT JSON) " + sql)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    nodes = list(_postgresql_nodes(plan[0]["Plan"]))
+    # Partitions for the coming months are empty, and scanning them reads nothing. reltuples is 0
+    # only once ANALYZE has seen the partition empty (-1 before), and check_plans analyzes first.
+    empty = {
+        name for name, in db.execute(text(
+            "SELECT relname FROM pg_class WHERE relname ~ '^expenses_(y[0-9]{4}m[0-9]{2}|default)$' AND reltuples = 0"
+        ))
+    }
+    problems = []
+    for node in nodes:
+        if not _POSTGRESQL_EXPENSES.match(node.get("Relation Name", "")):
+            continue
+        if node["Node Type"] == "Seq Scan" and node["Relation Name"] not in empty:
+            problems.append("sequential scan")
+        elif node["Node Type"] in ("Index Scan", "Index Only Scan", "Bitmap Heap Scan") and not _bounded_by_owner(node):
+            problems.append("full index scan")
+    return {
+        "plan": [f"{node['Node Type']} {node.get('Index Name') or node.get('Relation Name') or ''}".strip() for node in nodes],
+        "indexes": sorted({node["Index Name"] for node in nodes if node.get("Index Name")}),
+        "sorts": any(node["Node Type"] in ("Sort", "Incremental Sort") for node in nodes),
+        "problems": list(dict.fromkeys(problems)), # once per kind, not once per partition
+    }
+
+
+def check_plans(user_index: int, limit: int, runs: int) -> List[dict]:
+    from sqlalchemy import text
+
+    from app.db import models as db_models
+    from app.db.session import SessionLocal
+    from app.models import expense as expense_schema
+    from app.services import budget_service
+
+    if not SessionLocal:
+        raise RuntimeError("Database is not configured; pass --database-url or set SQLALCHEMY_DATABASE_URI.")
+    db = SessionLocal()
+    try:
+        user_id = db.query(db_models.User.id).filter(db_models.User.email == bench_email(user_index)).scalar()
+        if user_id is None:
+            raise RuntimeError(f"{bench_email(user_index)} not found; seed the database with benchmarks.seed first.")
+        dialect = db.get_bind().dialect.name
+        explain = _postgresql_plan if dialect == "postgresql" else _sqlite_plan
+        # Plan with fresh statistics, as production would after autovacuum.
+        db.execute(text("ANALYZE expenses"))
+        results = []
+        for scenario in scenarios():
+            filters = expense_schema.ExpenseFilters(**scenario["filters"])
+            query = budget_service.build_expense_query(db, user_id, filters=filters).limit(limit)
+            result = {"name": scenario["name"], **explain(db, _compile(db, query))}
+            latencies = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                query.all()
+                latencies.append(time.perf_counter() - start)
+            db.expunge_all()
+            result["latency"] = report.summarize(latencies, 0, 0)
+            results.append(result)
+        return results
+    finally:
+        db.close()
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Check that expense listing queries are served by indexes.")
+    parser.add_argument("--database-url", default=None, help="Defaults to the app's configured database")
+    parser.add_argument("--user-index", type=int, default=0, help="Seeded bench user to query as")
+    parser.add_argument("--limit", type=int, default=100, help="Page size")
+    parser.add_argument("--runs", type=int, default=5, help="Timed executions per scenario")
+    parser.add_argument("--verbose", action="store_true", help="Print every plan")
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    args = parser.parse_args(argv)
+
+    configure_database(args.database_url)
+    results = check_plans(args.user_index, args.limit, args.runs)
+    print(f"{'scenario':<22}{'p50 ms':>10}  {'sort':<6}{'status':<8}indexes")
+    for result in results:
+        status = "FAIL" if result["problems"] else "ok"
+        sort = "yes" if result["sorts"] else "no"
+        print(f"{result['name']:<22}{result['latency']['p50_ms']:>10.2f}  {sort:<6}{status:<8}{', '.join(result['indexes'])}")
+        if args.verbose or result["problems"]:
+            for line in result["plan"]:
+                print(f"    {line}")
+    if args.output:
+        report.write_report(args.output, {"scenarios": results, "meta": report.environment()})
+        print(f"Wrote {args.output}")
+    return 1 if any(result["problems"] for result in results) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
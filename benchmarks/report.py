@@ -0,0 +1,103 @@
+import json
+import math
+import platform
+import sys
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence
+
+# Latency summaries and baseline files shared by the benchmark runners.
+# A baseline is the JSON written by write_report(); compare_reports() diffs a new run against it.
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence (0 for an empty one)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies: Iterable[float], errors: int, elapsed_seconds: float) -> dict:
+    """Summary for one operation. Latencies are in seconds; the summary reports milliseconds."""
+    values = sorted(latencies)
+    count = len(values)
+    return {
+        "count": count,
+        "errors": errors,
+        "throughput_rps": round(count / elapsed_seconds, 2) if elapsed_seconds else 0.0,
+        "mean_ms": round(sum(values) / count * 1000, 3) if count else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if count else 0.0,
+    }
+
+
+def environment() -> dict:
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def write_report(path: str, report: dict) -> None:
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load_report(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def print_table(operations: Dict[str, dict]) -> None:
+    print(f"{'operation':<14}{'count':>8}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, s in operations.items():
+        print(
+            f"{name:<14}{s['count']:>8}{s['errors']:>8}{s['throughput_rps']:>10.1f}"
+            f"{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}"
+        )
+
+
+def compare_reports(baseline: dict, current: dict, tolerance: float = 0.10) -> List[dict]:
+    """
+    Compare the "operations" of two reports. Returns one entry per operation present in both;
+    an entry is a regression when p95 latency grew, or throughput fell, by more than tolerance.
+    """
+    results = []
+    for name, new in current.get("operations", {}).items():
+        old = baseline.get("operations", {}).get(name)
+        if not old:
+            continue
+        entry = {"operation": name, "regression": False}
+        for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_rps"):
+            entry[key] = {"baseline": old[key], "current": new[key], "change": _relative_change(old[key], new[key])}
+        p95_change = entry["p95_ms"]["change"]
+        rps_change = entry["throughput_rps"]["change"]
+        if (p95_change is not None and p95_change > tolerance) or (rps_change is not None and rps_change < -tolerance):
+            entry["regression"] = True
+        results.append(entry)
+    return results
+
+
+def _relative_change(old: float, new: float) -> Optional[float]:
+    if not old:
+        return None
+    return round((new - old) / old, 4)
+
+
+def print_comparison(comparison: List[dict]) -> None:
+    print(f"{'operation':<14}{'p95 base':>10}{'p95 now':>10}{'change':>9}{'rps base':>10}{'rps now':>10}{'change':>9}")
+    for entry in comparison:
+        p95, rps = entry["p95_ms"], entry["throughput_rps"]
+        flag = "  REGRESSION" if entry["regression"] else ""
+        print(
+            f"{entry['operation']:<14}{p95['baseline']:>10.2f}{p95['current']:>10.2f}{_fmt_change(p95['change']):>9}"
+            f"{rps['baseline']:>10.1f}{rps['current']:>10.1f}{_fmt_change(rps['change']):>9}{flag}"
+        )
+
+
+def _fmt_change(change: Optional[float]) -> str:
+    return "n/a" if change is None else f"{change * 100:+.1f}%"
@@ -0,0 +1,159 @@
+import argparse
+import os
+import random
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, Iterator, List, Optional
+
+# Synthetic data for benchmarks: N users (bench-user-<i>@example.com, all sharing one password)
+# with M expenses each, spread over the last --days days. Rows are generated lazily and inserted
+# in batches with executemany, so seeding millions of rows keeps memory flat. Rollups are rebuilt
+# for the seeded users at the end, exactly as the rollup_service CLI would.
+
+BENCH_EMAIL_TEMPLATE = "bench-user-{}@example.com"
+BENCH_PASSWORD = "bench-password"
+
+CATEGORIES = (
+    "Groceries", "Rent", "Utilities", "Transport", "Dining", "Entertainment",
+    "Health", "Shopping", "Travel", "Subscriptions", "Education", "Gifts",
+)
+MERCHANTS = (
+    "Corner Market", "City Transit", "Power & Light", "Bistro 21", "Cinema Plaza", "Pharmacy Plus",
+    "Book Nook", "Air Lines", "Stream Co", "Coffee House", "Hardware Hub", "Fuel Stop",
+)
+
+
+def configure_database(database_url: Optional[str]) -> None:
+    """Point the app's settings at database_url. Must run before anything under app/ is imported."""
+    if database_url:
+        os.environ["SQLALCHEMY_DATABASE_URI"] = database_url
+
+
+def bench_email(index: int) -> str:
+    return BENCH_EMAIL_TEMPLATE.format(index)
+
+
+def generate_expenses(rng: random.Random, owner_id: int, count: int, days: int, change_seq: int = 0) -> Iterator[dict]:
+    today = date.today()
+    for _ in range(count):
+        expense_date = today - timedelta(days=rng.randrange(days))
+        created_at = datetime.combine(expense_date, datetime.min.time(), tzinfo=timezone.utc) + timedelta(
+            seconds=rng.randrange(86400)
+        )
+        yield {
+            "description": f"{rng.choice(MERCHANTS)} #{rng.randrange(10000)}",
+            # Log-normal amounts: mostly small purchases with a long tail
+            "amount": round(min(rng.lognormvariate(3.0, 1.0), 5000.0), 2),
+            "category": rng.choice(CATEGORIES),
+            "expense_date": expense_date,
+            "owner_id": owner_id,
+            "created_at": created_at,
+            "change_seq": change_seq,
+        }
+
+
+def _batched(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    batch: List[dict] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _ensure_users(db, users: int) -> List[int]:
+    from app.core.security import get_password_hash
+    from app.db import models as db_models
+
+    # One bcrypt hash shared by every synthetic user; hashing per user would dominate seeding time.
+    hashed_password = get_password_hash(BENCH_PASSWORD)
+    emails = [bench_email(i) for i in range(users)]
+    existing = dict(
+        db.query(db_models.User.email, db_models.User.id).filter(db_models.User.email.in_(emails)).all()
+    )
+    missing = [email for email in emails if email not in existing]
+    if missing:
+        db.add_all([
+            db_models.User(email=email, full_name=email.split("@")[0], hashed_password=hashed_password, is_active=True)
+            for email in missing
+        ])
+        db.commit()
+        existing = dict(
+            db.query(db_models.User.email, db_models.User.id).filter(db_models.User.email.in_(emails)).all()
+        )
+    return [existing[email] for email in emails]
+
+
+def _reset_users(db, user_ids: List[int]) -> None:
+    from app.db import models as db_models
+
+    db.query(db_models.ExpenseRollup).filter(db_models.ExpenseRollup.owner_id.in_(user_ids)).delete(synchronize_session=False)
+    db.query(db_models.Expense).filter(db_models.Expense.owner_id.in_(user_ids)).delete(synchronize_session=False)
+    db.commit()
+
+
+def seed(users: int, expenses_per_user: int, days: int = 730, batch_size: int = 5000, seed_value: int = 42, reset: bool = False) -> dict:
+    from sqlalchemy import insert
+
+    from app.db import migrate
+    from app.db import models as db_models
+    from app.db.session import SessionLocal
+    from app.services import budget_service, rollup_service
+
+    if not SessionLocal:
+        raise RuntimeError("Database is not configured; pass --database-url or set SQLALCHEMY_DATABASE_URI.")
+    migrate.upgrade()
+    rng = random.Random(seed_value)
+    db = SessionLocal()
+    started = time.perf_counter()
+    inserted = 0
+    try:
+        user_ids = _ensure_users(db, users)
+        if reset:
+            _reset_users(db, user_ids)
+        for owner_id in user_ids:
+            # One ledger version per seeded user, like a bulk import, so delta sync sees the rows.
+            change_seq = budget_service.bump_ledger_version(db, owner_id)
+            db.commit()
+            rows = generate_expenses(rng, owner_id, expenses_per_user, days, change_seq)
+            for batch in _batched(rows, batch_size):
+                db.execute(insert(db_models.Expense), batch)
+                db.commit()
+                inserted += len(batch)
+            print(f"Seeded user_id {owner_id}: {inserted} expenses so far")
+        for owner_id in user_ids:
+            rollup_service.rebuild_rollups(db, user_id=owner_id)
+    finally:
+        db.close()
+    elapsed = time.perf_counter() - started
+    return {"users": len(user_ids), "expenses": inserted, "seconds": round(elapsed, 1)}
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Seed a database with synthetic users and expenses.")
+    parser.add_argument("--database-url", default=None, help="Defaults to the app's configured database")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--expenses-per-user", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=730, help="Spread expense dates over this many past days")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42, help="Random seed, for reproducible data")
+    parser.add_argument("--reset", action="store_true", help="Delete the synthetic users' existing expenses first")
+    args = parser.parse_args(argv)
+
+    configure_database(args.database_url)
+    result = seed(
+        users=args.users,
+        expenses_per_user=args.expenses_per_user,
+        days=args.days,
+        batch_size=args.batch_size,
+        seed_value=args.seed,
+        reset=args.reset,
+    )
+    print(f"Seeded {result['expenses']} expenses for {result['users']} users in {result['seconds']}s.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
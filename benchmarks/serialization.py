@@ -0,0 +1,140 @@
+import argparse
+import functools
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+from benchmarks import report
+from benchmarks.seed import bench_email, configure_database
+
+# Per-row cost of the expense listing's response path, at several page sizes, for both:
+#
+# - orm: what GET /expenses/ did before app/core/serialization.py. ORM objects, one
+#   ExpenseInDB.model_validate per row, then FastAPI's response_model pass (validate the list
+#   again, dump_json).
+# - columns: the current path. Column Row tuples, one TypeAdapter validation of plain dicts, one
+#   encode (orjson when installed; --no-orjson measures pydantic's own encoder).
+#
+# Each timed run queries the seeded database and serializes the result, so the numbers include
+# fetching rows, which is where the ORM path also pays (identity map, instance state). The seeded
+# user needs at least as many expenses as the largest size:
+#
+#   python -m benchmarks.seed --database-url sqlite:///./bench.db --users 1 --expenses-per-user 10000
+#   python -m benchmarks.serialization --database-url sqlite:///./bench.db --sizes 1000,10000 --output serialization.json
+
+
+@functools.lru_cache(maxsize=None)
+def _response_model_adapter():
+    # The route's response_model, which FastAPI validates and dumps a returned list against.
+    from pydantic import TypeAdapter
+
+    from app.models import expense as expense_schema
+
+    return TypeAdapter(Union[List[expense_schema.ExpenseInDB], expense_schema.ExpensePage])
+
+
+def _orm_path(db, user_id: int, size: int) -> bytes:
+    from app.models import expense as expense_schema
+    from app.services import budget_service
+
+    response_field = _response_model_adapter()
+    expenses = budget_service.get_expenses_for_user(db, user_id=user_id, limit=size)
+    items = [expense_schema.ExpenseInDB.model_validate(exp) for exp in expenses]
+    return response_field.dump_json(response_field.validate_python(items))
+
+
+def _columns_path(db, user_id: int, size: int) -> bytes:
+    from app.core import serialization
+    from app.models import expense as expense_schema
+    from app.services import budget_service
+
+    fields = expense_schema.EXPENSE_ROW_FIELDS
+    rows = budget_service.get_expenses_for_user(db, user_id=user_id, limit=size, columns=fields)
+    return serialization.json_response(expense_schema.expense_rows_adapter, serialization.rows_to_dicts(rows, fields)).body
+
+
+PATHS: Dict[str, Callable] = {"orm": _orm_path, "columns": _columns_path}
+
+
+def run(user_index: int, sizes: List[int], runs: int) -> Dict[str, dict]:
+    from app.db import models as db_models
+    from app.db.session import SessionLocal
+
+    if not SessionLocal:
+        raise RuntimeError("Database is not configured; pass --database-url or set SQLALCHEMY_DATABASE_URI.")
+    db = SessionLocal()
+    try:
+        user_id = db.query(db_models.User.id).filter(db_models.User.email == bench_email(user_index)).scalar()
+        if user_id is None:
+            raise RuntimeError(f"{bench_email(user_index)} not found; seed the database with benchmarks.seed first.")
+        operations = {}
+        for size in sizes:
+            bodies = {}
+            for name, path in PATHS.items():
+                bodies[name] = path(db, user_id, size) # Warm-up, and the body to compare
+                db.expunge_all()
+                latencies = []
+                for _ in range(runs):
+                    start = time.perf_counter()
+                    path(db, user_id, size)
+                    latencies.append(time.perf_counter() - start)
+                    db.expunge_all() # Start every run with an empty identity map, as a request does
+                summary = report.summarize(latencies, 0, 0)
+                rows = bodies[name].count(b'"owner_id"')
+                summary["rows"] = rows
+                summary["per_row_us"] = round(summary["p50_ms"] * 1000 / rows, 3) if rows else 0.0
+                operations[f"{name}_{size}"] = summary
+            if bodies["orm"] != bodies["columns"]:
+                raise RuntimeError(f"The two paths encoded {size} rows differently")
+        return operations
+    finally:
+        db.close()
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare the per-row cost of the expense list response paths.")
+    parser.add_argument("--database-url", default=None, help="Defaults to the app's configured database")
+    parser.add_argument("--user-index", type=int, default=0, help="Seeded bench user to list")
+    parser.add_argument("--sizes", default="1000,10000", help="Comma-separated page sizes")
+    parser.add_argument("--runs", type=int, default=20, help="Timed runs per path and size")
+    parser.add_argument("--no-orjson", action="store_true", help="Encode with pydantic even if orjson is installed")
+    parser.add_argument("--label", default=None)
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    parser.add_argument("--baseline", default=None, help="Compare against a previous JSON report")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    configure_database(args.database_url)
+    from app.core import serialization
+
+    if args.no_orjson:
+        serialization.orjson = None
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    operations = run(args.user_index, sizes, args.runs)
+
+    report.print_table(operations)
+    print()
+    print(f"{'operation':<16}{'rows':>8}{'us/row':>10}")
+    for name, summary in operations.items():
+        print(f"{name:<16}{summary['rows']:>8}{summary['per_row_us']:>10.2f}")
+    result = {
+        "operations": operations,
+        "meta": {
+            "label": args.label,
+            "runs": args.runs,
+            "encoder": "orjson" if serialization.orjson is not None else "pydantic",
+            **report.environment(),
+        },
+    }
+    if args.output:
+        report.write_report(args.output, result)
+        print(f"Wrote {args.output}")
+    if args.baseline:
+        comparison = report.compare_reports(report.load_report(args.baseline), result, tolerance=args.tolerance)
+        report.print_comparison(comparison)
+        if any(entry["regression"] for entry in comparison):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,201 @@
+import argparse
+import asyncio
+import glob
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Iterable, List, Optional
+
+from benchmarks import load, report
+
+# Worker-count matrix: for each --workers count, start gunicorn with gunicorn.conf.py and
+# WEB_CONCURRENCY=<count> (so the DB pools are sized as in production), wait for /health, drive the
+# benchmarks.load request mix at it over HTTP and stop it. Prints throughput and latency per worker
+# count, throughput per worker, and the server's memory (PSS, which counts pages shared between
+# the master and the workers once) to show what preload_app saves.
+#
+# The load generator runs in this process, on the same machine: give the server the CPUs under
+# test (e.g. `taskset`, or a container limit) and keep the client off them. The mix writes, so
+# reseed (benchmarks.seed --reset) before comparing a run with a baseline.
+#
+#   python -m benchmarks.workers --database-url sqlite:///./bench.db --workers 1,2,4 --output workers.json
+
+
+def _parse_counts(value: str) -> List[int]:
+    try:
+        counts = [int(part) for part in value.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected comma-separated worker counts, got '{value}'")
+    if any(count < 1 for count in counts):
+        raise argparse.ArgumentTypeError("Worker counts must be at least 1")
+    return counts
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _server_env(args, workers: int) -> dict:
+    env = dict(os.environ)
+    if args.database_url:
+        env["SQLALCHEMY_DATABASE_URI"] = args.database_url
+    env["WEB_CONCURRENCY"] = str(workers)
+    env["GUNICORN_PRELOAD"] = "false" if args.no_preload else "true"
+    return env
+
+
+def _wait_for_health(process: subprocess.Popen, port: int, timeout: float) -> None:
+    deadline = time.perf_counter() + timeout
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode} before answering /health")
+        if time.perf_counter() > deadline:
+            raise RuntimeError(f"No /health response within {timeout}s")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            time.sleep(0.05)
+
+
+def _process_tree(pid: int) -> List[int]:
+    pids = [pid]
+    for children in glob.glob(f"/proc/{pid}/task/*/children"):
+        with open(children) as f:
+            for child in f.read().split():
+                pids.extend(_process_tree(int(child)))
+    return pids
+
+
+def server_memory_mb(pid: int) -> Optional[float]:
+    """Total PSS of a process and its descendants in MiB, or None where /proc doesn't provide it."""
+    total_kb = 0
+    try:
+        for member in _process_tree(pid):
+            with open(f"/proc/{member}/smaps_rollup") as f:
+                total_kb += next(int(line.split()[1]) for line in f if line.startswith("Pss:"))
+    except (OSError, StopIteration):
+        return None
+    return round(total_kb / 1024, 1)
+
+
+async def _drive(port: int, args) -> dict:
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=args.timeout, limits=limits) as client:
+        return await load.run_load(
+            client,
+            users=args.users,
+            concurrency=args.concurrency,
+            mix=args.mix,
+            duration=args.duration,
+            warmup=args.warmup,
+            page_size=args.page_size,
+            seed=args.seed,
+        )
+
+
+def run_matrix(args) -> dict:
+    operations, rows = {}, []
+    for workers in args.workers:
+        port = _free_port()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-b", f"127.0.0.1:{port}", "app.main:app"],
+            env=_server_env(args, workers),
+            stdout=subprocess.DEVNULL,
+            stderr=None if args.server_log else subprocess.DEVNULL,
+        )
+        try:
+            _wait_for_health(process, port, args.startup_timeout)
+            result = asyncio.run(_drive(port, args))
+            memory = server_memory_mb(process.pid)
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        total = result["total"]
+        operations[f"workers={workers}"] = total
+        rows.append({
+            "workers": workers,
+            "throughput_rps": total["throughput_rps"],
+            "rps_per_worker": round(total["throughput_rps"] / workers, 2),
+            "p50_ms": total["p50_ms"],
+            "p95_ms": total["p95_ms"],
+            "p99_ms": total["p99_ms"],
+            "errors": total["errors"],
+            "memory_mb": memory,
+            "operations": result["operations"],
+        })
+    return {"operations": operations, "matrix": rows}
+
+
+def print_matrix(rows: List[dict]) -> None:
+    base = rows[0]["throughput_rps"] if rows else 0
+    print(f"{'workers':>8}{'rps':>10}{'rps/worker':>12}{'speedup':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}{'PSS MiB':>10}")
+    for row in rows:
+        speedup = f"{row['throughput_rps'] / base:.2f}x" if base else "n/a"
+        memory = f"{row['memory_mb']:.1f}" if row["memory_mb"] is not None else "n/a"
+        print(
+            f"{row['workers']:>8}{row['throughput_rps']:>10.1f}{row['rps_per_worker']:>12.1f}{speedup:>9}"
+            f"{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}{row['errors']:>8}{memory:>10}"
+        )
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure throughput and latency against gunicorn worker count.")
+    parser.add_argument("--database-url", default=None, help="Defaults to the app's configured database")
+    parser.add_argument("--workers", type=_parse_counts, default=[1, 2, 4], help="Worker counts to run, e.g. 1,2,4,8")
+    parser.add_argument("--no-preload", action="store_true", help="Run with GUNICORN_PRELOAD=false")
+    parser.add_argument("--users", type=int, default=10, help="Number of seeded bench users to log in as")
+    parser.add_argument("--concurrency", type=int, default=20, help="Virtual users issuing requests concurrently")
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured seconds per worker count")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Unmeasured seconds before measuring")
+    parser.add_argument("--mix", type=load.parse_mix, default=load.DEFAULT_MIX, help="See benchmarks.load")
+    parser.add_argument("--page-size", type=int, default=50, help="limit= for GET /expenses/")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout")
+    parser.add_argument("--startup-timeout", type=float, default=60.0, help="Seconds to wait for the first /health")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--server-log", action="store_true", help="Show gunicorn's log (including its startup report)")
+    parser.add_argument("--label", default=None)
+    parser.add_argument("--output", default=None, help="Write the JSON report here")
+    parser.add_argument("--baseline", default=None, help="Compare against a previous JSON report")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args(argv)
+
+    result = run_matrix(args)
+    result["meta"] = {
+        "label": args.label,
+        "workers": args.workers,
+        "preload": not args.no_preload,
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "duration_seconds": args.duration,
+        "warmup_seconds": args.warmup,
+        "mix": args.mix,
+        "page_size": args.page_size,
+        "cpu_count": os.cpu_count(),
+        **report.environment(),
+    }
+    print_matrix(result["matrix"])
+    if args.output:
+        report.write_report(args.output, result)
+        print(f"Wrote {args.output}")
+    if args.baseline:
+        comparison = report.compare_reports(report.load_report(args.baseline), result, tolerance=args.tolerance)
+        report.print_comparison(comparison)
+        if any(entry["regression"] for entry in comparison):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
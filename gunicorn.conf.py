@@ -0,0 +1,158 @@
+import gc
+import os
+import resource
+import shutil
+import sys
+from typing import Optional, Tuple
+
+# Gunicorn settings for the container (see Dockerfile). Command-line flags still override these.
+#
+# Sized from the container rather than hard-coded, so the same image fits any vCPU/memory setting:
+#
+# - workers: GUNICORN_WORKERS_PER_CPU (default 1) per CPU of the cgroup CPU quota, rounded, at
+#   least 1; then capped so workers * GUNICORN_WORKER_MEMORY_MB + GUNICORN_MEMORY_RESERVE_MB fits
+#   the cgroup memory limit. An explicit WEB_CONCURRENCY wins over both. The result is exported as
+#   WEB_CONCURRENCY, which the DB pool sizing (app/db/connection.py pool_limits) divides by.
+# - keepalive: longer than the front end's idle timeout on Cloud Run (K_SERVICE is set there), so
+#   the proxy, not the worker, closes idle connections; gunicorn's default elsewhere.
+# - graceful_timeout: Cloud Run kills the container 10s after SIGTERM; finish before that.
+# - preload_app: the app is imported once in the master and workers fork from it, sharing its code
+#   pages copy-on-write. post_fork throws away the master's DB pools and Cloud SQL connectors
+#   (connection.after_fork) so no socket is shared between processes.
+#
+# when_ready logs the chosen values and where each came from. Compare worker counts with
+# `python -m benchmarks.workers`.
+
+_CGROUP = "/sys/fs/cgroup"
+_UNLIMITED_BYTES = 1 << 60 # cgroup v1 reports "no limit" as a huge page-aligned number
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _cpu_limit() -> Tuple[float, str]:
+    """(CPUs available to this container, where that figure came from)."""
+    quota = _read(f"{_CGROUP}/cpu.max") # cgroup v2: "<quota> <period>" or "max <period>"
+    if quota:
+        limit, _, period = quota.partition(" ")
+        if limit != "max" and period:
+            return int(limit) / int(period), "cgroup cpu.max"
+    limit, period = _read(f"{_CGROUP}/cpu/cpu.cfs_quota_us"), _read(f"{_CGROUP}/cpu/cpu.cfs_period_us")
+    if limit and period and int(limit) > 0:
+        return int(limit) / int(period), "cgroup cpu.cfs_quota_us"
+    if hasattr(os, "sched_getaffinity"):
+        return float(len(os.sched_getaffinity(0))), "cpu affinity"
+    return float(os.cpu_count() or 1), "cpu count"
+
+
+def _memory_limit() -> Tuple[Optional[int], str]:
+    """(bytes of memory available to this container or None if unknown, where that came from)."""
+    for path, source in (
+        (f"{_CGROUP}/memory.max", "cgroup memory.max"),
+        (f"{_CGROUP}/memory/memory.limit_in_bytes", "cgroup memory.limit_in_bytes"),
+    ):
+        value = _read(path)
+        if value and value != "max" and int(value) < _UNLIMITED_BYTES:
+            return int(value), source
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES"), "physical memory"
+    except (ValueError, OSError, AttributeError):
+        return None, "unknown"
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _size_workers() -> Tuple[int, str]:
+    if os.environ.get("WEB_CONCURRENCY"):
+        return int(os.environ["WEB_CONCURRENCY"]), "WEB_CONCURRENCY"
+    per_cpu = float(os.environ.get("GUNICORN_WORKERS_PER_CPU") or 1)
+    count = max(1, round(_cpu_count * per_cpu))
+    source = f"{_cpu_count:g} CPU x {per_cpu:g}"
+    if _memory_bytes is not None:
+        per_worker = _env_int("GUNICORN_WORKER_MEMORY_MB", 160) << 20
+        reserve = _env_int("GUNICORN_MEMORY_RESERVE_MB", 128) << 20
+        fits = max(1, (_memory_bytes - reserve) // per_worker)
+        if fits < count:
+            count, source = fits, f"memory: {_memory_bytes >> 20} MiB fits {fits}"
+    return count, source
+
+
+_on_cloud_run = bool(os.environ.get("K_SERVICE"))
+_cpu_count, _cpu_source = _cpu_limit()
+_memory_bytes, _memory_source = _memory_limit()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers, _workers_source = _size_workers()
+worker_class = "uvicorn.workers.UvicornWorker"
+keepalive = _env_int("GUNICORN_KEEPALIVE", 620 if _on_cloud_run else 5)
+# Uvicorn workers only miss their heartbeat when the event loop is blocked; request time limits
+# are the front end's job (Cloud Run --timeout).
+timeout = _env_int("GUNICORN_TIMEOUT", 60)
+graceful_timeout = _env_int("GUNICORN_GRACEFUL_TIMEOUT", 8 if _on_cloud_run else 30)
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() in ("1", "true", "yes")
+
+# Pool sizing reads WEB_CONCURRENCY; with preload the app is imported right after this file.
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+# Prometheus multiprocess mode: every worker writes its metrics to files in this directory and
+# /metrics merges them. It must exist before anything imports prometheus_client, and with
+# preload_app that is the master, right after this file and before any server hook runs. Start from
+# an empty directory so counters from a previous run aren't merged in, but only once per master:
+# a reload (SIGHUP) runs this file again while the workers' files are in use.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus_multiproc")
+if os.environ.get("_PROMETHEUS_MULTIPROC_DIR_OWNER") != str(os.getpid()):
+    shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+    os.environ["_PROMETHEUS_MULTIPROC_DIR_OWNER"] = str(os.getpid())
+
+
+def when_ready(server):
+    cfg = server.cfg
+    memory = f"{_memory_bytes >> 20} MiB ({_memory_source})" if _memory_bytes is not None else "unknown"
+    report = [
+        ("bind", ", ".join(cfg.bind)),
+        ("workers", f"{cfg.workers} ({_workers_source})" if cfg.workers == workers else f"{cfg.workers} (command line)"),
+        ("cpu limit", f"{_cpu_count:g} ({_cpu_source})"),
+        ("memory limit", memory),
+        ("keepalive", f"{cfg.keepalive}s"),
+        ("timeout", f"{cfg.timeout}s"),
+        ("graceful_timeout", f"{cfg.graceful_timeout}s"),
+        ("preload_app", str(cfg.preload_app)),
+    ]
+    if "app.db.connection" in sys.modules: # Only once the app is loaded (preload); don't import it here
+        pool_size, max_overflow = sys.modules["app.db.connection"].pool_limits()
+        report.append(("db pool per worker", f"{pool_size} + {max_overflow} overflow"))
+    if cfg.preload_app:
+        # Max RSS is in KiB on Linux: the master's footprint after importing the app.
+        report.append(("master rss", f"{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss >> 10} MiB"))
+        # Move everything imported so far out of the collector's reach, so collections in the
+        # workers don't write to (and un-share) the master's pages.
+        gc.freeze()
+    if cfg.workers != int(os.environ["WEB_CONCURRENCY"]):
+        server.log.warning(
+            "-w %s differs from WEB_CONCURRENCY=%s used for DB pool sizing; set WEB_CONCURRENCY instead",
+            cfg.workers, os.environ["WEB_CONCURRENCY"],
+        )
+    width = max(len(name) for name, _ in report)
+    server.log.info("Server configuration:\n%s", "\n".join(f"  {name:<{width}}  {value}" for name, value in report))
+
+
+def post_fork(server, worker):
+    # Engines and connectors created in the master (preload_app) must not be used by the workers.
+    connection = sys.modules.get("app.db.connection")
+    if connection is not None:
+        connection.after_fork()
+
+
+def child_exit(server, worker):
+    # Drop the dead worker's live gauges (in-flight requests, checked-out connections).
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)